@@ -1,13 +1,22 @@
 from channels.auth import AuthMiddlewareStack
+from channels.http import AsgiHandler
 from channels.routing import ProtocolTypeRouter, URLRouter
-from django.urls import path
+from django.conf import settings
+from django.urls import path, re_path
 
-from contact.game.consumers import ContactGameWSConsumer
+from contact.game.consumers import MetricsConsumer
+from contact.game.routes import game_connection
 
 application = ProtocolTypeRouter(
     {
+        "http": URLRouter(
+            [
+                path(settings.GAME_METRICS_URL, MetricsConsumer),
+                re_path(r"", AsgiHandler),
+            ]
+        ),
         "websocket": AuthMiddlewareStack(
-            URLRouter([path("ws/contact-game", ContactGameWSConsumer)])
-        )
+            URLRouter([path("ws/contact-game", game_connection)])
+        ),
     }
 )
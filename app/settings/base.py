@@ -28,6 +28,7 @@ INSTALLED_APPS = (
     "django.contrib.admin",
     "rest_framework",
     "channels",
+    "contact.game.apps.ContactGameAppsConfig",
 )
 
 MIDDLEWARE = [
@@ -52,7 +53,7 @@ ASGI_APPLICATION = "app.asgi.application"
 ############
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "BACKEND": "contact.game.layers.HybridChannelLayer",
         "CONFIG": {"hosts": [REDIS_LOCATION]},
     }
 }
@@ -181,6 +182,51 @@ REST_FRAMEWORK = {
     ),
 }
 
+########
+# Game #
+########
+GAME_DICTIONARY_PATH = CONFIG.PATHS["DATA_DIR"] + "/dictionary/words.ru-ru.bin"
+
+GAME_METRICS_URL = "metrics"
+# Bearer token of the metrics scrapers, set in the secrets config file. The
+# metrics are not served without it.
+GAME_METRICS_TOKEN = CONFIG.env("METRICS_TOKEN", default="")
+GAME_METRICS_DIR = CONFIG.PATHS["TMP_DIR"] + "/metrics"
+GAME_METRICS_DUMP_INTERVAL = 5  # seconds
+GAME_METRICS_STALE_AFTER = GAME_METRICS_DUMP_INTERVAL * 3
+
+GAME_DIAGNOSTICS_DIR = CONFIG.PATHS["LOG_DIR"] + "/diagnostics"
+GAME_REDIS_TRACE_SIZE = 100
+GAME_PROFILE_MAX_DURATION = 10 * 60  # seconds
+
+GAME_ANALYTICS_DIR = CONFIG.PATHS["DATA_DIR"] + "/analytics"
+GAME_ANALYTICS_SEGMENT_ROWS = 1_000_000
+GAME_ANALYTICS_SEGMENT_MAX_AGE = 60 * 60  # seconds
+
+GAME_TRAFFIC_DIR = CONFIG.PATHS["DATA_DIR"] + "/traffic"
+GAME_TRAFFIC_SEGMENT_MAX_AGE = 10 * 60  # seconds
+GAME_TRAFFIC_MAX_DURATION = 60 * 60  # seconds
+
+# Connection pool of the game storage, may be tuned in the redis config file
+GAME_REDIS_MAX_CONNECTIONS = CONFIG.env(
+    "REDIS_MAX_CONNECTIONS", int, default="20", parse_default=True
+)
+GAME_REDIS_POOL_TIMEOUT = CONFIG.env(  # seconds
+    "REDIS_POOL_TIMEOUT", float, default="0.5", parse_default=True
+)
+GAME_REDIS_CONNECT_TIMEOUT = CONFIG.env(  # seconds
+    "REDIS_CONNECT_TIMEOUT", float, default="0.5", parse_default=True
+)
+GAME_REDIS_READ_TIMEOUT = CONFIG.env(  # seconds
+    "REDIS_READ_TIMEOUT", float, default="1", parse_default=True
+)
+GAME_REDIS_HEALTH_CHECK_INTERVAL = 30  # seconds
+# Read-only game actions failing on the storage are retried
+GAME_REDIS_READ_RETRIES = 2
+GAME_REDIS_RETRY_BACKOFF = 0.05  # seconds, doubled with every retry
+GAME_REDIS_BREAKER_FAILURES = 5
+GAME_REDIS_BREAKER_RESET_TIMEOUT = 5  # seconds
+
 ##########
 # Celery #
 ##########
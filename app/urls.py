@@ -6,6 +6,7 @@ from django.urls import include, path
 urlpatterns = [
     path(settings.ADMIN_URL, admin.site.urls),
     path("api/users/", include("contact.users.urls")),
+    path("api/game/", include("contact.game.urls")),
 ]
 
 if settings.DEBUG:
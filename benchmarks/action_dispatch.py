@@ -0,0 +1,66 @@
+"""
+Per message overhead of decoding a frame and resolving its game action
+handler, without the handler itself.
+
+    python -m benchmarks.action_dispatch [--messages 200000]
+
+The `previous` path is the one used before the action registry: the frame is
+indexed blindly and a dict of bound methods is built for every message.
+"""
+import argparse
+import os
+import timeit
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+FRAMES = [
+    {"event": "player_state", "data": {}},
+    {"event": "word", "data": {"word": "контакт"}},
+    {"event": "offer", "data": {"answer": "кот", "definition": "Мяукает"}},
+    {"event": "offer_comment", "data": {"offer_id": "a" * 24, "comment_text": "Да"}},
+    {"event": "contact", "data": {"offer_id": "a" * 24, "estimated_word": "кот"}},
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=200_000)
+    options = parser.parse_args()
+
+    django.setup()
+
+    from contact.game.constants import GameEvent
+    from contact.game.game_manager import GameManager
+    from contact.game.payloads import decode_frame
+
+    game_manager = GameManager.__new__(GameManager)
+
+    def previous(content):
+        event, game_data = content["event"], content["data"]
+        game_event = GameEvent(event)
+        handler = {
+            GameEvent.FINISH: game_manager.action_finish_game,
+            GameEvent.PLAYER_STATE: game_manager.action_player_state,
+            GameEvent.SET_WORD: game_manager.action_word,
+            GameEvent.OFFER: game_manager.action_offer,
+            GameEvent.OFFER_COMMENT: game_manager.action_comment_offer,
+            GameEvent.CONTACT: game_manager.action_accept_offer,
+            GameEvent.CANCEL_CONTACT: game_manager.action_cancel,
+            GameEvent.CONTACT_RESULT: game_manager.action_contact_result,
+        }[game_event]
+        return handler, game_data
+
+    def registry(content):
+        game_event, game_data = decode_frame(content, GameManager.payload_schemas)
+        return GameManager._actions[game_event], game_data
+
+    for name, dispatch in (("previous", previous), ("registry", registry)):
+        frames = iter(FRAMES * (options.messages // len(FRAMES) + 1))
+        elapsed = timeit.timeit(lambda: dispatch(next(frames)), number=options.messages)
+        print(f"{name:<10} {elapsed / options.messages * 1e6:.2f} us/message")
+
+
+if __name__ == "__main__":
+    main()
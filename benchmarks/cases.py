@@ -0,0 +1,239 @@
+"""
+Cases of the benchmark suite, see `benchmarks.suite`. The module is imported
+once Django is set up.
+
+A case is a factory getting the number of calls to prepare for and returning
+the benchmarked callable, either of them may be a coroutine function. Every
+case works with objects of its own, so cases do not affect each other.
+"""
+import itertools
+import secrets
+from typing import Callable, Dict, List, NamedTuple
+
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+
+from contact.game import storage, storage_handler
+from contact.game.constants import (
+    CONNECTION_RATE_LIMITS,
+    NUMBER_OF_PLAYERS_TO_START,
+    ROOM_RATE_LIMITS,
+    GameEvent,
+    GameFinishReason,
+)
+from contact.game.consumers import ContactGameWSConsumer
+from contact.game.game_manager import GameManager, GameManagerDelegate
+
+User = get_user_model()
+
+
+class Case(NamedTuple):
+    factory: Callable
+    iterations: int
+
+
+CASES: Dict[str, Case] = {}
+OFFER_COUNTS = (0, 10, 50, 200)
+HOSTED_WORD = "контакт"
+ANSWER = "кот"
+
+_numbers = itertools.count()
+
+
+def case(name: str, iterations: int = 200):
+    def decorator(factory: Callable) -> Callable:
+        CASES[name] = Case(factory=factory, iterations=iterations)
+        return factory
+
+    return decorator
+
+
+def unique_username() -> str:
+    return f"bench-{next(_numbers)}-{secrets.token_hex(4)}"
+
+
+# Storage models #
+def register_model_cases(model_name: str, model):
+    @case(f"storage.{model_name}.create")
+    def create(calls):
+        return model.create_object
+
+    @case(f"storage.{model_name}.save")
+    def save(calls):
+        return model.create_object().save
+
+    @case(f"storage.{model_name}.refresh")
+    def refresh(calls):
+        return model.create_object().refresh
+
+    @case(f"storage.{model_name}.get_by_id")
+    def get_by_id(calls):
+        obj_id = model.create_object().id_key
+        return lambda: model.get_by_id(obj_id)
+
+
+register_model_cases("room", storage.Room)
+register_model_cases("offer", storage.Offer)
+register_model_cases("player", storage.Player)
+
+
+def register_offers_case(offers_count: int):
+    @case(f"storage.room.get_offers[{offers_count}]")
+    def get_offers(calls):
+        room = storage.Room.create_object()
+        for _ in range(offers_count):
+            offer = storage.Offer.create_object(
+                room_id=room.id_key, definition="x" * 100, answer_internal=ANSWER
+            )
+            storage.append_offer_to_room(offer, room)
+        return room.get_offers
+
+
+for count in OFFER_COUNTS:
+    register_offers_case(count)
+
+
+# Game actions #
+class Delegate(GameManagerDelegate):
+    def order_delayed_action(self, after, event, action_kwargs=None):
+        pass
+
+
+class Game:
+    """A started game with the hosted word set"""
+
+    def __init__(self):
+        # Players join the free room, a fresh one should be created
+        storage_handler.delete(storage.Room.free_room_storage_key)
+        self.delegates = [Delegate() for _ in range(NUMBER_OF_PLAYERS_TO_START)]
+        managers = []
+
+        for delegate in self.delegates:
+            manager = GameManager(
+                user=User(username=unique_username()), delegate=delegate
+            )
+            delegate.game_manager = manager
+            manager.append_user_to_game()
+            managers.append(manager)
+
+        room = storage.Room.get_by_id(managers[0].room.id_key)
+        self.host = next(m for m in managers if m.player.id_key == room.game_host_key)
+        self.players: List[GameManager] = [m for m in managers if m is not self.host]
+        self.host.perform_game_action(GameEvent.SET_WORD, {"word": HOSTED_WORD})
+
+    def offer(self) -> str:
+        self.players[0].perform_game_action(
+            GameEvent.OFFER, {"answer": ANSWER, "definition": "Мяукает"}
+        )
+        return self.host.room.get_offer_ids()[-1]
+
+    def contact(self, offer_id: str):
+        self.players[1].perform_game_action(
+            GameEvent.CONTACT, {"offer_id": offer_id, "estimated_word": ANSWER}
+        )
+
+
+def pooled(prepare: Callable, act: Callable):
+    """
+    Benchmark an action changing the game state on a fresh game every call
+    :param prepare: creates a game and returns the arguments of `act`
+    """
+
+    def factory(calls):
+        pool = iter([prepare() for _ in range(calls)])
+        return lambda: act(*next(pool))
+
+    return factory
+
+
+@case("game.player_state")
+def player_state(calls):
+    player = Game().players[0]
+    return lambda: player.perform_game_action(GameEvent.PLAYER_STATE, {})
+
+
+@case("game.word")
+def word(calls):
+    host = Game().host
+    return lambda: host.perform_game_action(GameEvent.SET_WORD, {"word": HOSTED_WORD})
+
+
+@case("game.offer")
+def offer(calls):
+    return Game().offer
+
+
+@case("game.offer_comment")
+def offer_comment(calls):
+    game = Game()
+    data = {"offer_id": game.offer(), "comment_text": "Пушистый"}
+    return lambda: game.players[0].perform_game_action(GameEvent.OFFER_COMMENT, data)
+
+
+def prepare_offer():
+    game = Game()
+    return game, game.offer()
+
+
+case("game.contact", iterations=50)(
+    pooled(prepare=prepare_offer, act=lambda game, offer_id: game.contact(offer_id))
+)
+case("game.contact_cancel", iterations=50)(
+    pooled(
+        prepare=prepare_offer,
+        act=lambda game, offer_id: game.host.perform_game_action(
+            GameEvent.CANCEL_CONTACT, {"offer_id": offer_id, "estimated_word": ANSWER}
+        ),
+    )
+)
+
+
+def prepare_contact():
+    game, offer_id = prepare_offer()
+    game.contact(offer_id)
+    return (game,)
+
+
+case("game.contact_result", iterations=50)(
+    pooled(
+        prepare=prepare_contact,
+        act=lambda game: game.players[1].perform_game_action(
+            GameEvent.CONTACT_RESULT, {}
+        ),
+    )
+)
+case("game.finish", iterations=50)(
+    pooled(
+        prepare=lambda: (Game(),),
+        act=lambda game: game.host.perform_game_action(
+            GameEvent.FINISH, {"reason": GameFinishReason.GAME_TIME_LIMIT_EXPIRED}
+        ),
+    )
+)
+
+
+# Consumer #
+@case("consumer.player_state_round_trip", iterations=100)
+async def consumer_round_trip(calls):
+    # Round trips are limited by the consumer rate limits otherwise
+    CONNECTION_RATE_LIMITS.clear()
+    ROOM_RATE_LIMITS.clear()
+    storage_handler.delete(storage.Room.free_room_storage_key)
+    communicators = []
+
+    for _ in range(NUMBER_OF_PLAYERS_TO_START):
+        communicator = WebsocketCommunicator(ContactGameWSConsumer, "/ws/contact-game")
+        communicator.scope["user"] = User(username=unique_username())
+        await communicator.connect()
+        communicators.append(communicator)
+
+    sender = communicators[0]
+    while not await sender.receive_nothing(timeout=0.05):
+        await sender.receive_from()
+
+    async def round_trip():
+        await sender.send_json_to({"event": GameEvent.PLAYER_STATE.value, "data": {}})
+        while (await sender.receive_json_from())["event"] != "player_state":
+            pass
+
+    return round_trip
@@ -0,0 +1,92 @@
+"""
+Word dictionary lookup latency and per worker memory.
+
+    python -m benchmarks.dictionary <word_list> [--workers 4] [--lookups 100000]
+
+RSS counts the dictionary pages touched by every worker, while PSS divides
+shared pages between the processes mapping them, so PSS per worker should
+drop as the number of workers grows.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import timeit
+
+from contact.game.dictionary import WordDictionary, build_dictionary
+
+
+def read_memory_usage():
+    usage = {}
+    with open("/proc/self/smaps_rollup") as smaps:
+        for line in smaps:
+            key, _, value = line.partition(":")
+            if key in ("Rss", "Pss"):
+                usage[key] = int(value.split()[0])
+    return usage
+
+
+def measure_latency(words_dictionary, words, lookups):
+    samples = [random.choice(words) for _ in range(lookups)]
+    misses = [f"{word}ъъ" for word in samples]
+
+    def run(func, arguments):
+        iterator = iter(arguments)
+        elapsed = timeit.timeit(lambda: func(next(iterator)), number=len(arguments))
+        return elapsed / len(arguments) * 1e6
+
+    return {
+        "is_word (hit)": run(words_dictionary.is_word, samples),
+        "is_word (miss)": run(words_dictionary.is_word, misses),
+    }
+
+
+def worker(path, words, lookups, results):
+    words_dictionary = WordDictionary(path)
+    for word in words[:lookups]:
+        words_dictionary.is_word(word)
+    # Touch every page the way a long living worker eventually does
+    for index in range(0, len(words_dictionary), 64):
+        words_dictionary._words[index]
+    results.put((os.getpid(), read_memory_usage()))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("word_list")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    options = parser.parse_args()
+
+    with open(options.word_list, encoding="utf-8") as word_list:
+        words = [line.strip() for line in word_list if line.strip()]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "words.bin")
+        words_count = build_dictionary(words, path)
+        print(f"{words_count} words, {os.path.getsize(path) / 2 ** 20:.1f} MiB file")
+
+        words_dictionary = WordDictionary(path)
+        for name, microseconds in measure_latency(
+            words_dictionary, words, options.lookups
+        ).items():
+            print(f"{name:<20} {microseconds:.2f} us/lookup")
+
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(path, words, options.lookups, results))
+            for _ in range(options.workers)
+        ]
+        for process in processes:
+            process.start()
+        for _ in processes:
+            pid, usage = results.get()
+            print(f"worker {pid}: RSS {usage['Rss']} KiB, PSS {usage['Pss']} KiB")
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
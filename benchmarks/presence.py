@@ -0,0 +1,112 @@
+"""
+Presence flushing and sweeping cost with flaky clients. Requires a running
+redis, the presence of the benchmark players is removed afterwards.
+
+    python -m benchmarks.presence [--clients 10000] [--seconds 60] [--flakiness 0.02]
+
+Time is simulated: every simulated second online clients are seen, some of
+them drop for 1-15 seconds, then the presence is flushed and swept once, the
+way a worker does it. Drops longer than PLAYER_DISCONNECTION_AWAITING_TIME
+are expected to be claimed as absent. The peak of the per disconnection
+timer tasks and keys which the presence replaces is reported for comparison.
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+
+def percentile(samples, fraction):
+    return sorted(samples)[int(len(samples) * fraction)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=10_000)
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--flakiness", type=float, default=0.02)
+    options = parser.parse_args()
+
+    django.setup()
+
+    from contact.game import storage, storage_handler
+    from contact.game.constants import (
+        NUMBER_OF_PLAYERS_TO_START,
+        PLAYER_DISCONNECTION_AWAITING_TIME,
+        PRESENCE_CLAIM_LIMIT,
+        PRESENCE_KEY,
+    )
+
+    clients = [
+        (f"bench-{index // NUMBER_OF_PLAYERS_TO_START}", f"bench-player-{index}")
+        for index in range(options.clients)
+    ]
+    offline_until = {}
+    disconnected_at = {}
+    flush_times, sweep_times, timers = [], [], []
+    claimed = expected = 0
+    now = time.time()
+
+    try:
+        for second in range(options.seconds):
+            now += 1
+            seen_players = {}
+
+            for client in clients:
+                if offline_until.get(client, 0) > now:
+                    continue
+
+                if client in disconnected_at:
+                    del disconnected_at[client]
+
+                if random.random() < options.flakiness:
+                    offline_until[client] = now + random.randint(1, 15)
+                    disconnected_at[client] = now
+                else:
+                    seen_players[client] = now
+
+            start_time = time.perf_counter()
+            storage.touch_players(seen_players)
+            flush_times.append(time.perf_counter() - start_time)
+
+            start_time = time.perf_counter()
+            absent_players = storage.claim_absent_players(
+                seen_before=now - PLAYER_DISCONNECTION_AWAITING_TIME,
+                limit=PRESENCE_CLAIM_LIMIT,
+            )
+            sweep_times.append(time.perf_counter() - start_time)
+
+            claimed += sum(map(len, absent_players.values()))
+            expected += sum(
+                1
+                for at in disconnected_at.values()
+                if at == now - PLAYER_DISCONNECTION_AWAITING_TIME + 1
+            )
+            timers.append(
+                sum(
+                    1
+                    for at in disconnected_at.values()
+                    if now - at <= PLAYER_DISCONNECTION_AWAITING_TIME
+                )
+            )
+    finally:
+        storage_handler.sorted_set_remove(
+            PRESENCE_KEY, *(storage.presence_member(*client) for client in clients)
+        )
+
+    for name, samples in (("flush", flush_times), ("sweep", sweep_times)):
+        print(
+            f"{name:<6} median {statistics.median(samples) * 1e3:.2f} ms, "
+            f"p99 {percentile(samples, 0.99) * 1e3:.2f} ms"
+        )
+    print(f"absent players claimed {claimed}, expected about {expected}")
+    print(f"per disconnection timers and keys replaced, peak {max(timers)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Room deletion throughput and its impact on redis latency. Requires a running
+redis, which should not be used by anything else meanwhile.
+
+    python -m benchmarks.reaper [--rooms 2000] [--offers 50]
+
+Synthetic finished rooms are deleted twice: with a single DEL per room, the
+way rooms were cleaned before the reaper, and by the reaper. A separate
+connection measures PING round trips while rooms are being deleted.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import threading
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+
+def create_rooms(redis, count, offers_count, players_count=3):
+    room_ids = [f"bench{index}" for index in range(count)]
+    pipeline = redis.pipeline(transaction=False)
+
+    for room_id in room_ids:
+        offer_ids = [f"{room_id}-{index}" for index in range(offers_count)]
+        player_ids = [f"{room_id}-{index}" for index in range(players_count)]
+        pipeline.hset(f"room:{room_id}", mapping={"id_key": room_id})
+        pipeline.rpush(f"offers:room:{room_id}", *offer_ids)
+        pipeline.rpush(f"players:room:{room_id}", *player_ids)
+        for offer_id in offer_ids:
+            pipeline.hset(
+                f"offer:{offer_id}",
+                mapping={"definition": "x" * 200, "room_id": room_id},
+            )
+        for player_id in player_ids:
+            pipeline.hset(f"player:{player_id}", mapping={"room_id": room_id})
+        for index in range(200):
+            pipeline.xadd(f"events:room:{room_id}", {"value": "x" * 500})
+
+    pipeline.execute()
+    return room_ids
+
+
+class LatencyProbe(threading.Thread):
+    def __init__(self, redis):
+        super().__init__(daemon=True)
+        self.redis = redis
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            start_time = time.perf_counter()
+            self.redis.ping()
+            self.samples.append(time.perf_counter() - start_time)
+            time.sleep(0.005)
+
+    def report(self):
+        samples = sorted(self.samples)
+        return (
+            f"ping median {statistics.median(samples) * 1e3:.2f} ms, "
+            f"p99 {samples[int(len(samples) * 0.99)] * 1e3:.2f} ms, "
+            f"max {samples[-1] * 1e3:.2f} ms"
+        )
+
+
+def measure(name, redis, probe_redis, rooms_count, offers_count, delete):
+    room_ids = create_rooms(redis, rooms_count, offers_count)
+    probe = LatencyProbe(probe_redis)
+    probe.start()
+
+    start_time = time.perf_counter()
+    delete(room_ids)
+    elapsed = time.perf_counter() - start_time
+
+    probe.stopped.set()
+    probe.join()
+    print(f"{name:<8} {rooms_count / elapsed:.0f} rooms/s, {probe.report()}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, default=2000)
+    parser.add_argument("--offers", type=int, default=50)
+    options = parser.parse_args()
+
+    django.setup()
+
+    from contact.game import reaper, storage, storage_handler
+    from contact.game.constants import REAPER_BATCH_SIZE, REAPER_QUEUE_KEY
+    from contact.game.throttling import TokenBucket
+    from contact.game.utils import get_redis_connection
+
+    redis = storage_handler.redis
+    probe_redis = get_redis_connection()
+
+    def delete_at_once(room_ids):
+        for room_id in room_ids:
+            storage_handler.delete(*storage.get_rooms_keys([room_id]))
+
+    def reap(room_ids):
+        redis.zadd(REAPER_QUEUE_KEY, {room_id: 0 for room_id in room_ids})
+        # Unlimited rate to measure the throughput of batches themselves
+        bucket = TokenBucket(rate=10 ** 9, capacity=REAPER_BATCH_SIZE)
+
+        async def run():
+            while await reaper.reap_rooms(bucket):
+                pass
+
+        asyncio.get_event_loop().run_until_complete(run())
+
+    measure("DEL", redis, probe_redis, options.rooms, options.offers, delete_at_once)
+    measure("reaper", redis, probe_redis, options.rooms, options.offers, reap)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Microbenchmarks of the game storage models, the game actions and the
+consumer message round trips.
+
+    python -m benchmarks.suite run [--fake-redis] [-k game.] [--output results.json]
+    python -m benchmarks.suite compare base.json results.json [--threshold 0.1]
+
+`run` uses the redis from conf/redis, which should be a scratch database as
+the benchmarked objects are left there, or an in-memory stand-in with
+`--fake-redis` (requires the `fakeredis` package). Every case is timed for
+`--rounds` rounds after a warm up one, the median round is compared.
+
+`compare` exits with the status 1 when any case became slower than the
+threshold allows.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+
+def set_up(fake_redis: bool):
+    from django.conf import settings
+
+    django.setup()
+    settings.GAME_ANALYTICS_DIR = tempfile.mkdtemp(prefix="game-analytics-")
+
+    if fake_redis:
+        try:
+            import fakeredis
+        except ImportError:
+            sys.exit("--fake-redis requires the `fakeredis` package")
+
+        from contact.game import storage_handler
+
+        storage_handler.redis = storage_handler.instrument(fakeredis.FakeStrictRedis())
+        settings.CHANNEL_LAYERS = {
+            "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+        }
+
+
+async def measure(case, rounds: int) -> dict:
+    from contact.game import storage_handler
+
+    calls = case.iterations * (rounds + 1)
+    call = case.factory(calls)
+    if asyncio.iscoroutine(call):
+        call = await call
+    is_async = asyncio.iscoroutinefunction(call)
+
+    timings = []
+    commands_count = 0
+
+    for round_number in range(rounds + 1):
+        start_commands_count = storage_handler.get_commands_count()
+        start_time = time.perf_counter()
+
+        for _ in range(case.iterations):
+            if is_async:
+                await call()
+            else:
+                call()
+
+        elapsed = time.perf_counter() - start_time
+        # The first round warms up
+        if round_number:
+            timings.append(elapsed / case.iterations * 1e6)
+            commands_count = storage_handler.get_commands_count() - start_commands_count
+
+    return {
+        "median_us": statistics.median(timings),
+        "min_us": min(timings),
+        "stdev_us": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "redis_commands": commands_count / case.iterations,
+        "rounds": rounds,
+        "iterations": case.iterations,
+    }
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(options):
+    set_up(fake_redis=options.fake_redis)
+    from benchmarks.cases import CASES
+
+    async def run_cases():
+        results = {}
+        for name, case in CASES.items():
+            if options.keyword and options.keyword not in name:
+                continue
+
+            results[name] = result = await measure(case, rounds=options.rounds)
+            print(
+                f"{name:<40} {result['median_us']:>10.1f} us "
+                f"± {result['stdev_us']:>7.1f} {result['redis_commands']:>6.1f} cmd"
+            )
+        return results
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(),
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "redis": "fake" if options.fake_redis else "local",
+        "results": asyncio.get_event_loop().run_until_complete(run_cases()),
+    }
+
+    if options.output:
+        with open(options.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+def compare(options) -> int:
+    with open(options.base) as file:
+        base = json.load(file)
+    with open(options.new) as file:
+        new = json.load(file)
+
+    if base["redis"] != new["redis"]:
+        print(f"Warning: comparing {base['redis']} redis with {new['redis']} one")
+
+    regressions = 0
+    print(f"{'case':<40} {'base us':>10} {'new us':>10} {'change':>8}")
+
+    for name, result in new["results"].items():
+        base_result = base["results"].get(name)
+        if base_result is None:
+            print(f"{name:<40} {'-':>10} {result['median_us']:>10.1f}")
+            continue
+
+        change = result["median_us"] / base_result["median_us"] - 1
+        is_regression = change > options.threshold
+        regressions += is_regression
+        print(
+            f"{name:<40} {base_result['median_us']:>10.1f} "
+            f"{result['median_us']:>10.1f} {change:>+8.1%}"
+            + ("  REGRESSION" if is_regression else "")
+        )
+
+    print(f"{regressions} regressions over {options.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run")
+    run_parser.add_argument("--fake-redis", action="store_true")
+    run_parser.add_argument("--rounds", type=int, default=5)
+    run_parser.add_argument("-k", dest="keyword", help="Run cases containing it")
+    run_parser.add_argument("--output", help="Path of the JSON results")
+
+    compare_parser = subparsers.add_parser("compare")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.1, help="Allowed slowdown, 0.1 is 10%%"
+    )
+
+    options = parser.parse_args()
+    if options.command == "run":
+        run(options)
+    else:
+        sys.exit(compare(options))
+
+
+if __name__ == "__main__":
+    main()
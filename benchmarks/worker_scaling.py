@@ -0,0 +1,159 @@
+"""
+Connections and actions throughput of `manage.py rungameserver` by the number
+of workers. Requires a migrated database, a running redis and the
+`websockets` package.
+
+    python -m benchmarks.worker_scaling --workers 1 2 4 --clients 300
+
+Every client connects with its own session, then performs `offers_page`
+actions in a closed loop: an action is sent after the page for the previous
+one is received. Pages are answered only to the requesting client, unlike
+room state broadcasts which would let the actions of the other players of a
+room advance the loop. The server is run without the rate limits of the
+consumers, which would throttle the loop otherwise.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+
+def create_session_cookies(prefix, count):
+    from django.conf import settings
+    from django.contrib.auth import (
+        BACKEND_SESSION_KEY,
+        HASH_SESSION_KEY,
+        SESSION_KEY,
+        get_user_model,
+    )
+    from django.contrib.sessions.backends.db import SessionStore
+
+    cookies = []
+    for index in range(count):
+        user, _ = get_user_model().objects.get_or_create(username=f"{prefix}-{index}")
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        cookies.append(f"{settings.SESSION_COOKIE_NAME}={session.session_key}")
+
+    return cookies
+
+
+def serve(workers_count, port):
+    from django.core.management import call_command
+
+    from contact.game.constants import CONNECTION_RATE_LIMITS, ROOM_RATE_LIMITS
+
+    # Round trips are limited by the consumer rate limits otherwise,
+    # workers are forked with the cleared limits
+    CONNECTION_RATE_LIMITS.clear()
+    ROOM_RATE_LIMITS.clear()
+    call_command("rungameserver", workers=workers_count, port=port)
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as probe:
+            if probe.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.2)
+    raise TimeoutError("Game server has not started")
+
+
+async def receive_event(connection, event):
+    while json.loads(await connection.recv()).get("event") != event:
+        pass
+
+
+async def run_clients(port, cookies, actions):
+    import websockets
+
+    url = f"ws://127.0.0.1:{port}/ws/contact-game"
+
+    start_time = time.perf_counter()
+    connections = await asyncio.gather(
+        *(
+            websockets.connect(url, extra_headers={"Cookie": cookie})
+            for cookie in cookies
+        )
+    )
+    connecting_time = time.perf_counter() - start_time
+
+    # Skip game start broadcasts
+    await asyncio.sleep(1)
+
+    async def act(connection):
+        for _ in range(actions):
+            await connection.send('{"event": "offers_page", "data": {"cursor": 0}}')
+            await receive_event(connection, "offers_page")
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(act(connection) for connection in connections))
+    acting_time = time.perf_counter() - start_time
+
+    await asyncio.gather(*(connection.close() for connection in connections))
+    return len(connections) / connecting_time, len(connections) * actions / acting_time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=300)
+    parser.add_argument("--actions", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.serve:
+        django.setup()
+        serve(options.workers[0], options.port)
+        return
+
+    try:
+        import websockets  # noqa: F401
+    except ImportError:
+        sys.exit("The benchmark requires the `websockets` package")
+
+    django.setup()
+    print(f"{'workers':>8} {'connections/s':>14} {'actions/s':>10}")
+
+    for workers_count in options.workers:
+        # Players are stored by username, so every run needs fresh users
+        cookies = create_session_cookies(
+            f"bench-{int(time.time())}-{workers_count}", options.clients
+        )
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.worker_scaling",
+                "--serve",
+                f"--workers={workers_count}",
+                f"--port={options.port}",
+            ]
+        )
+        try:
+            wait_for_port(options.port)
+            connections_rate, actions_rate = asyncio.run(
+                run_clients(options.port, cookies, options.actions)
+            )
+        finally:
+            server.terminate()
+            server.wait()
+
+        print(f"{workers_count:>8} {connections_rate:>14.1f} {actions_rate:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
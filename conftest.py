@@ -0,0 +1,49 @@
+import django
+import pytest
+from django.conf import settings
+
+
+def pytest_configure():
+    # The game modules need the storage settings only, app.settings reads the
+    # configs of a deployment
+    settings.configure(
+        SECRET_KEY="test",
+        INSTALLED_APPS=[
+            "django.contrib.auth",
+            "django.contrib.contenttypes",
+            "django.contrib.sessions",
+            "rest_framework",
+            "contact.game.apps.ContactGameAppsConfig",
+        ],
+        DATABASES={
+            "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}
+        },
+        CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+        LANGUAGE_CODE="ru-ru",
+        GAME_DICTIONARY_PATH="/nonexistent/words.bin",
+        GAME_ANALYTICS_DIR="",
+        GAME_METRICS_TOKEN="",
+        REDIS_LOCATION="redis://localhost:6379/0",
+        GAME_REDIS_MAX_CONNECTIONS=20,
+        GAME_REDIS_POOL_TIMEOUT=0.5,
+        GAME_REDIS_CONNECT_TIMEOUT=0.5,
+        GAME_REDIS_READ_TIMEOUT=1,
+        GAME_REDIS_HEALTH_CHECK_INTERVAL=30,
+        GAME_REDIS_READ_RETRIES=2,
+        GAME_REDIS_RETRY_BACKOFF=0.05,
+        GAME_REDIS_BREAKER_FAILURES=5,
+        GAME_REDIS_BREAKER_RESET_TIMEOUT=5,
+    )
+    django.setup()
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    """The game storage in memory"""
+    import fakeredis
+
+    from contact.game import storage_handler
+
+    client = storage_handler.instrument(fakeredis.FakeStrictRedis())
+    monkeypatch.setattr(storage_handler, "redis", client)
+    return client
@@ -0,0 +1,205 @@
+"""
+Export of game events for offline analysis.
+
+Events are put into a queue and written by a background thread of the worker
+into append-only columnar files: a segment directory per worker and period
+with a file of fixed size values per column. Segments are rotated after
+GAME_ANALYTICS_SEGMENT_ROWS events or GAME_ANALYTICS_SEGMENT_MAX_AGE seconds,
+finished segments are never written again.
+
+Columns are plain arrays of the machine byte order, so a column loads with a
+single `numpy.fromfile` call, see `manage.py analyze_games`.
+"""
+import array
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from contact.game.constants import GameEvent, GameFinishReason
+
+logger = logging.getLogger(__name__)
+
+# Column name and `array` type code, which is a valid numpy dtype as well
+COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("timestamp", "d"),
+    ("event", "B"),
+    ("room", "Q"),
+    ("game_time", "f"),  # seconds since the game start, -1 when not started
+    ("word_length", "B"),  # 0 when not applicable
+    ("success", "b"),  # -1 when not applicable
+    ("reason", "B"),  # 0 when not applicable
+)
+EVENT_CODES: Dict[GameEvent, int] = {
+    GameEvent.START: 1,
+    GameEvent.OFFER: 2,
+    GameEvent.CONTACT: 3,
+    GameEvent.CANCEL_CONTACT: 4,
+    GameEvent.CONTACT_RESULT: 5,
+    GameEvent.FINISH: 6,
+}
+REASON_CODES: Dict[str, int] = {
+    GameFinishReason.DISCONNECTION: 1,
+    GameFinishReason.GAME_TIME_LIMIT_EXPIRED: 2,
+    GameFinishReason.GAME_HOST_WON: 3,
+    GameFinishReason.PLAYERS_WON: 4,
+}
+FLUSH_ROWS = 4096
+FLUSH_INTERVAL = 1  # seconds
+
+Row = Tuple[float, int, int, float, int, int, int]
+
+_records: "queue.SimpleQueue[Row]" = queue.SimpleQueue()
+_writer: Optional[threading.Thread] = None
+_writer_pid: Optional[int] = None
+
+
+def room_code(room_id: str) -> int:
+    """Room ids are random hex strings, 64 bits of them identify a room"""
+    try:
+        return int(room_id[:16], 16)
+    except ValueError:
+        return 0
+
+
+def record(
+    event: GameEvent,
+    room_id: str,
+    started_at: float = 0,
+    word_length: int = 0,
+    success: Optional[bool] = None,
+    reason: str = "",
+):
+    """
+    Queue a game event to be written, never blocks
+    :param started_at: timestamp of the game start or 0
+    """
+    if not settings.GAME_ANALYTICS_DIR:
+        return
+
+    ensure_writing()
+    now = time.time()
+    _records.put(
+        (
+            now,
+            EVENT_CODES[event],
+            room_code(room_id),
+            now - started_at if started_at else -1,
+            min(word_length, 255),
+            -1 if success is None else int(success),
+            REASON_CODES.get(reason, 0),
+        )
+    )
+
+
+class Segment:
+    def __init__(self, directory: str):
+        self.path = os.path.join(
+            directory, f"{datetime.utcnow():%Y%m%d%H%M%S}-{os.getpid()}"
+        )
+        os.makedirs(self.path, exist_ok=True)
+        self.created_at = time.monotonic()
+        self.rows = 0
+
+    @property
+    def is_full(self) -> bool:
+        return (
+            self.rows >= settings.GAME_ANALYTICS_SEGMENT_ROWS
+            or time.monotonic() - self.created_at
+            >= settings.GAME_ANALYTICS_SEGMENT_MAX_AGE
+        )
+
+    def append(self, rows: List[Row]):
+        for index, (name, type_code) in enumerate(COLUMNS):
+            values = array.array(type_code, (row[index] for row in rows))
+            with open(os.path.join(self.path, f"{name}.bin"), "ab") as column:
+                values.tofile(column)
+
+        self.rows += len(rows)
+
+
+def write():
+    segment: Optional[Segment] = None
+    rows: List[Row] = []
+    flushed_at = time.monotonic()
+
+    while True:
+        try:
+            rows.append(_records.get(timeout=FLUSH_INTERVAL))
+        except queue.Empty:
+            pass
+
+        if len(rows) < FLUSH_ROWS and time.monotonic() - flushed_at < FLUSH_INTERVAL:
+            continue
+
+        flushed_at = time.monotonic()
+        if not rows:
+            continue
+
+        try:
+            if segment is None or segment.is_full:
+                segment = Segment(settings.GAME_ANALYTICS_DIR)
+            segment.append(rows)
+        except OSError:
+            logger.exception("Game events could not be written, %s lost", len(rows))
+            segment = None
+
+        rows = []
+
+
+def ensure_writing():
+    """Start the writer thread of the current worker, if it is not started yet"""
+    global _writer, _writer_pid
+
+    if _writer is not None and _writer_pid == os.getpid():
+        return
+
+    _writer_pid = os.getpid()
+    _writer = threading.Thread(target=write, name="game-analytics", daemon=True)
+    _writer.start()
+
+
+def load_segments(directory: str, since: Optional[datetime] = None):
+    """
+    Load the columns of all the segments, requires NumPy
+    :param since: skip segments created before the time
+    :return: column names mapped to numpy arrays
+    """
+    import numpy
+
+    columns: Dict[str, list] = {name: [] for name, _ in COLUMNS}
+    since_name = f"{since:%Y%m%d%H%M%S}" if since else ""
+
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not os.path.isdir(path) or name < since_name:
+            continue
+
+        # A segment being written may have the last rows written partially
+        rows = min(
+            os.path.getsize(os.path.join(path, f"{column}.bin"))
+            // numpy.dtype(type_code).itemsize
+            if os.path.exists(os.path.join(path, f"{column}.bin"))
+            else 0
+            for column, type_code in COLUMNS
+        )
+
+        for column, type_code in COLUMNS:
+            if rows:
+                columns[column].append(
+                    numpy.fromfile(
+                        os.path.join(path, f"{column}.bin"),
+                        dtype=type_code,
+                        count=rows,
+                    )
+                )
+
+    return {
+        name: numpy.concatenate(chunks) if chunks else numpy.empty(0, type_code)
+        for (name, type_code), chunks in zip(COLUMNS, columns.values())
+    }
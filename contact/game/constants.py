@@ -5,8 +5,43 @@ CONTACT_AWAITING_TIME = 5  # seconds
 GAME_TIME_LIMIT = 60 * 5  # 5 minutes
 ROOM_CLEANING_DELAY = 5  # seconds
 PLAYER_DISCONNECTION_AWAITING_TIME = 7  # seconds
-DISCONNECTION_KEY_FORMAT = "disconnection:{player_id}"
-CLEANING_ROOM_KEY_FORMAT = "cleaning:room:{room_id}"
+PRESENCE_SWEEP_INTERVAL = 1  # seconds
+PRESENCE_FLUSH_INTERVAL = 2  # seconds, should be less than the awaiting time
+PRESENCE_KEY = "presence:players"
+PRESENCE_CLAIM_LIMIT = 1000  # players claimed by a worker per sweep
+REAPER_QUEUE_KEY = "reaper:rooms"
+REAPER_SCAN_LOCK_KEY = "reaper:scan"
+REAPER_INTERVAL = 1  # seconds
+REAPER_ROOMS_PER_CLAIM = 20
+REAPER_BATCH_SIZE = 100  # keys per UNLINK
+REAPER_KEYS_PER_SECOND = 2000
+REAPER_SCAN_INTERVAL = 60 * 5  # seconds
+REAPER_SCAN_COUNT = 500  # keys per SCAN
+REAPER_SCAN_PAUSE = 0.05  # seconds between SCAN calls
+LOOP_LAG_INTERVAL = 0.1  # seconds
+LOOP_LAG_THRESHOLD = 0.1  # seconds of blocking reported with the stack
+LOOP_LAG_LOG_INTERVAL = 10  # seconds between the blocking reports
+LOOP_LAG_STACK_DEPTH = 20  # frames
+ROOM_STATS_SCAN_COUNT = 500  # rooms per SCAN
+ROOM_STATS_SCAN_PAUSE = 0.01  # seconds between batches
+ROOM_STATS_CACHE_TIMEOUT = 10  # seconds
+ROOM_STATS_OFFER_BUCKETS = (0, 1, 5, 10, 20, 50, 100)
+WORD_MAX_LENGTH = 32
+DEFINITION_MAX_LENGTH = 256
+COMMENT_MAX_LENGTH = 256
+OFFER_HINTS_MAX_LENGTH = 20  # the last comments kept
+OFFERS_PAGE_SIZE = 20  # the last offers in the room state and offers per page
+OBJECT_ID_MAX_LENGTH = 32
+ROOM_EVENTS_MAX_LENGTH = 200  # approximate number of events kept for reconnection
+OUTBOUND_QUEUE_MAX_SIZE = 64  # frames
+OUTBOUND_QUEUE_HIGH_WATERMARK = 16  # frames
+SLOW_CONSUMER_TIMEOUT = 10  # seconds over the high watermark before closing
+SLOW_CONSUMER_CLOSE_CODE = 4008
+RECONNECT_CLOSE_CODE = 4009
+# The player could not join a game, e.g. the game storage is unavailable
+GAME_UNAVAILABLE_CLOSE_CODE = 4010
+DRAIN_TIMEOUT = 30  # seconds given to clients to leave a draining worker
+HANDOFF_KEY_FORMAT = "handoff:room:{room_id}"
 
 
 class POINTS:
@@ -16,6 +51,20 @@ class POINTS:
     CONTACT_PARTICIPANT_SUCCESS = 2
 
 
+class LeaderboardPeriod:
+    GLOBAL = "global"
+    DAILY = "daily"
+    WEEKLY = "weekly"
+
+
+LEADERBOARD_TTL = {
+    LeaderboardPeriod.DAILY: 60 * 60 * 24 * 2,
+    LeaderboardPeriod.WEEKLY: 60 * 60 * 24 * 15,
+}
+LEADERBOARD_CACHE_TIMEOUT = 10  # seconds
+LEADERBOARD_MAX_PAGE_SIZE = 100
+
+
 class GameFinishReason:
     DISCONNECTION = "disconnection"
     GAME_TIME_LIMIT_EXPIRED = "time_limit_expired"
@@ -30,6 +79,12 @@ class GameEvent(Enum):
     FINISH = "finish"
     ROOM_STATE = "room_state"
     PLAYER_STATE = "player_state"
+    RECONNECT = "reconnect"
+    ERROR = "error"
+    # Heartbeat of idle clients. Clients should send a frame at least every
+    # few seconds, players not heard from for PLAYER_DISCONNECTION_AWAITING_TIME
+    # are considered disconnected
+    PING = "ping"
     # Game Actions
     OFFER = "offer"
     OFFER_COMMENT = "offer_comment"
@@ -37,3 +92,33 @@ class GameEvent(Enum):
     CONTACT = "contact"
     CONTACT_RESULT = "contact_result"
     CANCEL_CONTACT = "contact_cancel"
+    # Older offers of the room, answered only to the requesting player
+    OFFERS_PAGE = "offers_page"
+
+
+# Game actions limits: event -> (tokens per second, burst)
+CONNECTION_RATE_LIMITS = {
+    GameEvent.PLAYER_STATE: (1, 3),
+    GameEvent.SET_WORD: (0.5, 2),
+    GameEvent.OFFER: (1, 3),
+    GameEvent.OFFER_COMMENT: (1, 5),
+    GameEvent.CONTACT: (1, 3),
+    GameEvent.CANCEL_CONTACT: (2, 5),
+    GameEvent.OFFERS_PAGE: (2, 5),
+}
+ROOM_RATE_LIMITS = {
+    GameEvent.PLAYER_STATE: (3, 9),
+    GameEvent.OFFER: (3, 9),
+    GameEvent.OFFER_COMMENT: (3, 15),
+    GameEvent.CONTACT: (3, 9),
+}
+# Idempotent events which are delayed instead of rejected when limited.
+# Identical requests waiting for a token are merged into one.
+COALESCED_EVENTS = {GameEvent.PLAYER_STATE}
+# Events answered with the action result to the requesting player only
+PRIVATE_EVENTS = {GameEvent.OFFERS_PAGE}
+# Events broadcast with the room state only, a queued frame of them is
+# replaced by the next one
+STATE_EVENTS = {GameEvent.PLAYER_STATE, GameEvent.ROOM_STATE}
+# Events whose actions do not change the room
+READ_ONLY_EVENTS = {GameEvent.PLAYER_STATE, GameEvent.OFFERS_PAGE}
@@ -1,18 +1,210 @@
 import asyncio
+import collections
+import hmac
+import json
+import re
 import time
-from typing import Any, Callable, Dict, Optional
+import typing
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
 
+from asgiref.sync import sync_to_async
+from channels.generic.http import AsyncHttpConsumer
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.layers import get_channel_layer
+from django.conf import settings
 
-from contact.game.constants import GameEvent
-from contact.game.exceptions import DontTellAnyOneOfThisAction, GameException
+from contact.game import (
+    control,
+    draining,
+    loop_lag,
+    memory,
+    metrics,
+    presence,
+    profiling,
+    reaper,
+    redis_client,
+    storage,
+    storage_handler,
+    throttling,
+    traffic,
+)
+from contact.game.constants import (
+    COALESCED_EVENTS,
+    CONNECTION_RATE_LIMITS,
+    GAME_UNAVAILABLE_CLOSE_CODE,
+    PRIVATE_EVENTS,
+    READ_ONLY_EVENTS,
+    RECONNECT_CLOSE_CODE,
+    ROOM_RATE_LIMITS,
+    SLOW_CONSUMER_CLOSE_CODE,
+    STATE_EVENTS,
+    GameEvent,
+)
+from contact.game.exceptions import (
+    DontTellAnyOneOfThisAction,
+    GameActionError,
+    GameException,
+)
 from contact.game.game_manager import GameManager, GameManagerDelegate
+from contact.game.outbound import OutboundQueue
+from contact.game.payloads import decode_frame
+from contact.game.snapshots import room_snapshots
 
 JSON = Dict[str, Any]
+DRAIN_FLUSH_TIMEOUT = 1  # seconds
+ROOM_ID_RE = re.compile(r"^[0-9a-f]{1,64}$")
 
+local_room_connections: typing.Counter[str] = collections.Counter()
+local_room_rate_limiters: Dict[str, throttling.RateLimiter] = {}
 
-class ContactGameWSConsumer(GameManagerDelegate, AsyncJsonWebsocketConsumer):
+
+def is_state_frame(data: JSON) -> bool:
+    """:return: whether the frame carries the room state only"""
+    return GameEvent._value2member_map_.get(data.get("event")) in STATE_EVENTS
+
+
+def get_channel_layer_queue_depth() -> int:
+    receive_buffer = getattr(get_channel_layer(), "receive_buffer", {})
+    return sum(queue.qsize() for queue in receive_buffer.values())
+
+
+async def broadcast(room: storage.Room, data: JSON):
+    """Send a room event to all the room connections"""
+    event_id = storage.append_room_event(room, json.dumps(data))
+    await get_channel_layer().group_send(
+        group=room.id_key,
+        message={"type": "send_json_type", "data": {**data, "event_id": event_id}},
+    )
+
+
+async def finish_abandoned_games(absent_players: Dict[str, List[str]]):
+    for room_id in absent_players:
+        room = GameManager.finish_abandoned_game(room_id)
+        if room is not None:
+            await broadcast(
+                room,
+                ContactGameWSConsumer.compose_game_message(
+                    data=room.common_data, event=GameEvent.FINISH
+                ),
+            )
+
+
+ACTION_LATENCY = metrics.histogram(
+    "game_action_latency_seconds", "Game action handling time", ("event",)
+)
+ACTION_REDIS_COMMANDS = metrics.histogram(
+    "game_action_redis_commands",
+    "Redis commands issued per game action",
+    ("event",),
+    buckets=metrics.COUNT_BUCKETS,
+)
+ACTION_ERRORS = metrics.counter(
+    "game_action_errors_total", "Game actions rejected with an error", ("event",)
+)
+BROADCAST_BYTES = metrics.counter(
+    "game_broadcast_bytes_total", "Bytes sent to sockets per game event", ("event",)
+)
+RATE_LIMITED_ACTIONS = metrics.counter(
+    "game_rate_limited_actions_total",
+    "Game actions rejected or coalesced by rate limits",
+    ("event", "scope", "outcome"),
+)
+SLOW_CONSUMER_DISCONNECTIONS = metrics.counter(
+    "game_slow_consumer_disconnections_total",
+    "Sockets closed because their outbound queue was overloaded",
+).labels()
+OPEN_SOCKETS = metrics.gauge("game_open_sockets", "Open game sockets").labels()
+OPEN_SPECTATOR_SOCKETS = metrics.gauge(
+    "game_open_spectator_sockets", "Open spectator sockets"
+).labels()
+PENDING_DELAYED_TASKS = metrics.gauge(
+    "game_pending_delayed_tasks", "Delayed game actions waiting to be executed"
+).labels()
+metrics.gauge(
+    "game_active_rooms",
+    "Rooms with at least one socket in the worker",
+    function=lambda: len(local_room_connections),
+)
+metrics.gauge(
+    "game_channel_layer_queue_depth",
+    "Messages received from the channel layer but not consumed yet",
+    function=get_channel_layer_queue_depth,
+)
+
+
+class OutboundQueueMixin:
+    """
+    Frames are written to the socket by a writer task from the outbound queue.
+    Sockets which can't keep up with the queue are closed.
+    """
+
+    outbound: Optional[OutboundQueue] = None
+
+    def start_outbound(self):
+        self.outbound = OutboundQueue(
+            send=lambda text_data: self.send(text_data=text_data), close=self.close
+        )
+        self.outbound.start()
+
+    def stop_outbound(self):
+        if self.outbound is not None:
+            self.outbound.stop()
+
+    async def send_frame(self, text_data: str, snapshot=False):
+        # A stopped queue belongs to a socket which is closed already
+        if self.outbound.put(text_data, snapshot=snapshot) or self.outbound.stopped:
+            return
+
+        SLOW_CONSUMER_DISCONNECTIONS.inc()
+        self.stop_outbound()
+        await self.close(code=SLOW_CONSUMER_CLOSE_CODE)
+
+    async def send_json(self, content, close=False):
+        await self.send_frame(await self.encode_json(content))
+        if close:
+            await self.close()
+
+    async def reject(self, content: JSON, code: int):
+        """Accept the socket only to send the content and close it"""
+        await self.accept()
+        self.start_outbound()
+        await self.send_json(content)
+        await self.outbound.flush(timeout=DRAIN_FLUSH_TIMEOUT)
+        self.stop_outbound()
+        await self.close(code=code)
+
+    async def ask_to_reconnect(self):
+        """Ask the client to reconnect, it will get to a different worker"""
+        await self.send_json({"data": {}, "event": GameEvent.RECONNECT.value})
+        await self.outbound.flush(timeout=DRAIN_FLUSH_TIMEOUT)
+        await self.close(code=RECONNECT_CLOSE_CODE)
+
+    async def reject_while_draining(self) -> bool:
+        if not draining.is_draining:
+            return False
+
+        await self.accept()
+        self.start_outbound()
+        await self.ask_to_reconnect()
+        return True
+
+
+class ContactGameWSConsumer(
+    OutboundQueueMixin, GameManagerDelegate, AsyncJsonWebsocketConsumer
+):
     game_manager: GameManager
+    rate_limiter: throttling.RateLimiter
+    room_rate_limiter: throttling.RateLimiter
+    is_connected = False
+    # Id of the connection in the recorded traffic, None when not recorded
+    traffic_connection: Optional[str] = None
+    action_error: Optional[str] = None
+    created_offer_id: Optional[str] = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        memory.track(self)
 
     @property
     def room_id(self):
@@ -20,14 +212,53 @@ class ContactGameWSConsumer(GameManagerDelegate, AsyncJsonWebsocketConsumer):
 
     # Connection life cycle #
     async def connect(self):
-        self.game_manager = GameManager(user=self.scope["user"], delegate=self)
-        room = self.game_manager.append_user_to_game()
+        if await self.reject_while_draining():
+            return
+
+        try:
+            self.game_manager = GameManager(user=self.scope["user"], delegate=self)
+            room = self.game_manager.append_user_to_game()
+        except GameActionError as error:
+            ACTION_ERRORS.labels(GameEvent.START.value).inc()
+            await self.reject(
+                self.compose_error_message(error.data, GameEvent.START),
+                code=GAME_UNAVAILABLE_CLOSE_CODE,
+            )
+            return
+
         setattr(self, "_room_id", room.id_key)
+        OPEN_SOCKETS.inc()
+        local_room_connections[self.room_id] += 1
+        presence.see(self.room_id, self.game_manager.player.id_key)
+        self.is_connected = True
+        self.coalesced_requests = set()
+        self.rate_limiter = throttling.RateLimiter("connection", CONNECTION_RATE_LIMITS)
+        self.room_rate_limiter = local_room_rate_limiters.setdefault(
+            self.room_id, throttling.RateLimiter("room", ROOM_RATE_LIMITS)
+        )
+        metrics.ensure_dumping()
+        loop_lag.ensure_monitoring()
+        presence.ensure_sweeping(on_absent_players=finish_abandoned_games)
+        reaper.ensure_reaping()
+        control.ensure_listening()
+        draining.install()
+        draining.consumers.add(self)
 
         await self.channel_layer.group_add(
             group=self.room_id, channel=self.channel_name
         )
         await self.accept()
+        self.start_outbound()
+
+        if traffic.recording:
+            self.traffic_connection = traffic.record_connect(
+                username=self.scope["user"].username,
+                room_id=self.room_id,
+                restored=self.game_manager.restored,
+            )
+
+        if self.game_manager.restored and await self.resume_events():
+            return
 
         initial_content = self.compose_game_message(
             data=self.game_manager.initial_information,
@@ -40,19 +271,67 @@ class ContactGameWSConsumer(GameManagerDelegate, AsyncJsonWebsocketConsumer):
             await self.group_send(initial_content)
 
     async def disconnect(self, close_code):
-        print(close_code)
+        if not hasattr(self, "_room_id"):
+            return
+
+        OPEN_SOCKETS.dec()
+        self.is_connected = False
+        self.stop_outbound()
+        draining.consumers.discard(self)
+        local_room_connections[self.room_id] -= 1
+        if local_room_connections[self.room_id] <= 0:
+            del local_room_connections[self.room_id]
+            local_room_rate_limiters.pop(self.room_id, None)
+
+        if self.traffic_connection is not None and traffic.recording:
+            traffic.record(traffic.DISCONNECT, self.traffic_connection, close_code)
+
+        presence.forget(self.room_id, self.game_manager.player.id_key)
         self.game_manager.disconnect_player()
+        await self.channel_layer.group_discard(
+            group=self.room_id, channel=self.channel_name
+        )
+
+    async def migrate(self):
+        self.game_manager.migrate_player()
+        await self.ask_to_reconnect()
 
     # Communication #
     # Send:
     async def send_json_type(self, content: JSON, close=False):
-        await self.send_json(content["data"], close=close)
+        text_data = await self.encode_json(content["data"])
+        BROADCAST_BYTES.labels(content["data"].get("event")).inc(len(text_data))
+        await self.send_frame(text_data, snapshot=is_state_frame(content["data"]))
 
     async def group_send(self, data: JSON):
-        await self.channel_layer.group_send(
-            group=self.room_id, message={"type": "send_json_type", "data": data}
+        await broadcast(self.game_manager.room, data)
+
+    async def resume_events(self) -> bool:
+        """
+        Send a reconnected client only the room events it has missed
+        instead of the full room snapshot.
+        Events broadcast while resuming can be received twice, so clients
+        should ignore events with ids not greater than the last seen one.
+        :return: whether the missed events could be sent
+        """
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        last_event_id = query.get("last_event_id", [""])[0]
+
+        if not last_event_id:
+            return False
+
+        missed_events = storage.get_room_events_after(
+            room=self.game_manager.room, event_id=last_event_id
         )
 
+        if missed_events is None:
+            return False
+
+        for event_id, message in missed_events:
+            await self.send_json(content={**json.loads(message), "event_id": event_id})
+
+        return True
+
     async def group_send_delayed(
         self, after: int, callback: Callable, callback_kwargs: Dict
     ):
@@ -62,14 +341,12 @@ class ContactGameWSConsumer(GameManagerDelegate, AsyncJsonWebsocketConsumer):
         :param callback_kwargs: Callback keyword arguments
         :return: none
         """
-        print(f"Delayed task is executing. Will be done in {after} seconds")
-        now = time.time()
-
-        await asyncio.sleep(after)
-        response_data = await callback(**callback_kwargs)
-
-        after_t = time.time()
-        print(f"Delay is done. It consumed {after_t - now}")
+        PENDING_DELAYED_TASKS.inc()
+        try:
+            await asyncio.sleep(after)
+            response_data = await callback(**callback_kwargs)
+        finally:
+            PENDING_DELAYED_TASKS.dec()
 
         if response_data:
             await self.group_send(response_data)
@@ -83,6 +360,10 @@ class ContactGameWSConsumer(GameManagerDelegate, AsyncJsonWebsocketConsumer):
     def compose_error_message(data: JSON, event: GameEvent) -> JSON:
         return {"error": True, "data": data, "event": event.value}
 
+    async def send_error(self, error: GameException, event: GameEvent):
+        self.action_error = error.data["details"]
+        await self.send_json(content=self.compose_error_message(error.data, event))
+
     async def handle_game_action(
         self, event: str, game_data: Optional[JSON] = None
     ) -> Optional[Dict]:
@@ -91,30 +372,253 @@ class ContactGameWSConsumer(GameManagerDelegate, AsyncJsonWebsocketConsumer):
         game_event = GameEvent(event)
 
         try:
-            response_data = self.game_manager.perform_game_action(game_event, game_data)
+            if game_event in READ_ONLY_EVENTS:
+                response_data = await redis_client.retry_reads(
+                    self.perform_game_action, game_event, game_data
+                )
+            else:
+                response_data = self.perform_game_action(game_event, game_data)
         except GameException as game_error:
-            error_message = self.compose_error_message(game_error.data, game_event)
-            await self.send_json(content=error_message)
+            ACTION_ERRORS.labels(game_event.value).inc()
+            await self.send_error(game_error, game_event)
         except DontTellAnyOneOfThisAction:
             return
         else:
             return self.compose_game_message(data=response_data, event=game_event)
 
-    # receive:
-    async def receive_json(self, content: JSON, **kwargs):
-        event, game_data = content["event"], content["data"]
+    def perform_game_action(self, game_event: GameEvent, game_data: JSON) -> JSON:
+        start_time = time.perf_counter()
+        start_commands_count = storage_handler.get_commands_count()
+        loop_lag.current_action = (game_event.value, self.room_id)
+
+        try:
+            profiler = profiling.action_profiler
+            if profiler is None:
+                return self.game_manager.perform_game_action(game_event, game_data)
+
+            return profiler.call(
+                self.game_manager.perform_game_action, game_event, game_data
+            )
+        finally:
+            loop_lag.current_action = None
+            ACTION_LATENCY.labels(game_event.value).observe(
+                time.perf_counter() - start_time
+            )
+            ACTION_REDIS_COMMANDS.labels(game_event.value).observe(
+                storage_handler.get_commands_count() - start_commands_count
+            )
+
+    async def dispatch_game_action(self, event: str, game_data: JSON):
         response_data = await self.handle_game_action(event, game_data)
 
-        if response_data:
+        if not response_data:
+            return
+        if self.traffic_connection is not None and event == GameEvent.OFFER.value:
+            self.created_offer_id = traffic.find_created_offer_id(
+                response_data["data"], self.game_manager.player.id_key
+            )
+        if GameEvent(event) in PRIVATE_EVENTS:
+            await self.send_json(content=response_data)
+        else:
             await self.group_send(response_data)
 
+    # receive:
+    async def receive(self, text_data=None, bytes_data=None, **kwargs):
+        if self.traffic_connection is None or not traffic.recording:
+            await super().receive(text_data, bytes_data, **kwargs)
+            return
+
+        received_at = time.time()
+        self.action_error = self.created_offer_id = None
+        await super().receive(text_data, bytes_data, **kwargs)
+        traffic.record(
+            traffic.FRAME,
+            self.traffic_connection,
+            text_data,
+            self.action_error,
+            self.created_offer_id,
+            timestamp=received_at,
+        )
+
+    @classmethod
+    async def decode_json(cls, text_data: str) -> Any:
+        """Frames which are not JSON are rejected as malformed ones"""
+        try:
+            return json.loads(text_data)
+        except ValueError:
+            return None
+
+    async def receive_json(self, content: JSON, **kwargs):
+        if draining.is_draining:
+            return
+
+        # Any frame is a heartbeat, idle clients send pings
+        presence.see(self.room_id, self.game_manager.player.id_key)
+        if isinstance(content, dict) and content.get("event") == GameEvent.PING.value:
+            return
+
+        try:
+            game_event, game_data = decode_frame(content, GameManager.payload_schemas)
+        except GameActionError as error:
+            ACTION_ERRORS.labels(GameEvent.ERROR.value).inc()
+            await self.send_error(error, GameEvent.ERROR)
+            return
+
+        event = game_event.value
+        limited_scope, delay = throttling.acquire(
+            game_event, self.rate_limiter, self.room_rate_limiter
+        )
+
+        if limited_scope is None:
+            await self.dispatch_game_action(event, game_data)
+        elif game_event in COALESCED_EVENTS:
+            RATE_LIMITED_ACTIONS.labels(event, limited_scope, "coalesced").inc()
+            self.coalesce_game_action(game_event, game_data, delay)
+        else:
+            RATE_LIMITED_ACTIONS.labels(event, limited_scope, "rejected").inc()
+            await self.send_error(GameActionError("Too many requests"), game_event)
+
+    def coalesce_game_action(self, game_event: GameEvent, game_data: JSON, delay):
+        """
+        Perform a limited idempotent action once a token is available.
+        Identical requests received while waiting are merged into this one.
+        """
+        request_key = (game_event, json.dumps(game_data, sort_keys=True))
+
+        if request_key not in self.coalesced_requests:
+            self.coalesced_requests.add(request_key)
+            asyncio.create_task(
+                self.perform_coalesced_action(request_key, game_data, delay)
+            )
+
+    async def perform_coalesced_action(
+        self, request_key: Tuple[GameEvent, str], game_data: JSON, delay: float
+    ):
+        game_event = request_key[0]
+        acquired = False
+
+        try:
+            while not acquired and self.is_connected:
+                await asyncio.sleep(delay)
+                limited_scope, delay = throttling.acquire(
+                    game_event, self.rate_limiter, self.room_rate_limiter
+                )
+                acquired = limited_scope is None
+        finally:
+            self.coalesced_requests.discard(request_key)
+
+        if acquired and self.is_connected:
+            await self.dispatch_game_action(game_event.value, game_data)
+
     # Game Manager Delegate #
     def order_delayed_action(self, after: int, event: GameEvent, action_kwargs=None):
         action_kwargs = action_kwargs or {}
-        asyncio.create_task(
+        task = asyncio.create_task(
             self.group_send_delayed(
                 after=after,
                 callback=self.handle_game_action,
                 callback_kwargs={"event": event, "game_data": action_kwargs},
             )
         )
+        draining.track_delayed_action(
+            task,
+            room_id=self.game_manager.room.id_key,
+            after=after,
+            event=event,
+            action_kwargs=action_kwargs,
+        )
+
+
+class ContactGameSpectatorConsumer(OutboundQueueMixin, AsyncJsonWebsocketConsumer):
+    """
+    Read-only connection to a room. Spectators only join the room channel group
+    and never act as players, so they don't need a GameManager. The snapshot
+    cache makes joining and receiving broadcasts free of per spectator
+    redis reads and encodings.
+    """
+
+    room_id: Optional[str] = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        memory.track(self)
+
+    async def connect(self):
+        if await self.reject_while_draining():
+            return
+
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        room_id = query.get("spectate", [""])[0]
+        snapshot = None
+
+        if ROOM_ID_RE.match(room_id):
+            snapshot = room_snapshots.acquire(room_id)
+
+        if snapshot is None:
+            await self.close()
+            return
+
+        self.room_id = room_id
+        OPEN_SPECTATOR_SOCKETS.inc()
+        metrics.ensure_dumping()
+        loop_lag.ensure_monitoring()
+        presence.ensure_sweeping(on_absent_players=finish_abandoned_games)
+        reaper.ensure_reaping()
+        control.ensure_listening()
+        draining.install()
+        draining.consumers.add(self)
+
+        await self.channel_layer.group_add(group=room_id, channel=self.channel_name)
+        await self.accept()
+        self.start_outbound()
+        await self.send_frame(snapshot, snapshot=True)
+
+    async def disconnect(self, close_code):
+        if self.room_id is None:
+            return
+
+        OPEN_SPECTATOR_SOCKETS.dec()
+        self.stop_outbound()
+        draining.consumers.discard(self)
+        room_snapshots.release(self.room_id)
+        await self.channel_layer.group_discard(
+            group=self.room_id, channel=self.channel_name
+        )
+
+    async def send_json_type(self, content: JSON, close=False):
+        text_data = room_snapshots.encode(self.room_id, content["data"])
+        BROADCAST_BYTES.labels(content["data"].get("event")).inc(len(text_data))
+        await self.send_frame(text_data, snapshot=is_state_frame(content["data"]))
+
+    async def receive_json(self, content: JSON, **kwargs):
+        """Spectators are not able to perform game actions"""
+
+    async def migrate(self):
+        await self.ask_to_reconnect()
+
+
+class MetricsConsumer(AsyncHttpConsumer):
+    """
+    Metrics of all the workers in the Prometheus text format. Scrapers are
+    authenticated by the `GAME_METRICS_TOKEN` bearer token, nothing is served
+    while the token is not set.
+    """
+
+    def is_authorized(self) -> bool:
+        token = settings.GAME_METRICS_TOKEN
+        authorization = dict(self.scope["headers"]).get(b"authorization", b"")
+        return bool(token) and hmac.compare_digest(
+            authorization, f"Bearer {token}".encode()
+        )
+
+    async def handle(self, body):
+        if not self.is_authorized():
+            await self.send_response(403, b"Forbidden")
+            return
+
+        text = await sync_to_async(metrics.render_all_workers)()
+        await self.send_response(
+            200,
+            text.encode(),
+            headers=[(b"Content-Type", b"text/plain; version=0.0.4; charset=utf-8")],
+        )
@@ -0,0 +1,108 @@
+"""
+Runtime control of the game workers.
+
+Commands are published to a redis pub/sub channel, so every worker receives
+them. Each worker listens to the channel in a daemon thread, that's why
+command handlers must be thread safe or hand the work over to the event loop.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List
+
+from django.conf import settings
+
+from contact.game import storage_handler
+from contact.game.utils import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+CONTROL_CHANNEL = "game:control"
+RECONNECTION_DELAY = 1  # seconds
+
+handlers: Dict[str, Callable] = {}
+subscription_handlers: List[Callable] = []
+# Whether the worker receives the commands published now
+subscribed = False
+_listener_pid = None
+
+
+def command(name: str):
+    """Register a function as a handler of the control command"""
+
+    def decorator(func):
+        handlers[name] = func
+        return func
+
+    return decorator
+
+
+def on_subscribe(func):
+    """
+    Register a function called whenever the worker subscribes to the channel,
+    commands published while the worker was not subscribed are never received
+    """
+    subscription_handlers.append(func)
+    return func
+
+
+def publish(name: str, **kwargs) -> int:
+    """
+    :return: number of workers which have received the command
+    """
+    return storage_handler.redis.publish(
+        CONTROL_CHANNEL, json.dumps({"command": name, "kwargs": kwargs})
+    )
+
+
+def dispatch(raw_message: bytes):
+    message = json.loads(raw_message)
+    handler = handlers.get(message["command"])
+
+    if handler is None:
+        logger.warning("Unknown control command %s", message["command"])
+        return
+
+    handler(**message["kwargs"])
+
+
+def listen():
+    global subscribed
+
+    while True:
+        try:
+            # The game storage pool has read timeouts and a bounded size, an
+            # idle subscription should hold neither
+            pubsub = get_redis_connection().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CONTROL_CHANNEL)
+            for handler in subscription_handlers:
+                handler()
+            subscribed = True
+
+            for message in pubsub.listen():
+                try:
+                    dispatch(message["data"])
+                except Exception:
+                    logger.exception("Control command failed")
+        except Exception:
+            subscribed = False
+            logger.exception("Control channel connection is lost")
+            time.sleep(RECONNECTION_DELAY)
+
+
+def ensure_listening():
+    """Start listening to control commands, if the worker does not listen yet"""
+    global _listener_pid
+
+    if _listener_pid == os.getpid():
+        return
+
+    _listener_pid = os.getpid()
+    threading.Thread(target=listen, name="game-control", daemon=True).start()
+
+
+def diagnostics_path(name: str) -> str:
+    os.makedirs(settings.GAME_DIAGNOSTICS_DIR, exist_ok=True)
+    return os.path.join(settings.GAME_DIAGNOSTICS_DIR, f"{name}-{os.getpid()}")
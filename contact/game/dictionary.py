@@ -0,0 +1,156 @@
+import array
+import bisect
+import mmap
+import os
+import struct
+import sys
+import time
+from typing import Iterable, Optional, Sequence
+
+from django.conf import settings
+
+# File layout (all integers are unsigned 32 bit in the byte order of the
+# machine which has built the file):
+#   magic | byte order | words count | offsets[count + 1] | utf-8 words blob
+# Words are sorted by their utf-8 bytes so the blob can be bisected directly.
+MAGIC = b"CWD1"
+HEADER = struct.Struct("4sc3xI")
+BYTE_ORDER = sys.byteorder[0].encode()
+# A missing dictionary is looked for again after the interval, so a worker
+# picks up a dictionary built after it has started
+MISSING_RECHECK_INTERVAL = 60  # seconds
+
+_dictionary = None
+_dictionary_missing_at: Optional[float] = None
+
+
+def normalize_word(word: str, locale: Optional[str] = None) -> str:
+    """
+    The form words are stored and compared in, both by the dictionary and by
+    the game. `locale` defaults to the `LANGUAGE_CODE` setting.
+    """
+    locale = locale or settings.LANGUAGE_CODE
+    word = word.strip().lower()
+    if locale == "ru-ru":
+        word = word.replace("ё", "е")
+    return word
+
+
+def build_dictionary(
+    words: Iterable[str], path: str, locale: Optional[str] = None
+) -> int:
+    """
+    Write a sorted words array to the `path`.
+    :return: number of unique words written
+    """
+    normalized_words = (normalize_word(word, locale) for word in words)
+    encoded_words = sorted({word.encode() for word in normalized_words if word})
+    offsets = array.array("I", [0])
+
+    for word in encoded_words:
+        offsets.append(offsets[-1] + len(word))
+
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, BYTE_ORDER, len(encoded_words)))
+        offsets.tofile(file)
+        for word in encoded_words:
+            file.write(word)
+
+    return len(encoded_words)
+
+
+class _SortedWords:
+    """Sequence view over the memory-mapped words used by `bisect`"""
+
+    def __init__(self, buffer: mmap.mmap):
+        magic, byte_order, count = HEADER.unpack_from(buffer)
+
+        if magic != MAGIC:
+            raise ValueError("File is not a word dictionary")
+        if byte_order != BYTE_ORDER:
+            raise ValueError("Word dictionary was built with a different byte order")
+
+        offsets_end = HEADER.size + (count + 1) * 4
+        self._buffer = buffer
+        self._offsets = memoryview(buffer)[HEADER.size : offsets_end].cast("I")
+        self._blob_start = offsets_end
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index: int) -> bytes:
+        start = self._blob_start + self._offsets[index]
+        end = self._blob_start + self._offsets[index + 1]
+        return self._buffer[start:end]
+
+
+class WordDictionary:
+    """
+    Read-only dictionary backed by a memory-mapped file. The file is mapped
+    with shared pages, so every worker process on a host uses the same
+    physical memory for it.
+    """
+
+    def __init__(self, path: str, locale: Optional[str] = None):
+        self.path = path
+        self.locale = locale
+        self._mmap: Optional[mmap.mmap] = None
+        self._words: Sequence[bytes] = ()
+
+        with open(path, "rb") as file:
+            # An empty file can't be mapped, it is a dictionary without words
+            if os.fstat(file.fileno()).st_size:
+                self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._words = _SortedWords(self._mmap)
+
+    def __len__(self):
+        return len(self._words)
+
+    def _encode(self, word: str) -> bytes:
+        return normalize_word(word, self.locale).encode()
+
+    def is_word(self, word: str) -> bool:
+        encoded_word = self._encode(word)
+        if not encoded_word:
+            return False
+
+        index = bisect.bisect_left(self._words, encoded_word)
+        return index < len(self._words) and self._words[index] == encoded_word
+
+
+def get_dictionary() -> Optional[WordDictionary]:
+    """
+    Lazily map the dictionary configured by `GAME_DICTIONARY_PATH`.
+    Returns None while the dictionary file is not built, the file is looked
+    for again every MISSING_RECHECK_INTERVAL.
+    """
+    global _dictionary, _dictionary_missing_at
+
+    if _dictionary is not None:
+        return _dictionary
+
+    if (
+        _dictionary_missing_at is not None
+        and time.monotonic() - _dictionary_missing_at < MISSING_RECHECK_INTERVAL
+    ):
+        return None
+
+    try:
+        _dictionary = WordDictionary(
+            path=settings.GAME_DICTIONARY_PATH, locale=settings.LANGUAGE_CODE
+        )
+    except FileNotFoundError:
+        _dictionary_missing_at = time.monotonic()
+
+    return _dictionary
+
+
+def is_known_word(word: str) -> bool:
+    """Words are not validated until the dictionary is built"""
+    dictionary = get_dictionary()
+
+    if dictionary is None:
+        return True
+
+    return dictionary.is_word(word)
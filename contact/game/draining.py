@@ -0,0 +1,118 @@
+"""
+Graceful draining of a worker for rolling deploys.
+
+A draining worker stops listening on the socket shared by the workers, so new
+connections are accepted by the other workers, and asks its clients to
+reconnect (to a different worker) with the `reconnect` event. Connections
+accepted before are rejected the same way. Players are
+marked as migrating, so their disconnection does not finish games, and the
+delayed game actions held by the worker are handed off through the storage
+to the worker the room players reconnect to. The worker exits once all its
+sockets are gone.
+
+Draining is started by the SIGUSR2 signal or `manage.py drain_workers`.
+"""
+import asyncio
+import collections
+import logging
+import os
+import signal
+import time
+import weakref
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from contact.game import control, storage
+from contact.game.constants import DRAIN_TIMEOUT, GameEvent
+
+logger = logging.getLogger(__name__)
+
+DRAIN_SIGNAL = signal.SIGUSR2
+
+
+class PendingAction(NamedTuple):
+    room_id: str
+    event: str
+    action_kwargs: Dict[str, Any]
+    due_time: float
+
+
+is_draining = False
+consumers: "weakref.WeakSet" = weakref.WeakSet()
+pending_actions: Dict[asyncio.Task, PendingAction] = {}
+# Twisted ports of the worker server listening on the shared socket
+listening_ports: List[Any] = []
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def install():
+    """Let the worker be drained by the signal, should be called in the loop"""
+    global _loop
+
+    if _loop is None:
+        _loop = asyncio.get_event_loop()
+        _loop.add_signal_handler(DRAIN_SIGNAL, start_draining)
+
+
+def track_delayed_action(
+    task: asyncio.Task, room_id: str, after: float, event, action_kwargs: dict
+):
+    pending_actions[task] = PendingAction(
+        room_id=room_id,
+        event=GameEvent(event).value,
+        action_kwargs=action_kwargs,
+        due_time=time.time() + after,
+    )
+    task.add_done_callback(lambda done_task: pending_actions.pop(done_task, None))
+
+
+def stop_listening():
+    """Leave the connections of the shared socket to the other workers"""
+    while listening_ports:
+        listening_ports.pop().stopListening()
+
+
+def hand_off_pending_actions():
+    """Store the delayed actions of the worker to be resumed by a different one"""
+    actions_by_room = collections.defaultdict(list)
+
+    for task, action in list(pending_actions.items()):
+        actions_by_room[action.room_id].append(action._asdict())
+        task.cancel()
+
+    for room_id, actions in actions_by_room.items():
+        storage.hand_off_room_actions(room_id=room_id, actions=actions)
+
+
+async def drain():
+    global is_draining
+
+    if is_draining:
+        return
+
+    is_draining = True
+    logger.warning("Worker %s is draining %s sockets", os.getpid(), len(consumers))
+
+    stop_listening()
+    hand_off_pending_actions()
+    await asyncio.gather(
+        *(consumer.migrate() for consumer in list(consumers)), return_exceptions=True
+    )
+
+    deadline = time.monotonic() + DRAIN_TIMEOUT
+    while len(consumers) and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+
+    # Actions ordered while sockets were closing
+    hand_off_pending_actions()
+    logger.warning("Worker %s is drained", os.getpid())
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+def start_draining():
+    asyncio.ensure_future(drain(), loop=_loop)
+
+
+@control.command("drain")
+def drain_command(pid: Optional[int] = None):
+    if _loop is not None and pid in (None, os.getpid()):
+        _loop.call_soon_threadsafe(start_draining)
@@ -15,5 +15,16 @@ class GameActionError(GameException):
     error_type = "action"
 
 
+class GameStorageError(GameActionError):
+    """
+    The game storage failed the action
+    :param retryable: whether the action may succeed when it is repeated
+    """
+
+    def __init__(self, details, retryable=False):
+        super().__init__(details)
+        self.retryable = retryable
+
+
 class DontTellAnyOneOfThisAction(Exception):
     pass
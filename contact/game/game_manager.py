@@ -1,16 +1,30 @@
 import random
+import time
 import weakref
 from typing import Any, Callable, Dict, Optional
 
 from django.contrib.auth import get_user_model
 
-from contact.game import storage
+from contact.game import (
+    analytics,
+    dictionary,
+    memory,
+    room_registry,
+    storage,
+    tracing,
+)
 from contact.game.constants import (
+    COMMENT_MAX_LENGTH,
     CONTACT_AWAITING_TIME,
+    DEFINITION_MAX_LENGTH,
     GAME_TIME_LIMIT,
     NUMBER_OF_PLAYERS_TO_START,
+    OBJECT_ID_MAX_LENGTH,
     PLAYER_DISCONNECTION_AWAITING_TIME,
     POINTS,
+    PRIVATE_EVENTS,
+    READ_ONLY_EVENTS,
+    WORD_MAX_LENGTH,
     GameEvent,
     GameFinishReason,
 )
@@ -19,6 +33,7 @@ from contact.game.exceptions import (
     GameActionError,
     GameRuleError,
 )
+from contact.game.payloads import PayloadField, PayloadSchema
 
 User = get_user_model()
 JSON = Dict[str, Any]
@@ -47,7 +62,43 @@ class GameManagerDelegate:
         raise NotImplementedError
 
 
-class GameManager:
+def game_action(event: GameEvent, delayed=False, **fields: PayloadField):
+    """
+    Register the method as the handler of the event with the payload schema
+    :param delayed: whether the action is only ordered by the server with
+        `order_delayed_action`, clients are not able to send its event
+    """
+
+    def decorator(method: Callable) -> Callable:
+        method.game_event = event
+        method.payload_schema = PayloadSchema(fields)
+        method.delayed = delayed
+        return method
+
+    return decorator
+
+
+class GameManagerMeta(type):
+    def __new__(mcls, name, bases, attrs, **kwargs):
+        new_class = super().__new__(mcls, name, bases, attrs, **kwargs)
+        new_class._actions = {}
+        new_class.payload_schemas = {}
+
+        for base in reversed(bases):
+            new_class._actions.update(getattr(base, "_actions", {}))
+            new_class.payload_schemas.update(getattr(base, "payload_schemas", {}))
+
+        for attr in attrs.values():
+            if hasattr(attr, "game_event"):
+                new_class._actions[attr.game_event] = attr
+                # Schemas of the events accepted from clients
+                if not attr.delayed:
+                    new_class.payload_schemas[attr.game_event] = attr.payload_schema
+
+        return new_class
+
+
+class GameManager(metaclass=GameManagerMeta):
     """
     GameManager is single for player and websocket consumer
     All the game logic should be implemented in a sync way.
@@ -62,7 +113,9 @@ class GameManager:
         # noinspection PyTypeChecker
         self.player = player
         self.restored = not created
+        self.migrating = False
         super().__init__()
+        memory.track(self)
 
     @property
     def delegate(self) -> GameManagerDelegate:
@@ -70,8 +123,8 @@ class GameManager:
 
     @property
     def initial_information(self) -> JSON:
-        self.refresh()
-        self.room.get_offers()
+        self.room = room_registry.get(self.room.id_key) or self.room
+        self.player.refresh()
         return self.room.common_data
 
     @property
@@ -89,83 +142,156 @@ class GameManager:
 
     def append_user_to_game(self) -> storage.Room:
         if self.restored:
-            storage.delete_player_from_disconnected(self.player)
-            room = storage.Room.get_by_id(obj_id=self.player.room_id)
+            room = room_registry.get(self.player.room_id)
         else:
             room = storage.Room.get_free_room() or storage.Room.create_room()
             storage.append_player_to_room(self.player, room)
+            self.room = room
 
             if room.number_of_players == NUMBER_OF_PLAYERS_TO_START:
                 room.game_host_key = self.select_host(room)
                 room.unfree()
                 room.is_full = True
+                room.started_at = int(time.time())
                 room.save()
+                analytics.record(
+                    GameEvent.START, room_id=room.id_key, started_at=room.started_at
+                )
                 self.delegate.order_delayed_action(
                     after=GAME_TIME_LIMIT,
                     event=GameEvent.FINISH,
                     action_kwargs={"reason": GameFinishReason.GAME_TIME_LIMIT_EXPIRED},
                 )
 
+            room_registry.changed(room.id_key)
+            room = room_registry.get(room.id_key) or room
+
         self.room = room
+        self.touch_presence()
+        self.resume_handed_off_actions()
         return room
 
+    def touch_presence(self, grace_time: float = 0):
+        storage.touch_players(
+            {(self.room.id_key, self.player.id_key): time.time() + grace_time}
+        )
+
+    def resume_handed_off_actions(self):
+        for action in storage.claim_room_actions(self.room):
+            self.delegate.order_delayed_action(
+                after=max(0, action["due_time"] - time.time()),
+                event=GameEvent(action["event"]),
+                action_kwargs=action["action_kwargs"],
+            )
+
+    def migrate_player(self):
+        """The player is moving to a different worker and will be back soon"""
+        self.migrating = True
+
     def disconnect_player(self):
-        if self.room.is_full:
-            if not storage.room_is_cleaning(self.room) and storage.room_exist(
-                self.room
-            ):
-                self.delegate.order_delayed_action(
-                    after=PLAYER_DISCONNECTION_AWAITING_TIME,
-                    event=GameEvent.FINISH,
-                    action_kwargs={"reason": GameFinishReason.DISCONNECTION},
-                )
-            storage.set_player_disconnected(self.player)
+        """
+        The player is last seen now. Games of players who are not back in
+        PLAYER_DISCONNECTION_AWAITING_TIME are finished by the presence sweeper,
+        migrating players are given twice as much time.
+        """
+        self.touch_presence(
+            grace_time=PLAYER_DISCONNECTION_AWAITING_TIME if self.migrating else 0
+        )
+
+    @staticmethod
+    def finish_abandoned_game(room_id: str) -> Optional[storage.Room]:
+        """
+        Finish the game of a room left by a player
+        :return: the finished room or None when there is no game to finish
+        """
+        room = storage.Room.get_by_id(obj_id=room_id)
+
+        if room is None or room.game_is_finished:
+            storage.forget_room_presence(room_id)
+            return None
+
+        if not room.is_full or storage.room_is_cleaning(room):
+            return None
+
+        room.winner = "none"
+        room.game_is_finished = True
+        room.game_finish_reason = GameFinishReason.DISCONNECTION
+        room.save()
+        room_registry.changed(room_id)
+        storage.order_room_cleaning(room)
+        analytics.record(
+            GameEvent.FINISH,
+            room_id=room_id,
+            started_at=room.started_at,
+            reason=GameFinishReason.DISCONNECTION,
+        )
+        room.get_offers()
+        return room
 
     def refresh(self):
         self.room.refresh()
         self.player.refresh()
 
+    def record_event(self, event: GameEvent, **details):
+        analytics.record(
+            event, room_id=self.room.id_key, started_at=self.room.started_at, **details
+        )
+
+    def get_room_offer(self, offer_id: str) -> storage.Offer:
+        """:raises GameActionError: when the room has no such offer"""
+        offer = storage.Offer.get_by_id(offer_id)
+        if offer is None or offer.room_id != self.room.id_key:
+            raise GameActionError("Offer does not exist")
+        return offer
+
     # Game actions #
 
+    @game_action(GameEvent.PLAYER_STATE)
     def action_player_state(self) -> storage.Player:
         self.player.refresh()
         return self.player
 
+    @game_action(
+        GameEvent.FINISH, delayed=True, reason=PayloadField(str, OBJECT_ID_MAX_LENGTH)
+    )
     def action_finish_game(self, reason):
         self.refresh()
-        self.room.game_is_finished = True
-
-        if reason == GameFinishReason.DISCONNECTION:
-            player_still_disconnected = storage.check_for_disconnected_player(
-                player=self.player
-            )
-            if player_still_disconnected:
-                self.room.winner = "none"
-                self.room.game_is_finished = True
-                self.room.game_finish_reason = GameFinishReason.DISCONNECTION
-                storage.order_room_cleaning(self.room)
-            else:
-                # Could not think of anything better ¯\_(ツ)_/¯
-                raise DontTellAnyOneOfThisAction()
+        # The game may be finished by a different finish ordered earlier
+        if self.room.game_is_finished:
+            raise DontTellAnyOneOfThisAction
 
+        self.room.game_is_finished = True
+        self.room.game_finish_reason = reason
         self.room.save()
+        storage.order_room_cleaning(self.room)
+        self.record_event(GameEvent.FINISH, reason=reason)
 
+    @game_action(GameEvent.SET_WORD, word=PayloadField(str, WORD_MAX_LENGTH))
     def action_word(self, word: str):
         """After setting word users get room state"""
         self.player.refresh()
         if not self.player.is_game_host:
             raise GameRuleError("Only game host is able to set a room word")
 
-        self.room.hosted_word = word.lower()
+        if not dictionary.is_known_word(word):
+            raise GameActionError("Unknown word")
+
+        self.room.hosted_word = dictionary.normalize_word(word)
         self.room.game_is_started = True
         self.room.save()
 
+    @game_action(
+        GameEvent.OFFER,
+        answer=PayloadField(str, WORD_MAX_LENGTH),
+        definition=PayloadField(str, DEFINITION_MAX_LENGTH),
+    )
     def action_offer(self, answer: str, definition: str):
         if self.player.id_key == self.room.game_host_key:
             raise GameRuleError("Game host is not able to offer guesses")
 
+        answer = dictionary.normalize_word(answer)
         offer_is_relevant = storage.check_answer_relevance(
-            answer=answer.lower(), room=self.room
+            answer=answer, room=self.room
         )
 
         if not offer_is_relevant:
@@ -173,18 +299,28 @@ class GameManager:
 
         answer_cut = answer[: self.room.open_letters_number]
 
-        if answer_cut.lower() != self.room.open_word:
+        if answer_cut != self.room.open_word:
             raise GameActionError("Answer does not fit open letters")
 
+        if not dictionary.is_known_word(answer):
+            raise GameActionError("Unknown word")
+
         offer = storage.Offer.create_object(
+            room_id=self.room.id_key,
             sender_id=self.player.id_key,
             definition=definition.lower(),
-            answer_internal=answer.lower(),
+            answer_internal=answer,
         )
         storage.append_offer_to_room(offer, self.room)
+        self.record_event(GameEvent.OFFER, word_length=len(answer))
 
+    @game_action(
+        GameEvent.OFFER_COMMENT,
+        offer_id=PayloadField(str, OBJECT_ID_MAX_LENGTH),
+        comment_text=PayloadField(str, COMMENT_MAX_LENGTH),
+    )
     def action_comment_offer(self, offer_id: str, comment_text: str):
-        offer = storage.Offer.get_by_id(offer_id)
+        offer = self.get_room_offer(offer_id)
         if offer.is_canceled:
             raise GameRuleError("Canceled offers can not be commented")
 
@@ -192,15 +328,19 @@ class GameManager:
             raise GameRuleError("Only offer sender is able to comment it")
 
         offer.hints.append(comment_text)
-        offer.save()
 
+    @game_action(
+        GameEvent.CANCEL_CONTACT,
+        offer_id=PayloadField(str, OBJECT_ID_MAX_LENGTH),
+        estimated_word=PayloadField(str, WORD_MAX_LENGTH),
+    )
     def action_cancel(self, offer_id: str, estimated_word: str):
         """
         :param offer_id: Offer storage id
         :param estimated_word: Estimated word, which should be meant by offer sender
         """
 
-        offer = storage.Offer.get_by_id(offer_id)
+        offer = self.get_room_offer(offer_id)
 
         if not self.player.id_key == self.room.game_host_key:
             raise GameRuleError("Only game host is able to cancel guesses")
@@ -208,19 +348,31 @@ class GameManager:
         if offer.is_canceled:
             raise GameRuleError("Offers can't be canceled multiple times")
 
-        if offer.answer_internal == estimated_word.lower():
+        canceled = offer.answer_internal == dictionary.normalize_word(estimated_word)
+        if canceled:
             offer.is_canceled = True
             offer.save()
-            self.player.increase_points(by=POINTS.CONTACT_CANCEL)
+            storage.award_points({self.player.id_key: POINTS.CONTACT_CANCEL})
 
+        self.record_event(
+            GameEvent.CANCEL_CONTACT,
+            word_length=len(offer.answer_internal),
+            success=canceled,
+        )
+
+    @game_action(
+        GameEvent.CONTACT,
+        offer_id=PayloadField(str, OBJECT_ID_MAX_LENGTH),
+        estimated_word=PayloadField(str, WORD_MAX_LENGTH),
+    )
     def action_accept_offer(self, offer_id: str, estimated_word: str):
         if self.room.contact_in_process:
             raise GameRuleError(
                 "It is forbidden to accept multiple offers simultaneously"
             )
 
-        offer = storage.Offer.get_by_id(offer_id)
-        estimated_word = estimated_word.lower()
+        offer = self.get_room_offer(offer_id)
+        estimated_word = dictionary.normalize_word(estimated_word)
         estimated_word_cut = estimated_word[: self.room.open_letters_number]
 
         if offer.sender_id == self.player.id_key:
@@ -229,9 +381,12 @@ class GameManager:
         if offer.is_canceled:
             raise GameRuleError("It is forbidden to guess canceled offers")
 
-        if estimated_word_cut.lower() != self.room.open_word:
+        if estimated_word_cut != self.room.open_word:
             raise GameActionError("Estimated word does not fit open letters")
 
+        if not dictionary.is_known_word(estimated_word):
+            raise GameActionError("Unknown word")
+
         offer.in_process = True
         offer.participants.append(self.player.id_key)
         offer.estimated_word = estimated_word
@@ -239,65 +394,110 @@ class GameManager:
 
         self.room.contact_in_process = True
         self.room.contact_offer_key = offer.id_key
+        self.room.contact_player_key = self.player.id_key
         self.room.save()
 
         self.delegate.order_delayed_action(
             after=CONTACT_AWAITING_TIME, event=GameEvent.CONTACT_RESULT
         )
+        self.record_event(GameEvent.CONTACT, word_length=len(estimated_word))
 
+    @staticmethod
+    def get_contact_points(offer: storage.Offer, initiator_id: str) -> Dict[str, int]:
+        """
+        The player of the contact initiated it, the offer sender and the
+        players who accepted the offer before participated in it
+        """
+        points = {
+            player_id: POINTS.CONTACT_PARTICIPANT_SUCCESS
+            for player_id in (offer.sender_id, *offer.participants)
+        }
+        points[initiator_id] = POINTS.CONTACT_INITIATOR_SUCCESS
+        return points
+
+    @game_action(GameEvent.CONTACT_RESULT, delayed=True)
     def action_contact_result(self):
         """
         Should be evoked in a specific time after contact action
         to provide the game host some time to cancel the offer
         """
-        processed_offer = storage.Offer.get_by_id(self.room.contact_offer_key)
+        if not self.room.contact_in_process:
+            raise GameActionError("No contact is in progress")
+
+        processed_offer = self.get_room_offer(self.room.contact_offer_key)
 
         success = not processed_offer.is_canceled and (
             processed_offer.estimated_word == processed_offer.answer_internal
         )
         processed_offer.is_contacted = success
         processed_offer.save()
+        self.record_event(
+            GameEvent.CONTACT_RESULT,
+            word_length=len(processed_offer.answer_internal),
+            success=success,
+        )
 
-        if len(self.room.hosted_word) - self.room.open_letters_number == 1 or (
-            self.room.hosted_word == processed_offer.estimated_word and success
+        if (
+            len(self.room.hosted_word) - self.room.open_letters_number == 1
+            or (self.room.hosted_word == processed_offer.estimated_word and success)
+            or processed_offer.answer_internal == self.room.hosted_word
         ):
-            self.delegate.order_delayed_action(after=0.5, event=GameEvent.FINISH)
-
-        if processed_offer.answer_internal == self.room.hosted_word:
-            self.delegate.order_delayed_action(after=0.5, event=GameEvent.FINISH)
+            self.delegate.order_delayed_action(
+                after=0.5,
+                event=GameEvent.FINISH,
+                action_kwargs={"reason": GameFinishReason.PLAYERS_WON},
+            )
 
         if success:
+            # Participants are read before the offers are deleted
+            storage.award_points(
+                self.get_contact_points(
+                    processed_offer, initiator_id=self.room.contact_player_key
+                )
+            )
             self.room.increment_open_letters_number()
             self.room.clear_offers()
             storage.mark_offer_as_processed(offer=processed_offer, room=self.room)
-            # TODO: Think of moving this logic out of the method to separate action
-            # TODO: to let the client understand when their points are updated
-            # contact_initiator = storage.Player.get_by_id(contact.initiator_id)
-            # contact_initiator.increase_points(POINTS.CONTACT_INITIATOR_SUCCESS)
-            #
-            # for participant in (
-            #     storage.Player.get_by_id(p_id) for p_id in processed_offer.participants
-            # ):
-            #     participant.increase_points(by=POINTS.CONTACT_PARTICIPANT_SUCCESS)
 
         self.room.contact_in_process = False
         self.room.save()
 
+    @game_action(GameEvent.OFFERS_PAGE, cursor=PayloadField(int))
+    def action_offers_page(self, cursor: int) -> JSON:
+        """
+        :param cursor: `offers_cursor` of the room state or of the previous page
+        """
+        if cursor < 0:
+            raise GameActionError("Cursor can't be negative")
+
+        return self.room.get_offers_page(cursor)
+
     # Game action handling #
     def switch_action(self, event: GameEvent) -> Callable:
-        return {
-            GameEvent.FINISH: self.action_finish_game,
-            GameEvent.PLAYER_STATE: self.action_player_state,
-            GameEvent.SET_WORD: self.action_word,
-            GameEvent.OFFER: self.action_offer,
-            GameEvent.OFFER_COMMENT: self.action_comment_offer,
-            GameEvent.CONTACT: self.action_accept_offer,
-            GameEvent.CANCEL_CONTACT: self.action_cancel,
-            GameEvent.CONTACT_RESULT: self.action_contact_result,
-        }[event]
+        return self._actions[event].__get__(self)
 
     def perform_game_action(self, event: GameEvent, data: JSON) -> Optional[JSON]:
-        self.room.refresh()
-        self.switch_action(event)(**data)
-        self.room.get_offers()
-        return self.room.common_data
+        action_token = tracing.current_action.set(event.value)
+        try:
+            if event in READ_ONLY_EVENTS:
+                room = room_registry.get(self.room.id_key)
+            else:
+                room = room_registry.get_for_update(self.room.id_key)
+            if room is None:
+                raise GameActionError("The game is over")
+            self.room = room
+
+            try:
+                result = self._actions[event](self, **data)
+            except Exception:
+                # The room shared by the worker may be changed partially
+                room_registry.invalidate(room.id_key)
+                raise
+
+            if event in PRIVATE_EVENTS:
+                return result
+            if event not in READ_ONLY_EVENTS:
+                room_registry.updated(room)
+            return self.room.common_data
+        finally:
+            tracing.current_action.reset(action_token)
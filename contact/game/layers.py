@@ -0,0 +1,164 @@
+"""
+Channel layer delivering group messages to the members of the same worker in
+process.
+
+Every worker tracks which of its own channels are members of each group. A
+group send puts the message straight into the receive buffers of those
+channels and goes through Redis only for the members of other workers, so
+broadcasting to a room whose players share the worker costs no message
+publishing, no blocking pops and no serialization round trip. Members are
+still stored in Redis, the group lookup stays the same and the message order
+of a sender is kept for every member.
+
+A group found to have no members in other workers is remembered, and sends
+to it do not read the members from Redis at all. Joins are announced on the
+control channel, so a join in a different worker makes the group go through
+Redis again. The groups are remembered only while the worker is subscribed
+to the control channel, and forgotten when it subscribes again.
+"""
+import asyncio
+import collections
+import contextvars
+import os
+import weakref
+from typing import DefaultDict, Set
+
+from channels_redis.core import RedisChannelLayer
+
+from contact.game import control, metrics
+
+DELIVERIES = metrics.counter(
+    "game_channel_layer_deliveries_total",
+    "Group messages delivered to channels in process or through Redis",
+    ("route",),
+)
+LOCAL_DELIVERIES = DELIVERIES.labels("local")
+REMOTE_DELIVERIES = DELIVERIES.labels("remote")
+LOCAL_DROPS = metrics.counter(
+    "game_channel_layer_local_drops_total",
+    "Group messages dropped as the receive buffer of a local channel is full",
+).labels()
+MEMBER_LOOKUPS = metrics.counter(
+    "game_channel_layer_member_lookups_total",
+    "Group sends by whether the members were read from Redis",
+    ("result",),
+)
+LOOKUPS_SKIPPED = MEMBER_LOOKUPS.labels("skipped")
+LOOKUPS_READ = MEMBER_LOOKUPS.labels("read")
+
+# Remote members of the group being sent to, collected when the upstream group
+# send maps the members to connections
+_remote_members = contextvars.ContextVar("remote_members")
+_layers: "weakref.WeakSet[HybridChannelLayer]" = weakref.WeakSet()
+
+
+class HybridChannelLayer(RedisChannelLayer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.local_groups: DefaultDict[str, Set[str]] = collections.defaultdict(set)
+        # Groups without members in other workers
+        self.local_only_groups: Set[str] = set()
+        # Incremented whenever the groups may get remote members
+        self.remote_joins = 0
+        self.loop = None
+        _layers.add(self)
+
+    def is_local_channel(self, channel: str) -> bool:
+        return self.non_local_name(channel) == f"specific.{self.client_prefix}!"
+
+    def forget_local_only_group(self, group: str):
+        self.local_only_groups.discard(group)
+        self.remote_joins += 1
+
+    def forget_local_only_groups(self):
+        self.local_only_groups.clear()
+        self.remote_joins += 1
+
+    async def group_add(self, group, channel):
+        self.loop = asyncio.get_event_loop()
+        await super().group_add(group, channel)
+        if self.is_local_channel(channel):
+            self.local_groups[group].add(channel)
+        else:
+            self.forget_local_only_group(group)
+        control.publish("channel_group_joined", group=group, pid=os.getpid())
+
+    async def group_discard(self, group, channel):
+        await super().group_discard(group, channel)
+        channels = self.local_groups.get(group)
+        if channels is not None:
+            channels.discard(channel)
+            if not channels:
+                del self.local_groups[group]
+
+    def send_locally(self, group, message):
+        for channel in self.local_groups.get(group, ()):
+            receive_buffer = self.receive_buffer[channel]
+            # Upstream drops the group messages of full channels the same way
+            if receive_buffer.qsize() >= self.get_capacity(channel):
+                LOCAL_DROPS.inc()
+                continue
+            receive_buffer.put_nowait(message)
+            LOCAL_DELIVERIES.inc()
+
+    async def group_send(self, group, message):
+        # Local members get the message before the members of other workers,
+        # the same way upstream delivers the messages of one Redis key at once
+        self.send_locally(group, message)
+
+        if control.subscribed and group in self.local_only_groups:
+            LOOKUPS_SKIPPED.inc()
+            return
+
+        LOOKUPS_READ.inc()
+        self.loop = asyncio.get_event_loop()
+        remote_joins = self.remote_joins
+        remote_members = []
+        token = _remote_members.set(remote_members)
+        try:
+            await super().group_send(group, message)
+        finally:
+            _remote_members.reset(token)
+
+        # A join announced meanwhile may be missing in the members read
+        if (
+            control.subscribed
+            and not remote_members
+            and remote_joins == self.remote_joins
+        ):
+            self.local_only_groups.add(group)
+
+    def _map_channel_keys_to_connection(self, channel_names, message):
+        # Called by the upstream group send with every member of the group,
+        # the members of this worker already got the message
+        remote_channels = [
+            channel for channel in channel_names if not self.is_local_channel(channel)
+        ]
+        remote_members = _remote_members.get(None)
+        if remote_members is not None:
+            remote_members.extend(remote_channels)
+        REMOTE_DELIVERIES.inc(len(remote_channels))
+        return super()._map_channel_keys_to_connection(remote_channels, message)
+
+    async def flush(self):
+        self.local_groups.clear()
+        self.forget_local_only_groups()
+        await super().flush()
+
+
+@control.command("channel_group_joined")
+def channel_group_joined(group: str, pid: int):
+    if pid == os.getpid():
+        return
+
+    for layer in list(_layers):
+        if layer.loop is not None:
+            layer.loop.call_soon_threadsafe(layer.forget_local_only_group, group)
+
+
+@control.on_subscribe
+def forget_local_only_groups():
+    # Joins announced while the worker was not subscribed are lost
+    for layer in list(_layers):
+        if layer.loop is not None:
+            layer.loop.call_soon_threadsafe(layer.forget_local_only_groups)
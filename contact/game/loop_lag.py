@@ -0,0 +1,118 @@
+"""
+Lag of the worker event loop.
+
+Consumers run the game storage I/O synchronously, so a slow action blocks
+every connection of the worker. A task wakes up every LOOP_LAG_INTERVAL and
+records how late it was woken. A watchdog thread checks the task heartbeat
+and, when the loop has been blocked for LOOP_LAG_THRESHOLD, logs the stack
+of the blocking code with the game action and room being handled. Logs are
+limited to one per LOOP_LAG_LOG_INTERVAL, the blocks are counted anyway.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional, Tuple
+
+from contact.game import metrics
+from contact.game.constants import (
+    LOOP_LAG_INTERVAL,
+    LOOP_LAG_LOG_INTERVAL,
+    LOOP_LAG_STACK_DEPTH,
+    LOOP_LAG_THRESHOLD,
+)
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = metrics.histogram(
+    "game_loop_lag_seconds", "Delay of the event loop scheduling a callback"
+).labels()
+LOOP_BLOCKS = metrics.counter(
+    "game_loop_blocks_total",
+    "Event loop blocks longer than the threshold by the action being handled",
+    ("event",),
+)
+
+# (event, room id) of the action run by the loop thread, set by the consumers
+current_action: Optional[Tuple[str, str]] = None
+
+_beat_at = time.monotonic()
+_monitoring_task: Optional[asyncio.Task] = None
+_watchdog_pid = None
+
+
+async def measure_periodically():
+    global _beat_at
+
+    while True:
+        expected_at = time.monotonic() + LOOP_LAG_INTERVAL
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        _beat_at = time.monotonic()
+        LOOP_LAG.observe(max(_beat_at - expected_at, 0))
+
+
+def format_blocking_stack(thread_id: int) -> str:
+    frame = sys._current_frames().get(thread_id)
+    if frame is None:
+        return ""
+
+    return "".join(traceback.format_stack(frame, limit=LOOP_LAG_STACK_DEPTH))
+
+
+def watch(loop_thread_id: int):
+    reported_beat_at = None
+    logged_at = 0.0
+    suppressed = 0
+
+    while True:
+        time.sleep(LOOP_LAG_INTERVAL)
+        beat_at = _beat_at
+        blocked_for = time.monotonic() - beat_at - LOOP_LAG_INTERVAL
+
+        # Every block is reported once, while it lasts
+        if blocked_for < LOOP_LAG_THRESHOLD or beat_at == reported_beat_at:
+            continue
+
+        reported_beat_at = beat_at
+        event, room_id = current_action or ("", "")
+        LOOP_BLOCKS.labels(event).inc()
+
+        if time.monotonic() - logged_at < LOOP_LAG_LOG_INTERVAL:
+            suppressed += 1
+            continue
+
+        logger.warning(
+            "Event loop is blocked for %.3f s handling %s in room %s "
+            "(%s blocks since the last report):\n%s",
+            blocked_for,
+            event or "no action",
+            room_id or "-",
+            suppressed,
+            format_blocking_stack(loop_thread_id),
+        )
+        logged_at = time.monotonic()
+        suppressed = 0
+
+
+def ensure_monitoring():
+    """
+    Start measuring the lag of the current event loop and watching it from a
+    thread, if the worker does not do it yet. Should be called from the loop.
+    """
+    global _beat_at, _monitoring_task, _watchdog_pid
+
+    if _monitoring_task is None or _monitoring_task.done():
+        _beat_at = time.monotonic()
+        _monitoring_task = asyncio.get_event_loop().create_task(measure_periodically())
+
+    if _watchdog_pid != os.getpid():
+        _watchdog_pid = os.getpid()
+        threading.Thread(
+            target=watch,
+            args=(threading.get_ident(),),
+            name="game-loop-watchdog",
+            daemon=True,
+        ).start()
@@ -0,0 +1,109 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from contact.game import analytics
+from contact.game.constants import GameEvent
+
+PERCENTILES = (50, 75, 90, 99)
+
+
+class Command(BaseCommand):
+    help = "Aggregate the exported game events, requires NumPy (requirements-dev.txt)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--directory", default=settings.GAME_ANALYTICS_DIR)
+        parser.add_argument("--days", type=float, help="Only the last days events")
+        parser.add_argument(
+            "--bin", type=int, default=30, help="Time to finish histogram bin, seconds"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            import numpy
+        except ImportError:
+            raise CommandError("NumPy is required to analyze games")
+
+        if not os.path.isdir(options["directory"]):
+            raise CommandError(f"No game events in {options['directory']}")
+
+        since = None
+        if options["days"]:
+            since = datetime.utcnow() - timedelta(days=options["days"])
+
+        start_time = time.perf_counter()
+        columns = analytics.load_segments(options["directory"], since=since)
+        if since is not None:
+            recent = columns["timestamp"] >= since.timestamp()
+            columns = {name: values[recent] for name, values in columns.items()}
+
+        self.stdout.write(
+            f"{len(columns['event'])} events loaded "
+            f"in {time.perf_counter() - start_time:.2f} s"
+        )
+        self.print_event_counts(numpy, columns)
+        self.print_contact_success(numpy, columns)
+        self.print_time_to_finish(numpy, columns, bin_size=options["bin"])
+
+    def print_event_counts(self, numpy, columns):
+        counts = numpy.bincount(columns["event"], minlength=256)
+        games = counts[analytics.EVENT_CODES[GameEvent.START]]
+
+        self.stdout.write("Events:")
+        for event, code in analytics.EVENT_CODES.items():
+            per_game = counts[code] / games if games else 0
+            self.stdout.write(
+                f"  {event.value:<16} {counts[code]:>10} {per_game:>8.2f} per game"
+            )
+
+    def print_contact_success(self, numpy, columns):
+        results = columns["event"] == analytics.EVENT_CODES[GameEvent.CONTACT_RESULT]
+        word_lengths = columns["word_length"][results]
+        successes = columns["success"][results]
+        totals = numpy.bincount(word_lengths)
+        succeeded = numpy.bincount(word_lengths, weights=successes)
+
+        self.stdout.write("Contact success rate by word length:")
+        for length in numpy.flatnonzero(totals):
+            self.stdout.write(
+                f"  {length:>3} {succeeded[length] / totals[length]:>7.1%} "
+                f"of {totals[length]}"
+            )
+
+    def print_time_to_finish(self, numpy, columns, bin_size):
+        finishes = columns["event"] == analytics.EVENT_CODES[GameEvent.FINISH]
+        started = columns["game_time"] >= 0
+        game_times = columns["game_time"][finishes & started]
+        reasons = columns["reason"][finishes & started]
+
+        self.stdout.write("Time to finish, seconds:")
+        for reason, code in (("all", None), *analytics.REASON_CODES.items()):
+            times = game_times if code is None else game_times[reasons == code]
+            if not len(times):
+                continue
+
+            percentiles = numpy.percentile(times, PERCENTILES)
+            self.stdout.write(
+                f"  {reason:<20} {len(times):>8} games, "
+                + ", ".join(
+                    f"p{percentile} {value:.0f}"
+                    for percentile, value in zip(PERCENTILES, percentiles)
+                )
+            )
+
+        if not len(game_times):
+            return
+
+        self.stdout.write("Time to finish distribution:")
+        bins = int(game_times.max() // bin_size) + 1
+        counts, edges = numpy.histogram(
+            game_times, bins=bins, range=(0, bins * bin_size)
+        )
+        for count, edge in zip(counts, edges):
+            self.stdout.write(
+                f"  {edge:>5.0f}-{edge + bin_size:<5.0f} {count:>8} "
+                f"{'#' * int(60 * count / counts.max())}"
+            )
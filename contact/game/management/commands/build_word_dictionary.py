@@ -0,0 +1,29 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from contact.game import dictionary
+
+
+class Command(BaseCommand):
+    help = "Build the memory-mapped word dictionary from a word list (a word per line)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("word_list", help="Path to a utf-8 text file")
+        parser.add_argument("--output", default=settings.GAME_DICTIONARY_PATH)
+        parser.add_argument("--locale", default=settings.LANGUAGE_CODE)
+
+    def handle(self, *args, **options):
+        output = options["output"]
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        # Workers map the file, so it must be replaced atomically
+        tmp_output = f"{output}.tmp"
+
+        with open(options["word_list"], "r", encoding="utf-8") as word_list:
+            words_count = dictionary.build_dictionary(
+                words=word_list, path=tmp_output, locale=options["locale"]
+            )
+
+        os.replace(tmp_output, output)
+        self.stdout.write(f"{words_count} words written to {output}")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from contact.game import control
+
+
+class Command(BaseCommand):
+    help = (
+        "Drain game workers: clients are asked to reconnect elsewhere "
+        "and the workers exit once their sockets are closed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pid", type=int, help="Drain only the given worker")
+
+    def handle(self, *args, **options):
+        workers_count = control.publish("drain", pid=options["pid"])
+        self.stdout.write(f"{workers_count} workers received the command")
@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from contact.game import room_stats
+from contact.game.constants import ROOM_STATS_SCAN_PAUSE
+
+
+class Command(BaseCommand):
+    help = "Aggregate the rooms stored at the moment without blocking Redis"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=ROOM_STATS_SCAN_PAUSE,
+            help="Seconds between the batches of rooms",
+        )
+        parser.add_argument("--json", action="store_true", help="Print raw JSON")
+
+    def handle(self, *args, **options):
+        stats = room_stats.collect(pause=options["pause"])
+
+        if options["json"]:
+            self.stdout.write(json.dumps(stats, indent=2))
+            return
+
+        self.stdout.write(
+            f"{stats['rooms']} rooms, {stats['players']} players, "
+            f"{stats['offers']} offers, collected in {stats['collection_time']} s"
+        )
+        self.stdout.write("Rooms by state:")
+        for state, count in stats["rooms_by_state"].items():
+            self.stdout.write(f"  {state:<10} {count:>8}")
+
+        self.stdout.write("Rooms by offers count:")
+        for bucket, count in stats["offers_distribution"].items():
+            self.stdout.write(f"  {bucket:<10} {count:>8}")
+
+        oldest_room = stats["oldest_room"]
+        if oldest_room:
+            self.stdout.write(
+                f"Oldest room {oldest_room['id']} ({oldest_room['state']}) "
+                f"is {oldest_room['age']} s old"
+            )
@@ -0,0 +1,91 @@
+import glob
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from contact.game import control, memory
+
+MEGABYTE = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the memory accounting of the game workers or trace their "
+        "allocations with tracemalloc snapshots"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "action",
+            nargs="?",
+            choices=("report", "start", "snapshot", "stop"),
+            default="report",
+        )
+        parser.add_argument(
+            "--frames", type=int, default=1, help="Frames of allocation tracebacks"
+        )
+        parser.add_argument("--top", type=int, default=30, help="Lines to print")
+        parser.add_argument(
+            "--wait", type=float, default=3, help="Seconds to wait for snapshots"
+        )
+
+    def handle(self, *args, **options):
+        action = options["action"]
+        if action == "report":
+            self.print_reports(top=options["top"])
+            return
+
+        kwargs = {}
+        if action == "start":
+            kwargs = {"frames": options["frames"]}
+        elif action == "snapshot":
+            kwargs = {"top": options["top"]}
+
+        requested_at = time.time()
+        workers_count = control.publish(f"memory_{action}", **kwargs)
+        self.stdout.write(f"{workers_count} workers received the command")
+
+        if action == "snapshot":
+            time.sleep(options["wait"])
+            self.print_snapshots(since=requested_at)
+
+    def print_reports(self, top: int):
+        for report in sorted(memory.load_worker_reports(), key=lambda r: r["pid"]):
+            self.stdout.write(
+                f"Worker {report['pid']}: {report['rss'] / MEGABYTE:.1f} MiB resident"
+            )
+            for title, counts in (
+                ("Live objects", report["objects"]),
+                ("Pending tasks", report["tasks"]),
+            ):
+                self.stdout.write(f"  {title}:")
+                for name, count in sorted(
+                    counts.items(), key=lambda item: item[1], reverse=True
+                )[:top]:
+                    self.stdout.write(f"    {count:>8} {name}")
+
+    def print_snapshots(self, since: float):
+        pattern = os.path.join(settings.GAME_DIAGNOSTICS_DIR, "memory-*.json")
+
+        for path in sorted(glob.glob(pattern)):
+            if os.path.getmtime(path) < since:
+                continue
+
+            with open(path) as file:
+                snapshot = json.load(file)
+
+            self.stdout.write(
+                f"Worker {snapshot['pid']}: {snapshot['rss'] / MEGABYTE:.1f} MiB "
+                f"resident, {snapshot['traced'] / MEGABYTE:.1f} MiB traced "
+                f"(peak {snapshot['traced_peak'] / MEGABYTE:.1f} MiB)"
+            )
+            self.stdout.write("  Allocations grown since the previous snapshot:")
+            for allocation in snapshot["allocations"]:
+                self.stdout.write(
+                    f"    {allocation['size_diff'] / 1024:>+10.1f} KiB "
+                    f"{allocation['count_diff']:>+8} blocks "
+                    f"{allocation['location']}"
+                )
@@ -0,0 +1,94 @@
+import collections
+import glob
+import io
+import os
+import pstats
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from contact.game import control, profiling
+
+
+class Command(BaseCommand):
+    help = (
+        "Profile the game workers: cProfile of a fraction of the game actions "
+        "or a stack sampler of the event loop"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=("start", "stop"))
+        parser.add_argument("--mode", choices=profiling.MODES, default="cprofile")
+        parser.add_argument(
+            "--fraction", type=float, default=0.1, help="Fraction of profiled actions"
+        )
+        parser.add_argument(
+            "--interval", type=float, default=0.005, help="Sampling interval, seconds"
+        )
+        parser.add_argument("--top", type=int, default=30, help="Functions to print")
+        parser.add_argument(
+            "--wait", type=float, default=1, help="Seconds to wait for dumps"
+        )
+
+    def handle(self, *args, **options):
+        if not 0 < options["fraction"] <= 1:
+            raise CommandError("Fraction should be in (0, 1]")
+
+        requested_at = time.time()
+
+        if options["action"] == "start":
+            workers_count = control.publish(
+                "profile_start",
+                mode=options["mode"],
+                fraction=options["fraction"],
+                interval=options["interval"],
+            )
+            self.stdout.write(f"{workers_count} workers received the command")
+            return
+
+        workers_count = control.publish("profile_stop")
+        self.stdout.write(f"{workers_count} workers received the command")
+        time.sleep(options["wait"])
+        self.print_profiles(since=requested_at, top=options["top"])
+        self.merge_stacks(since=requested_at)
+
+    @staticmethod
+    def get_dumps(name, since):
+        pattern = os.path.join(settings.GAME_DIAGNOSTICS_DIR, name)
+        return [path for path in glob.glob(pattern) if os.path.getmtime(path) >= since]
+
+    def print_profiles(self, since, top):
+        paths = self.get_dumps("profile-*.pstats", since)
+        if not paths:
+            return
+
+        # Django output wrapper ends every write with a new line
+        output = io.StringIO()
+        pstats.Stats(*paths, stream=output).sort_stats("cumulative").print_stats(top)
+        self.stdout.write(f"Actions profile of {len(paths)} workers:")
+        self.stdout.write(output.getvalue())
+
+    def merge_stacks(self, since):
+        paths = self.get_dumps("stacks-*.folded", since)
+        if not paths:
+            return
+
+        stacks = collections.Counter()
+        for path in paths:
+            with open(path) as file:
+                for line in file:
+                    stack, _, count = line.rstrip("\n").rpartition(" ")
+                    stacks[stack] += int(count)
+
+        merged_path = os.path.join(
+            settings.GAME_DIAGNOSTICS_DIR, f"flamegraph-{int(since)}.folded"
+        )
+        with open(merged_path, "w") as file:
+            for stack, count in stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+        self.stdout.write(
+            f"{sum(stacks.values())} stack samples of {len(paths)} workers "
+            f"are merged into {merged_path}"
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from contact.game import control
+
+
+class Command(BaseCommand):
+    help = "Record the game socket traffic of all the workers for replaying it"
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=("start", "stop"))
+
+    def handle(self, *args, **options):
+        workers_count = control.publish(f"traffic_record_{options['action']}")
+        self.stdout.write(f"{workers_count} workers received the command")
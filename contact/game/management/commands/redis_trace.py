@@ -0,0 +1,67 @@
+import glob
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from contact.game import control
+
+
+class Command(BaseCommand):
+    help = "Control tracing of the game storage commands in all the workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=("enable", "disable", "reset", "dump"))
+        parser.add_argument("--size", type=int, help="Number of slowest commands")
+        parser.add_argument(
+            "--wait", type=float, default=1, help="Seconds to wait for dumps"
+        )
+
+    def handle(self, *args, **options):
+        action = options["action"]
+        kwargs = {"size": options["size"]} if action == "enable" else {}
+        requested_at = time.time()
+        workers_count = control.publish(f"redis_trace_{action}", **kwargs)
+        self.stdout.write(f"{workers_count} workers received the command")
+
+        if action == "dump":
+            time.sleep(options["wait"])
+            self.print_dumps(since=requested_at)
+
+    def print_dumps(self, since):
+        pattern = os.path.join(settings.GAME_DIAGNOSTICS_DIR, "redis-trace-*.json")
+        slowest, totals = [], {}
+
+        for path in glob.glob(pattern):
+            if os.path.getmtime(path) < since:
+                continue
+
+            with open(path) as file:
+                worker_dump = json.load(file)
+
+            slowest.extend(worker_dump["slowest"])
+            for total in worker_dump["totals"]:
+                key = (total["action"], total["command"])
+                count, duration = totals.get(key, (0, 0.0))
+                totals[key] = (count + total["count"], duration + total["duration"])
+
+        self.stdout.write("Commands by action:")
+        for (action, command_name), (count, duration) in sorted(
+            totals.items(), key=lambda item: item[1][1], reverse=True
+        ):
+            self.stdout.write(
+                f"  {action or '-':<16} {command_name:<12} {count:>8} "
+                f"{duration * 1000:>10.2f} ms"
+            )
+
+        self.stdout.write("Slowest commands:")
+        slowest.sort(key=lambda r: r["duration"], reverse=True)
+        for record in slowest[: settings.GAME_REDIS_TRACE_SIZE]:
+            self.stdout.write(
+                f"  {record['duration'] * 1000:>8.2f} ms {record['action'] or '-':<16} "
+                f"{record['command']:<12} {record['key_prefix']}"
+            )
+            if "commands" in record:
+                self.stdout.write(f"{'':<13}{' '.join(record['commands'])}")
@@ -0,0 +1,71 @@
+import asyncio
+import glob
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from contact.game import replay, traffic
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the recorded game socket traffic against the configured redis "
+        "and report latencies and divergence from the recording"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="*",
+            help="Recorded files, all the files of the traffic directory by default",
+        )
+        parser.add_argument(
+            "--speed",
+            type=float,
+            default=1,
+            help="Speed relative to the recording, 0 to replay as fast as possible",
+        )
+        parser.add_argument("--json", action="store_true", help="Print raw JSON")
+
+    def handle(self, *args, **options):
+        if options["speed"] < 0:
+            raise CommandError("Speed should not be negative")
+
+        paths = options["paths"] or sorted(
+            glob.glob(os.path.join(settings.GAME_TRAFFIC_DIR, "*.jsonl.gz"))
+        )
+        if not paths:
+            raise CommandError("No recorded traffic")
+
+        records = list(traffic.read(paths))
+        replayer = replay.Replayer(records, speed=options["speed"])
+        report = asyncio.get_event_loop().run_until_complete(replayer.replay())
+        report = report.as_dict()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f"{report['connections']} connections ({report['failed_connections']} "
+            f"failed, {report['crashed_connections']} crashed), {report['rooms']} "
+            f"rooms ({report['diverged_rooms']} diverged), "
+            f"replayed in {report['duration']} s"
+        )
+        self.stdout.write(
+            f"  {'event':<16} {'frames':>8} {'diverged':>9} {'unanswered':>11} "
+            f"{'median':>10} {'p95':>10} {'max':>10}"
+        )
+        for event, stats in report["events"].items():
+            latencies = "".join(
+                f" {stats[name] * 1000:>7.2f} ms"
+                if stats[name] is not None
+                else " " * 11
+                for name in ("median", "p95", "max")
+            )
+            self.stdout.write(
+                f"  {event:<16} {stats['frames']:>8} {stats['diverged']:>9} "
+                f"{stats['unanswered']:>11}{latencies}"
+            )
@@ -0,0 +1,206 @@
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from contact.game import metrics
+from contact.game.constants import DRAIN_TIMEOUT
+
+RESPAWN_DELAY = 1  # seconds
+WORKER_STOP_TIMEOUT = DRAIN_TIMEOUT + 10  # seconds
+# Workers drain their sockets and exit on this signal (see `contact.game.draining`)
+DRAIN_SIGNAL = signal.SIGUSR2
+SUPERVISOR_SIGNALS = (signal.SIGHUP, signal.SIGUSR1, signal.SIGTERM, signal.SIGINT)
+
+
+def serve(listening_socket: socket.socket):
+    """
+    Worker process entrypoint. The ASGI application and with it the game
+    storage redis client are imported here, so every worker creates its
+    own connection pool after fork.
+    """
+    from channels.routing import get_default_application
+    from daphne.server import Server
+    from twisted.internet import reactor
+
+    from contact.game import control, draining
+
+    class WorkerServer(Server):
+        def listen_success(self, port):
+            super().listen_success(port)
+            # Draining workers stop listening on the port
+            draining.listening_ports.append(port)
+
+    def start_worker():
+        # A worker is drained even before its first connection
+        draining.install()
+        control.ensure_listening()
+
+    for signal_number in SUPERVISOR_SIGNALS:
+        signal.signal(signal_number, signal.SIG_DFL)
+    # The signal is handled in the loop once it runs
+    signal.signal(DRAIN_SIGNAL, signal.SIG_IGN)
+    reactor.callWhenRunning(start_worker)
+
+    connections.close_all()
+    WorkerServer(
+        application=get_default_application(),
+        endpoints=[f"fd:fileno={listening_socket.fileno()}"],
+    ).run()
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the ASGI game server in several worker processes sharing "
+        "a listening socket. SIGHUP restarts workers one by one, SIGUSR1 "
+        "reports sockets and rooms of every worker. Workers are drained "
+        "before they are stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bind", default="0.0.0.0")
+        parser.add_argument("--port", type=int, default=8000)
+        parser.add_argument("--workers", type=int, default=os.cpu_count())
+        parser.add_argument("--backlog", type=int, default=2048)
+        parser.add_argument(
+            "--report-interval",
+            type=float,
+            default=0,
+            help="Seconds between worker reports, 0 disables periodic reports",
+        )
+
+    def handle(self, *args, **options):
+        self.listening_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listening_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listening_socket.bind((options["bind"], options["port"]))
+        self.listening_socket.listen(options["backlog"])
+        self.listening_socket.set_inheritable(True)
+
+        self.workers = set()
+        self.restart_requested = self.report_requested = self.stopping = False
+        signal.signal(signal.SIGHUP, self.request_restart)
+        signal.signal(signal.SIGUSR1, self.request_report)
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+
+        self.stdout.write(
+            f"Serving on {options['bind']}:{options['port']} "
+            f"with {options['workers']} workers"
+        )
+        for _ in range(options["workers"]):
+            self.spawn_worker()
+
+        self.supervise(options["workers"], options["report_interval"])
+
+    # Signals #
+    def request_restart(self, *args):
+        self.restart_requested = True
+
+    def request_report(self, *args):
+        self.report_requested = True
+
+    def request_stop(self, *args):
+        self.stopping = True
+
+    # Workers #
+    def spawn_worker(self) -> int:
+        pid = os.fork()
+
+        if pid == 0:
+            exit_code = 0
+            try:
+                serve(self.listening_socket)
+            except BaseException:
+                exit_code = 1
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(exit_code)
+
+        self.workers.add(pid)
+        return pid
+
+    def stop_workers(self, pids):
+        """Drain workers and wait for them to exit"""
+        running_pids = set(pids)
+        for pid in running_pids:
+            os.kill(pid, DRAIN_SIGNAL)
+
+        deadline = time.monotonic() + WORKER_STOP_TIMEOUT
+        while running_pids and time.monotonic() < deadline:
+            for pid in list(running_pids):
+                finished_pid, _ = os.waitpid(pid, os.WNOHANG)
+                if finished_pid:
+                    running_pids.discard(pid)
+            time.sleep(0.1)
+
+        for pid in running_pids:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+
+        self.workers.difference_update(pids)
+
+    def restart_workers(self):
+        """A new worker is started before every old one is stopped"""
+        for pid in list(self.workers):
+            self.spawn_worker()
+            self.stop_workers([pid])
+            self.stdout.write(f"Worker {pid} is restarted")
+
+    def reap_workers(self):
+        while self.workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if not pid:
+                return
+            if pid in self.workers:
+                self.workers.discard(pid)
+                self.stderr.write(f"Worker {pid} exited with status {status}")
+
+    def report(self):
+        dumps = {
+            worker_dump["pid"]: worker_dump["metrics"]
+            for worker_dump in metrics.load_worker_dumps(include_current=False)
+        }
+
+        for pid in sorted(self.workers):
+            worker_metrics = {
+                name: sum(value for _, value in samples)
+                for name, samples in dumps.get(pid, {}).items()
+                if name in ("game_open_sockets", "game_active_rooms")
+            }
+            self.stdout.write(
+                f"Worker {pid}: "
+                f"{worker_metrics.get('game_open_sockets', 0)} sockets, "
+                f"{worker_metrics.get('game_active_rooms', 0)} rooms"
+            )
+
+    def supervise(self, workers_count, report_interval):
+        last_report_time = time.monotonic()
+
+        while not self.stopping:
+            time.sleep(0.5)
+            self.reap_workers()
+
+            if self.restart_requested:
+                self.restart_requested = False
+                self.restart_workers()
+
+            if self.report_requested or (
+                report_interval
+                and time.monotonic() - last_report_time >= report_interval
+            ):
+                self.report_requested = False
+                last_report_time = time.monotonic()
+                self.report()
+
+            if not self.stopping and len(self.workers) < workers_count:
+                time.sleep(RESPAWN_DELAY)
+                self.spawn_worker()
+
+        self.stop_workers(set(self.workers))
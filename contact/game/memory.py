@@ -0,0 +1,109 @@
+"""
+Memory accounting of the game workers.
+
+Consumers, game managers and storage objects are registered with `track`,
+which keeps them in a weak set, so the live ones are counted by class without
+being kept alive. The counts, the pending asyncio tasks by coroutine and the
+resident set size are gauges collected with the other metrics of the worker,
+`manage.py memory_workers report` shows them per worker. Allocations are
+attributed by tracemalloc snapshots, see `contact.game.profiling`.
+"""
+import asyncio
+import collections
+import os
+import resource
+import weakref
+from typing import Dict, List
+
+from contact.game import metrics
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+_live_objects: "weakref.WeakSet[object]" = weakref.WeakSet()
+
+
+def track(obj: object):
+    _live_objects.add(obj)
+
+
+def get_rss() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        # The peak size is the best guess without procfs
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def get_live_objects() -> List[object]:
+    # The set changes while being copied by threads other than the loop one
+    for _ in range(100):
+        try:
+            return list(_live_objects)
+        except RuntimeError:
+            continue
+    return []
+
+
+def count_live_objects() -> Dict[metrics.Labels, int]:
+    counts = collections.Counter(type(obj).__name__ for obj in get_live_objects())
+    return {(name,): count for name, count in counts.items()}
+
+
+def get_coroutine_name(task: asyncio.Task) -> str:
+    coroutine = task.get_coro()
+    return getattr(coroutine, "__qualname__", type(coroutine).__name__)
+
+
+def count_pending_tasks() -> Dict[metrics.Labels, int]:
+    try:
+        tasks = asyncio.all_tasks()
+    except RuntimeError:
+        # Collected outside of the event loop, e.g. by a management command
+        return {}
+
+    counts = collections.Counter(get_coroutine_name(task) for task in tasks)
+    return {(name,): count for name, count in counts.items()}
+
+
+def load_worker_reports(include_current=False) -> List[dict]:
+    """:return: memory metrics of every alive worker from its metrics dump"""
+    reports = []
+    for worker_dump in metrics.load_worker_dumps(include_current=include_current):
+        samples = {
+            name: {tuple(labels): value for labels, value in family_samples}
+            for name, family_samples in worker_dump["metrics"].items()
+        }
+        reports.append(
+            {
+                "pid": worker_dump["pid"],
+                "rss": samples.get("game_worker_rss_bytes", {}).get((), 0),
+                "objects": {
+                    labels[0]: value
+                    for labels, value in samples.get("game_live_objects", {}).items()
+                },
+                "tasks": {
+                    labels[0]: value
+                    for labels, value in samples.get("game_pending_tasks", {}).items()
+                },
+            }
+        )
+
+    return reports
+
+
+metrics.gauge(
+    "game_worker_rss_bytes", "Resident set size of the workers", function=get_rss
+)
+metrics.gauge(
+    "game_live_objects",
+    "Live consumers, game managers and storage objects by class",
+    ("class",),
+    function=count_live_objects,
+)
+metrics.gauge(
+    "game_pending_tasks",
+    "Pending asyncio tasks by coroutine",
+    ("coroutine",),
+    function=count_pending_tasks,
+)
@@ -0,0 +1,332 @@
+"""
+Process local metrics exposed in the Prometheus text format.
+
+Recording is a dict lookup and an integer increment, which keeps it well
+under a microsecond per sample. Every worker process periodically dumps its
+samples to `GAME_METRICS_DIR`, and the process serving the metrics endpoint
+merges those dumps, so metrics are aggregated across workers.
+"""
+import asyncio
+import bisect
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+Labels = Tuple[str, ...]
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        # The last bucket is +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def snapshot(self):
+        return [self.counts, self.sum]
+
+
+class MetricFamily:
+    """
+    A named metric with its labelled children. Children are created on the
+    first access to `labels` and cached, so hot paths should keep references
+    to them where the label values are static.
+    """
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Labels = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.children: Dict[Labels, object] = {}
+        REGISTRY.append(self)
+
+    def create_child(self):
+        raise NotImplementedError
+
+    def labels(self, *label_values):
+        try:
+            return self.children[label_values]
+        except KeyError:
+            child = self.children[label_values] = self.create_child()
+            return child
+
+    def collect(self) -> Dict[Labels, object]:
+        return {labels: child.snapshot() for labels, child in self.children.items()}
+
+
+class CounterFamily(MetricFamily):
+    type_name = "counter"
+
+    def create_child(self):
+        return Counter()
+
+
+class GaugeFamily(MetricFamily):
+    """
+    :attribute function: when given, the gauge value is calculated by calling
+        it at collection time instead of being recorded, functions of labelled
+        gauges return the values by label values
+    """
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        *args,
+        function: Optional[Callable[[], Union[float, Dict[Labels, float]]]] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.function = function
+
+    def create_child(self):
+        return Gauge()
+
+    def collect(self):
+        if self.function is not None:
+            try:
+                value = self.function()
+                return value if isinstance(value, dict) else {(): value}
+            except Exception:
+                logger.exception("Gauge %s could not be calculated", self.name)
+                return {}
+
+        return super().collect()
+
+
+class HistogramFamily(MetricFamily):
+    type_name = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+
+    def create_child(self):
+        return Histogram(self.buckets)
+
+
+REGISTRY: List[MetricFamily] = []
+
+
+def counter(name, documentation, label_names=()) -> CounterFamily:
+    return CounterFamily(name, documentation, label_names)
+
+
+def gauge(name, documentation, label_names=(), function=None) -> GaugeFamily:
+    return GaugeFamily(name, documentation, label_names, function=function)
+
+
+def histogram(
+    name, documentation, label_names=(), buckets=LATENCY_BUCKETS
+) -> HistogramFamily:
+    return HistogramFamily(name, documentation, label_names, buckets=buckets)
+
+
+# Multi-process aggregation #
+def collect() -> dict:
+    return {
+        family.name: [
+            [list(labels), value] for labels, value in family.collect().items()
+        ]
+        for family in REGISTRY
+    }
+
+
+def dump_path(pid=None) -> str:
+    return os.path.join(settings.GAME_METRICS_DIR, f"{pid or os.getpid()}.json")
+
+
+def dump():
+    os.makedirs(settings.GAME_METRICS_DIR, exist_ok=True)
+    path = dump_path()
+    tmp_path = f"{path}.tmp"
+
+    with open(tmp_path, "w") as file:
+        json.dump({"pid": os.getpid(), "time": time.time(), "metrics": collect()}, file)
+
+    os.replace(tmp_path, path)
+
+
+def load_worker_dumps(include_current=True) -> List[dict]:
+    """
+    Read the dumps of all the alive workers. Dumps which have not been updated
+    for `GAME_METRICS_STALE_AFTER` seconds belong to dead workers and are removed.
+    """
+    dumps = []
+    stale_before = time.time() - settings.GAME_METRICS_STALE_AFTER
+
+    try:
+        file_names = os.listdir(settings.GAME_METRICS_DIR)
+    except FileNotFoundError:
+        file_names = []
+
+    for file_name in file_names:
+        if not file_name.endswith(".json"):
+            continue
+        if file_name == f"{os.getpid()}.json":
+            continue
+
+        path = os.path.join(settings.GAME_METRICS_DIR, file_name)
+        try:
+            with open(path) as file:
+                worker_dump = json.load(file)
+        except (OSError, ValueError):
+            continue
+
+        if worker_dump["time"] < stale_before:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+
+        dumps.append(worker_dump)
+
+    if include_current:
+        dumps.append({"pid": os.getpid(), "time": time.time(), "metrics": collect()})
+
+    return dumps
+
+
+def merge_values(family: MetricFamily, left, right):
+    if isinstance(family, HistogramFamily):
+        counts = [a + b for a, b in zip(left[0], right[0])]
+        return [counts, left[1] + right[1]]
+
+    return left + right
+
+
+def aggregate(dumps: List[dict]) -> Dict[str, Dict[Labels, object]]:
+    families = {family.name: family for family in REGISTRY}
+    aggregated: Dict[str, Dict[Labels, object]] = {name: {} for name in families}
+
+    for worker_dump in dumps:
+        for name, samples in worker_dump["metrics"].items():
+            if name not in families:
+                continue
+
+            family_samples = aggregated[name]
+            for labels, value in samples:
+                labels = tuple(labels)
+                if labels in family_samples:
+                    value = merge_values(families[name], family_samples[labels], value)
+                family_samples[labels] = value
+
+    return aggregated
+
+
+# Exposition #
+def format_labels(label_names, label_values, extra=()) -> str:
+    pairs = [*zip(label_names, label_values), *extra]
+    if not pairs:
+        return ""
+
+    formatted = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", r"\\").replace('"', r"\""))
+        for name, value in pairs
+    )
+    return f"{{{formatted}}}"
+
+
+def render(aggregated: Dict[str, Dict[Labels, object]]) -> str:
+    lines = []
+
+    for family in REGISTRY:
+        lines.append(f"# HELP {family.name} {family.documentation}")
+        lines.append(f"# TYPE {family.name} {family.type_name}")
+
+        for labels, value in aggregated.get(family.name, {}).items():
+            if not isinstance(family, HistogramFamily):
+                lines.append(
+                    f"{family.name}{format_labels(family.label_names, labels)} {value}"
+                )
+                continue
+
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip((*family.buckets, "+Inf"), counts):
+                cumulative += count
+                bucket_labels = format_labels(
+                    family.label_names, labels, extra=(("le", bound),)
+                )
+                lines.append(f"{family.name}_bucket{bucket_labels} {cumulative}")
+
+            formatted_labels = format_labels(family.label_names, labels)
+            lines.append(f"{family.name}_sum{formatted_labels} {total}")
+            lines.append(f"{family.name}_count{formatted_labels} {cumulative}")
+
+    return "\n".join(lines) + "\n"
+
+
+def render_all_workers() -> str:
+    return render(aggregate(load_worker_dumps()))
+
+
+# Dumping loop #
+_dumping_task: Optional[asyncio.Task] = None
+
+
+async def dump_periodically():
+    while True:
+        await asyncio.sleep(settings.GAME_METRICS_DUMP_INTERVAL)
+        try:
+            dump()
+        except OSError:
+            logger.exception("Metrics could not be dumped")
+
+
+def ensure_dumping():
+    """Start dumping metrics of the current worker, if it is not started yet"""
+    global _dumping_task
+
+    if _dumping_task is None or _dumping_task.done():
+        _dumping_task = asyncio.get_event_loop().create_task(dump_periodically())
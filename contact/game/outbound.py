@@ -0,0 +1,126 @@
+"""
+Per socket queue of outgoing frames.
+
+Consumers put frames into the queue instead of writing them, so a socket
+which is written slowly does not stop its consumer from taking messages off
+the channel layer. Frames of the pure room state events are snapshots, a
+snapshot queued last is replaced by the next one, so neither events nor
+their order are lost. A socket which fails to be written is closed.
+"""
+import asyncio
+import collections
+import logging
+import time
+from typing import Awaitable, Callable, Deque, Optional, Tuple
+
+from contact.game import metrics
+from contact.game.constants import (
+    OUTBOUND_QUEUE_HIGH_WATERMARK,
+    OUTBOUND_QUEUE_MAX_SIZE,
+    SLOW_CONSUMER_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DEPTH = metrics.histogram(
+    "game_outbound_queue_depth",
+    "Frames waiting in a socket queue when a frame is added",
+    buckets=metrics.COUNT_BUCKETS,
+).labels()
+FRAMES = metrics.counter(
+    "game_outbound_frames_total", "Outgoing frames by outcome", ("outcome",)
+)
+SENT_FRAMES = FRAMES.labels("sent")
+COLLAPSED_FRAMES = FRAMES.labels("collapsed")
+DROPPED_FRAMES = FRAMES.labels("dropped")
+
+
+class OutboundQueue:
+    def __init__(
+        self, send: Callable[[str], Awaitable], close: Callable[[], Awaitable]
+    ):
+        """
+        :param send: writes a frame to the socket
+        :param close: closes the socket when a frame can't be written
+        """
+        self.send = send
+        self.close = close
+        self.frames: Deque[Tuple[str, bool]] = collections.deque()
+        self.ready = asyncio.Event()
+        self.overloaded_since: Optional[float] = None
+        self.writer: Optional[asyncio.Task] = None
+        self.stopped = False
+
+    def start(self):
+        self.writer = asyncio.create_task(self.write())
+
+    def stop(self):
+        self.stopped = True
+        if self.writer is not None:
+            self.writer.cancel()
+
+        DROPPED_FRAMES.inc(len(self.frames))
+        self.frames.clear()
+
+    async def flush(self, timeout: float):
+        """Wait for the queued frames to be written"""
+        deadline = time.monotonic() + timeout
+        while self.frames and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    def put(self, text: str, snapshot=False) -> bool:
+        """
+        :param snapshot: whether the frame replaces a snapshot queued last
+        :return: False when the queue is stopped or the socket is too slow
+            and should be closed
+        """
+        if self.stopped:
+            DROPPED_FRAMES.inc()
+            return False
+
+        if snapshot and self.frames and self.frames[-1][1]:
+            self.frames[-1] = (text, snapshot)
+            COLLAPSED_FRAMES.inc()
+            return True
+
+        QUEUE_DEPTH.observe(len(self.frames))
+
+        if len(self.frames) >= OUTBOUND_QUEUE_MAX_SIZE or self.is_stuck():
+            DROPPED_FRAMES.inc()
+            return False
+
+        self.frames.append((text, snapshot))
+        self.ready.set()
+        return True
+
+    def is_stuck(self) -> bool:
+        if len(self.frames) < OUTBOUND_QUEUE_HIGH_WATERMARK:
+            self.overloaded_since = None
+            return False
+
+        now = time.monotonic()
+        if self.overloaded_since is None:
+            self.overloaded_since = now
+
+        return now - self.overloaded_since > SLOW_CONSUMER_TIMEOUT
+
+    async def write(self):
+        while True:
+            await self.ready.wait()
+
+            while self.frames:
+                text, _ = self.frames.popleft()
+                try:
+                    await self.send(text)
+                except Exception:
+                    logger.exception("Frame could not be sent, closing the socket")
+                    # The writer closing the socket must not cancel itself
+                    self.writer = None
+                    DROPPED_FRAMES.inc()
+                    self.stop()
+                    await self.close()
+                    return
+
+                SENT_FRAMES.inc()
+
+            self.ready.clear()
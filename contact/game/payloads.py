@@ -0,0 +1,68 @@
+"""
+Precompiled schemas of game action payloads. Frames sent by clients are
+decoded and validated against them before any storage access.
+"""
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from contact.game.constants import GameEvent
+from contact.game.exceptions import GameActionError
+
+JSON = Dict[str, Any]
+
+
+class PayloadField(NamedTuple):
+    type: type
+    max_length: Optional[int] = None
+
+
+class PayloadSchema:
+    def __init__(self, fields: Dict[str, PayloadField]):
+        self.fields = fields
+        self.names = frozenset(fields)
+
+    def decode(self, data: Any) -> JSON:
+        if data is None:
+            data = {}
+
+        if not isinstance(data, dict):
+            raise GameActionError("Event data should be an object")
+
+        if data.keys() != self.names:
+            missing = ", ".join(sorted(self.names - data.keys()))
+            unknown = ", ".join(sorted(data.keys() - self.names))
+            raise GameActionError(
+                f"Invalid event data. Missing: [{missing}], unknown: [{unknown}]"
+            )
+
+        for name, field in self.fields.items():
+            value = data[name]
+
+            if type(value) is not field.type:
+                raise GameActionError(f"{name} should be {field.type.__name__}")
+
+            if field.max_length is not None and len(value) > field.max_length:
+                raise GameActionError(
+                    f"{name} should not be longer than {field.max_length}"
+                )
+
+        return data
+
+
+def decode_frame(content: Any, schemas: Dict[GameEvent, PayloadSchema]) -> Tuple:
+    """
+    :return: the game event and its payload
+    :raises GameActionError: when the frame is malformed
+    """
+    if not isinstance(content, dict) or not isinstance(content.get("event"), str):
+        raise GameActionError("Frame should be an object with an event")
+
+    try:
+        event = GameEvent(content["event"])
+    except ValueError:
+        raise GameActionError(f"Unknown event {content['event'][:32]}")
+
+    schema = schemas.get(event)
+    if schema is None:
+        raise GameActionError(f"Event {event.value} can't be sent")
+
+    return event, schema.decode(content.get("data"))
@@ -0,0 +1,94 @@
+"""
+Presence of players in rooms.
+
+Clients send frames, `ping` ones while being idle, and every frame received
+from a player is a heartbeat. Workers write the last heartbeat times of their
+players in bulk to a single sorted set of `room_id:player_id` members. Every
+sweep interval the workers claim the players not heard from for
+PLAYER_DISCONNECTION_AWAITING_TIME, so neither disconnected players nor
+half-open sockets hold a timer task or a key each.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from contact.game import metrics, storage
+from contact.game.constants import (
+    PLAYER_DISCONNECTION_AWAITING_TIME,
+    PRESENCE_CLAIM_LIMIT,
+    PRESENCE_FLUSH_INTERVAL,
+    PRESENCE_SWEEP_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+AbsentPlayersHandler = Callable[[Dict[str, List[str]]], Awaitable]
+
+SWEEP_LATENCY = metrics.histogram(
+    "game_presence_sweep_seconds", "Time of flushing and sweeping the presence"
+).labels()
+ABSENT_PLAYERS = metrics.counter(
+    "game_presence_absent_players_total", "Players claimed as absent by the worker"
+).labels()
+
+# Heartbeats of the worker players received since the last flush
+_seen: Dict[Tuple[str, str], float] = {}
+_sweeping_task: Optional[asyncio.Task] = None
+
+
+def see(room_id: str, player_id: str):
+    _seen[(room_id, player_id)] = time.time()
+
+
+def forget(room_id: str, player_id: str):
+    """The player is disconnected, the disconnection time is written instead"""
+    _seen.pop((room_id, player_id), None)
+
+
+def flush():
+    global _seen
+
+    if _seen:
+        seen_players, _seen = _seen, {}
+        storage.touch_players(seen_players)
+
+
+def sweep() -> Dict[str, List[str]]:
+    absent_players = storage.claim_absent_players(
+        seen_before=time.time() - PLAYER_DISCONNECTION_AWAITING_TIME,
+        limit=PRESENCE_CLAIM_LIMIT,
+    )
+    ABSENT_PLAYERS.inc(sum(map(len, absent_players.values())))
+    return absent_players
+
+
+async def sweep_periodically(on_absent_players: AbsentPlayersHandler):
+    flushed_at = time.monotonic()
+
+    while True:
+        await asyncio.sleep(PRESENCE_SWEEP_INTERVAL)
+        start_time = time.perf_counter()
+
+        try:
+            if time.monotonic() - flushed_at >= PRESENCE_FLUSH_INTERVAL:
+                flushed_at = time.monotonic()
+                flush()
+
+            absent_players = sweep()
+            if absent_players:
+                await on_absent_players(absent_players)
+        except Exception:
+            logger.exception("Presence could not be swept")
+
+        SWEEP_LATENCY.observe(time.perf_counter() - start_time)
+
+
+def ensure_sweeping(on_absent_players: AbsentPlayersHandler):
+    """Start the presence sweeper of the current worker, if it is not started yet"""
+    global _sweeping_task
+
+    if _sweeping_task is None or _sweeping_task.done():
+        _sweeping_task = asyncio.get_event_loop().create_task(
+            sweep_periodically(on_absent_players)
+        )
@@ -0,0 +1,241 @@
+"""
+On-demand profiling of the game workers.
+
+Profilers are started at runtime through the control channel:
+
+* `cprofile` profiles a fraction of the game actions with cProfile and dumps
+  pstats files, which show the storage, serialization and game rule costs of
+  the actions;
+* `sampler` samples stacks of the event loop (the main thread) on a wall
+  clock, so the time spent outside of the actions, such as JSON encoding,
+  channel layer I/O and middleware, is seen too. Stacks are dumped in the
+  folded format of flamegraph.pl and speedscope;
+* tracemalloc traces the allocations, every snapshot dumps the allocations
+  by line grown since the previous one with the memory accounting of the
+  worker, see `contact.game.memory`.
+
+    python manage.py profile_workers start --mode sampler
+    python manage.py profile_workers stop
+    python manage.py memory_workers start
+    python manage.py memory_workers snapshot
+
+While no profiler is started, an action only checks that `action_profiler`
+is None. Profilers stop by themselves after GAME_PROFILE_MAX_DURATION.
+"""
+import cProfile
+import collections
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Callable, Optional
+
+from django.conf import settings
+
+from contact.game import control, memory
+
+logger = logging.getLogger(__name__)
+
+MODES = ("cprofile", "sampler")
+
+
+class ActionProfiler:
+    def __init__(self, fraction: float):
+        self.fraction = fraction
+        self.profile = cProfile.Profile()
+        self.deadline = time.monotonic() + settings.GAME_PROFILE_MAX_DURATION
+        self.actions_count = 0
+
+    def call(self, func: Callable, *args, **kwargs):
+        if time.monotonic() > self.deadline:
+            stop()
+            return func(*args, **kwargs)
+
+        if random.random() >= self.fraction:
+            return func(*args, **kwargs)
+
+        self.actions_count += 1
+        self.profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.profile.disable()
+
+    def dump(self):
+        if not self.actions_count:
+            return
+
+        self.profile.dump_stats(control.diagnostics_path("profile") + ".pstats")
+
+
+class StackSampler:
+    def __init__(self, interval: float, thread_id: int):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.stacks = collections.Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self.sample, name="game-stack-sampler", daemon=True
+        )
+
+    @staticmethod
+    def format_stack(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(
+                f"{code.co_name} ({os.path.basename(code.co_filename)}"
+                f":{code.co_firstlineno})"
+            )
+            frame = frame.f_back
+
+        return ";".join(reversed(names))
+
+    def sample(self):
+        deadline = time.monotonic() + settings.GAME_PROFILE_MAX_DURATION
+
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self.format_stack(frame)] += 1
+
+            if time.monotonic() > deadline:
+                stop()
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def dump(self):
+        if not self.stacks:
+            return
+
+        with open(control.diagnostics_path("stacks") + ".folded", "w") as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+class MemoryTracer:
+    # Allocations of tracemalloc itself and of the import machinery are noise
+    filters = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    )
+
+    def __init__(self, frames: int):
+        tracemalloc.start(frames)
+        self.snapshot = self.take_snapshot()
+        self.timer = threading.Timer(settings.GAME_PROFILE_MAX_DURATION, stop_memory)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def take_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(self.filters)
+
+    def dump(self, top: int):
+        snapshot = self.take_snapshot()
+        stats = snapshot.compare_to(self.snapshot, "lineno")
+        self.snapshot = snapshot
+        traced_size, traced_peak = tracemalloc.get_traced_memory()
+
+        report = {
+            "pid": os.getpid(),
+            "time": time.time(),
+            "rss": memory.get_rss(),
+            "traced": traced_size,
+            "traced_peak": traced_peak,
+            "objects": {
+                labels[0]: count
+                for labels, count in memory.count_live_objects().items()
+            },
+            "allocations": [
+                {
+                    "location": f"{stat.traceback[0].filename}:"
+                    f"{stat.traceback[0].lineno}",
+                    "size": stat.size,
+                    "size_diff": stat.size_diff,
+                    "count": stat.count,
+                    "count_diff": stat.count_diff,
+                }
+                for stat in stats[:top]
+            ],
+        }
+        with open(control.diagnostics_path("memory") + ".json", "w") as file:
+            json.dump(report, file)
+
+    def stop(self):
+        self.timer.cancel()
+        tracemalloc.stop()
+
+
+action_profiler: Optional[ActionProfiler] = None
+stack_sampler: Optional[StackSampler] = None
+memory_tracer: Optional[MemoryTracer] = None
+
+
+@control.command("profile_start")
+def start(mode: str = "cprofile", fraction: float = 0.1, interval: float = 0.005):
+    global action_profiler, stack_sampler
+
+    if mode == "cprofile" and action_profiler is None:
+        action_profiler = ActionProfiler(fraction=fraction)
+    elif mode == "sampler" and stack_sampler is None:
+        stack_sampler = StackSampler(
+            interval=interval, thread_id=threading.main_thread().ident
+        )
+        stack_sampler.start()
+
+
+@control.command("profile_stop")
+def stop():
+    global action_profiler, stack_sampler
+
+    profiler, action_profiler = action_profiler, None
+    sampler, stack_sampler = stack_sampler, None
+
+    try:
+        if profiler is not None:
+            profiler.dump()
+        if sampler is not None:
+            sampler.stop()
+            sampler.dump()
+    except OSError:
+        logger.exception("Profile could not be dumped")
+
+
+@control.command("memory_start")
+def start_memory(frames: int = 1):
+    global memory_tracer
+
+    if memory_tracer is None:
+        memory_tracer = MemoryTracer(frames=frames)
+
+
+@control.command("memory_snapshot")
+def snapshot_memory(top: int = 50):
+    if memory_tracer is None:
+        logger.warning("Memory snapshot is requested, but tracing is not started")
+        return
+
+    try:
+        memory_tracer.dump(top=top)
+    except OSError:
+        logger.exception("Memory snapshot could not be dumped")
+
+
+@control.command("memory_stop")
+def stop_memory():
+    global memory_tracer
+
+    tracer, memory_tracer = memory_tracer, None
+    if tracer is not None:
+        tracer.stop()
@@ -0,0 +1,118 @@
+"""
+Background deletion of finished rooms.
+
+Finished rooms are queued in a sorted set scored with the time they should be
+deleted at. The reaper of every worker claims due rooms from the queue and
+unlinks their keys in bounded batches, taking a token per key from a bucket,
+so a big room never turns into a single long command. Once in
+REAPER_SCAN_INTERVAL one of the workers also scans offers and players for
+the ones whose room no longer exists.
+"""
+import asyncio
+import logging
+import time
+from typing import List, Optional
+
+from contact.game import metrics, storage, storage_handler
+from contact.game.constants import (
+    REAPER_BATCH_SIZE,
+    REAPER_INTERVAL,
+    REAPER_KEYS_PER_SECOND,
+    REAPER_ROOMS_PER_CLAIM,
+    REAPER_SCAN_COUNT,
+    REAPER_SCAN_INTERVAL,
+    REAPER_SCAN_LOCK_KEY,
+    REAPER_SCAN_PAUSE,
+)
+from contact.game.throttling import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+REAPED_ROOMS = metrics.counter(
+    "game_reaper_rooms_total", "Rooms deleted by the reaper"
+).labels()
+UNLINKED_KEYS = metrics.counter(
+    "game_reaper_unlinked_keys_total", "Keys deleted by the reaper", ("reason",)
+)
+BATCH_LATENCY = metrics.histogram(
+    "game_reaper_batch_seconds", "Time of unlinking a batch of keys"
+).labels()
+
+_reaping_task: Optional[asyncio.Task] = None
+
+
+async def unlink(keys: List[str], bucket: TokenBucket, reason: str):
+    for start in range(0, len(keys), REAPER_BATCH_SIZE):
+        batch = keys[start : start + REAPER_BATCH_SIZE]
+
+        bucket.refill()
+        while bucket.tokens < len(batch):
+            await asyncio.sleep((len(batch) - bucket.tokens) / bucket.rate)
+            bucket.refill()
+        bucket.tokens -= len(batch)
+
+        start_time = time.perf_counter()
+        storage_handler.unlink(*batch)
+        BATCH_LATENCY.observe(time.perf_counter() - start_time)
+        UNLINKED_KEYS.labels(reason).inc(len(batch))
+
+
+async def reap_rooms(bucket: TokenBucket) -> int:
+    """
+    Delete a batch of the rooms which are due
+    :return: the number of deleted rooms
+    """
+    room_ids = storage.claim_rooms_to_clean(limit=REAPER_ROOMS_PER_CLAIM)
+    if not room_ids:
+        return 0
+
+    storage.release_free_room(room_ids)
+    storage.forget_rooms_presence(room_ids)
+    await unlink(storage.get_rooms_keys(room_ids), bucket, reason="room")
+    REAPED_ROOMS.inc(len(room_ids))
+    return len(room_ids)
+
+
+async def reap_orphans(bucket: TokenBucket):
+    if not storage_handler.acquire_lock(REAPER_SCAN_LOCK_KEY, REAPER_SCAN_INTERVAL):
+        return
+
+    for prefix in (storage.Offer.storage_key_prefix, storage.Player.storage_key_prefix):
+        cursor = 0
+        while True:
+            cursor, keys = storage_handler.scan_keys(
+                cursor=cursor, pattern=f"{prefix}:*", count=REAPER_SCAN_COUNT
+            )
+            orphan_keys = storage.find_orphan_keys(keys) if keys else []
+            await unlink(orphan_keys, bucket, reason="orphan")
+
+            if cursor == 0:
+                break
+
+            await asyncio.sleep(REAPER_SCAN_PAUSE)
+
+
+async def reap_periodically():
+    bucket = TokenBucket(rate=REAPER_KEYS_PER_SECOND, capacity=REAPER_BATCH_SIZE)
+    scanned_at = time.monotonic()
+
+    while True:
+        await asyncio.sleep(REAPER_INTERVAL)
+
+        try:
+            while await reap_rooms(bucket):
+                pass
+
+            if time.monotonic() - scanned_at >= REAPER_SCAN_INTERVAL:
+                scanned_at = time.monotonic()
+                await reap_orphans(bucket)
+        except Exception:
+            logger.exception("Rooms could not be reaped")
+
+
+def ensure_reaping():
+    """Start the reaper of the current worker, if it is not started yet"""
+    global _reaping_task
+
+    if _reaping_task is None or _reaping_task.done():
+        _reaping_task = asyncio.get_event_loop().create_task(reap_periodically())
@@ -0,0 +1,206 @@
+"""
+Redis client of the game storage.
+
+The game storage has a connection pool of its own with a bounded size and
+socket timeouts, so a paused or failing over Redis costs a request at most
+the timeouts instead of hanging the worker event loop. A failed command is
+rejected with `GameStorageError` right away, the client is called from the
+event loop, so it never sleeps. Read-only game actions are retried by
+`retry_reads` with a jittered backoff awaited in the loop instead. When
+commands keep failing, the circuit breaker opens and rejects commands right
+away, then lets a trial command through after GAME_REDIS_BREAKER_RESET_TIMEOUT.
+"""
+import asyncio
+import itertools
+import logging
+import random
+import time
+from typing import Callable
+
+import redis
+from django.conf import settings
+
+from contact.game import metrics
+from contact.game.exceptions import GameStorageError
+
+logger = logging.getLogger(__name__)
+
+READ_COMMANDS = frozenset(
+    (
+        "EXISTS",
+        "GET",
+        "HGET",
+        "HGETALL",
+        "HMGET",
+        "LLEN",
+        "LRANGE",
+        "PING",
+        "SCAN",
+        "SISMEMBER",
+        "SMEMBERS",
+        "TTL",
+        "XRANGE",
+        "XREVRANGE",
+        "ZCARD",
+        "ZRANGE",
+        "ZRANGEBYSCORE",
+        "ZRANK",
+        "ZREVRANGE",
+        "ZREVRANK",
+        "ZSCORE",
+    )
+)
+FAILURES = (redis.ConnectionError, redis.TimeoutError)
+
+POOL_WAIT = metrics.histogram(
+    "game_redis_pool_wait_seconds", "Time of getting a connection from the pool"
+).labels()
+BREAKER_STATE = metrics.gauge(
+    "game_redis_breaker_state", "Circuit breaker state: 0 closed, 1 half open, 2 open"
+).labels()
+BREAKER_REJECTIONS = metrics.counter(
+    "game_redis_breaker_rejections_total", "Commands rejected by the open breaker"
+).labels()
+RETRIES = metrics.counter(
+    "game_redis_retries_total", "Retries of read-only game actions"
+).labels()
+
+UNAVAILABLE = "Game storage is unavailable, try again later"
+
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, failures_threshold, reset_timeout):
+        self.failures_threshold = failures_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def set_state(self, state):
+        self.state = state
+        BREAKER_STATE.set(state)
+
+    def check(self):
+        if self.state != self.OPEN:
+            return
+
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            BREAKER_REJECTIONS.inc()
+            raise GameStorageError(UNAVAILABLE)
+
+        # Let a trial command through, its result closes or opens the breaker
+        self.set_state(self.HALF_OPEN)
+
+    def record_success(self):
+        self.failures = 0
+        if self.state != self.CLOSED:
+            self.set_state(self.CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failures_threshold:
+            if self.state != self.OPEN:
+                logger.error("Game storage breaker opens, %s failures", self.failures)
+            self.opened_at = time.monotonic()
+            self.set_state(self.OPEN)
+
+    def call(self, func: Callable, idempotent: bool):
+        """
+        Call a redis command or pipeline through the breaker
+        :param idempotent: whether the call may be retried on failures
+        :raises GameStorageError: when the call fails
+        """
+        self.check()
+
+        try:
+            result = func()
+        except FAILURES as error:
+            self.record_failure()
+            raise GameStorageError(
+                UNAVAILABLE, retryable=idempotent and self.state != self.OPEN
+            ) from error
+
+        self.record_success()
+        return result
+
+
+class GameConnectionPool(redis.BlockingConnectionPool):
+    def get_connection(self, *args, **kwargs):
+        start_time = time.perf_counter()
+        try:
+            return super().get_connection(*args, **kwargs)
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - start_time)
+
+
+class GamePipeline(redis.client.Pipeline):
+    breaker: CircuitBreaker
+
+    def execute(self, raise_on_error=True):
+        commands = list(self.command_stack)
+        idempotent = not self.transaction and all(
+            args[0] in READ_COMMANDS for args, _ in commands
+        )
+
+        def execute():
+            # A failed execution resets the pipeline
+            self.command_stack = list(commands)
+            return super(GamePipeline, self).execute(raise_on_error)
+
+        return self.breaker.call(execute, idempotent=idempotent)
+
+
+class GameRedis(redis.StrictRedis):
+    def __init__(self, breaker: CircuitBreaker, **kwargs):
+        super().__init__(**kwargs)
+        self.breaker = breaker
+
+    def execute_command(self, *args, **options):
+        return self.breaker.call(
+            lambda: super(GameRedis, self).execute_command(*args, **options),
+            idempotent=args[0] in READ_COMMANDS,
+        )
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipeline = GamePipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+        pipeline.breaker = self.breaker
+        return pipeline
+
+
+def create_client() -> GameRedis:
+    pool = GameConnectionPool.from_url(
+        settings.REDIS_LOCATION,
+        max_connections=settings.GAME_REDIS_MAX_CONNECTIONS,
+        timeout=settings.GAME_REDIS_POOL_TIMEOUT,
+        socket_connect_timeout=settings.GAME_REDIS_CONNECT_TIMEOUT,
+        socket_timeout=settings.GAME_REDIS_READ_TIMEOUT,
+        health_check_interval=settings.GAME_REDIS_HEALTH_CHECK_INTERVAL,
+    )
+    breaker = CircuitBreaker(
+        failures_threshold=settings.GAME_REDIS_BREAKER_FAILURES,
+        reset_timeout=settings.GAME_REDIS_BREAKER_RESET_TIMEOUT,
+    )
+    return GameRedis(breaker=breaker, connection_pool=pool)
+
+
+async def retry_reads(func: Callable, *args):
+    """
+    Call a function issuing only idempotent storage reads. Retryable failures
+    are retried GAME_REDIS_READ_RETRIES times after a jittered exponential
+    backoff, which is awaited, so the event loop is not blocked meanwhile.
+    """
+    for attempt in itertools.count():
+        try:
+            return func(*args)
+        except GameStorageError as error:
+            if not error.retryable or attempt >= settings.GAME_REDIS_READ_RETRIES:
+                raise
+
+        RETRIES.inc()
+        await asyncio.sleep(
+            random.uniform(0, settings.GAME_REDIS_RETRY_BACKOFF * 2 ** attempt)
+        )
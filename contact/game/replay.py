@@ -0,0 +1,291 @@
+"""
+Replay of the recorded game socket traffic, see `contact.game.traffic`.
+
+Recorded connections are opened in process against the ASGI consumers of the
+game, so the replay uses the configured storage and channel layer. Every
+connection connects, sends its frames and disconnects at the recorded
+offsets divided by the speed, or as fast as possible with the zero speed.
+Users are replaced with unsaved users named after the anonymized ones and
+the run, so a replay never restores players of a previous one.
+
+The latency of a frame is the time until the connection receives the first
+frame of the same event, the response or an error. Divergence from the
+recording is counted for frames which fail when they succeeded or the other
+way round, frames left without a response and recorded rooms whose players
+are not in a room of their own after the replay. Offer ids of the frames are
+mapped to the ids of the offers created by the replay, a frame referring to
+an offer which is not created yet waits for it.
+"""
+import asyncio
+import collections
+import json
+import logging
+import statistics
+import time
+import typing
+import uuid
+from typing import Dict, List, Optional
+
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+
+from contact.game import traffic
+from contact.game.constants import GameEvent
+from contact.game.routes import game_connection
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_TIMEOUT = 5  # seconds
+NO_RESPONSE_EVENTS = {GameEvent.PING.value}
+
+
+def get_event(text: str) -> str:
+    try:
+        content = json.loads(text)
+    except ValueError:
+        return GameEvent.ERROR.value
+
+    event = content.get("event") if isinstance(content, dict) else None
+    if event not in GameEvent._value2member_map_:
+        return GameEvent.ERROR.value
+    return event
+
+
+class Report:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = collections.defaultdict(list)
+        self.diverged: typing.Counter[str] = collections.Counter()
+        self.unanswered: typing.Counter[str] = collections.Counter()
+        self.connections = 0
+        self.failed_connections = 0
+        self.crashed_connections = 0
+        self.rooms = 0
+        self.diverged_rooms = 0
+        self.duration = 0.0
+
+    def as_dict(self) -> dict:
+        events = {}
+        for event in sorted({*self.latencies, *self.diverged, *self.unanswered}):
+            latencies = sorted(self.latencies[event])
+            events[event] = {
+                "frames": len(latencies) + self.unanswered[event],
+                "diverged": self.diverged[event],
+                "unanswered": self.unanswered[event],
+                "median": statistics.median(latencies) if latencies else None,
+                "p95": latencies[int(len(latencies) * 0.95)] if latencies else None,
+                "max": latencies[-1] if latencies else None,
+            }
+
+        return {
+            "connections": self.connections,
+            "failed_connections": self.failed_connections,
+            "crashed_connections": self.crashed_connections,
+            "rooms": self.rooms,
+            "diverged_rooms": self.diverged_rooms,
+            "duration": round(self.duration, 3),
+            "events": events,
+        }
+
+
+class PendingFrame:
+    def __init__(self, event: str, error: Optional[str], offer_id: Optional[str]):
+        self.event = event
+        self.error = error
+        self.offer_id = offer_id
+        self.sent_at = time.perf_counter()
+
+
+class ReplayedConnection:
+    def __init__(self, replayer: "Replayer", records: List[list]):
+        self.replayer = replayer
+        self.records = records
+        self.connection, self.user = records[0][2], records[0][3]
+        self.username = f"replay-{replayer.run}-{self.user}"
+        self.room_id: Optional[str] = None
+        self.pending: List[PendingFrame] = []
+        self.communicator: Optional[WebsocketCommunicator] = None
+
+    def create_application(self):
+        user = get_user_model()(username=self.username)
+        return lambda scope: game_connection({**scope, "user": user})
+
+    async def run(self):
+        report = self.replayer.report
+        await self.replayer.wait_until(self.records[0][1])
+
+        self.communicator = WebsocketCommunicator(
+            self.create_application(), "/ws/contact-game"
+        )
+        connected, _ = await self.communicator.connect(timeout=RESPONSE_TIMEOUT)
+        report.connections += 1
+        if not connected:
+            report.failed_connections += 1
+            return
+
+        receiving = asyncio.ensure_future(self.receive())
+        close_code = 1000
+        try:
+            for record in self.records[1:]:
+                await self.replayer.wait_until(record[1])
+                if record[0] == traffic.FRAME:
+                    await self.send(*record[3:6])
+                elif record[0] == traffic.DISCONNECT:
+                    close_code = record[3] or close_code
+                    break
+
+            await self.wait_responses()
+            await self.communicator.disconnect(code=close_code)
+        except Exception:
+            logger.exception("Consumer of connection %s crashed", self.connection)
+            report.crashed_connections += 1
+        finally:
+            receiving.cancel()
+            self.communicator.stop(exceptions=False)
+
+        for frame in self.pending:
+            report.unanswered[frame.event] += 1
+
+    async def send(self, text: str, error: Optional[str], offer_id: Optional[str]):
+        event = get_event(text)
+        text = await self.map_offer_ids(text)
+        if event not in NO_RESPONSE_EVENTS:
+            self.pending.append(PendingFrame(event, error, offer_id))
+        await self.communicator.send_to(text_data=text)
+
+    async def map_offer_ids(self, text: str) -> str:
+        try:
+            content = json.loads(text)
+            offer_id = content["data"]["offer_id"]
+        except (ValueError, TypeError, KeyError):
+            return text
+
+        replayed_id = await self.replayer.get_offer_id(offer_id)
+        if replayed_id is None:
+            return text
+
+        content["data"]["offer_id"] = replayed_id
+        return json.dumps(content)
+
+    async def receive(self):
+        while True:
+            try:
+                message = await self.communicator.receive_output(timeout=None)
+            except Exception:
+                # A crashed consumer is reported when the connection is closed
+                return
+            if message["type"] != "websocket.send":
+                return
+
+            content = json.loads(message["text"])
+            if self.room_id is None:
+                self.room_id = content.get("data", {}).get("id_key")
+            self.match_response(content)
+
+    def match_response(self, content: dict):
+        event = content.get("event")
+        frame = next((frame for frame in self.pending if frame.event == event), None)
+        if frame is None:
+            return
+
+        self.pending.remove(frame)
+        report = self.replayer.report
+        report.latencies[event].append(time.perf_counter() - frame.sent_at)
+
+        failed = bool(content.get("error"))
+        if failed != (frame.error is not None):
+            report.diverged[event] += 1
+
+        # Frames waiting for an offer the replay failed to create are sent as is
+        if frame.offer_id is not None:
+            self.replayer.set_offer_id(
+                frame.offer_id,
+                None
+                if failed
+                else traffic.find_created_offer_id(content["data"], self.username),
+            )
+
+    async def wait_responses(self):
+        deadline = time.perf_counter() + RESPONSE_TIMEOUT
+        while self.pending and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+
+
+class Replayer:
+    def __init__(self, records: List[list], speed: float = 1):
+        """:param speed: 0 to replay as fast as possible"""
+        self.records = records
+        self.speed = speed
+        self.run = uuid.uuid4().hex[:8]
+        self.report = Report()
+        self.started_at = 0.0
+        self.offer_ids: Dict[str, Optional[str]] = {}
+        self.offer_created: Dict[str, asyncio.Event] = collections.defaultdict(
+            asyncio.Event
+        )
+        # Offers which the replay should create, others never get mapped
+        self.recorded_offer_ids = {
+            record[5]
+            for record in records
+            if record[0] == traffic.FRAME and record[5] is not None
+        }
+
+    async def wait_until(self, timestamp: float):
+        if not self.speed:
+            return
+
+        delay = (timestamp - self.records[0][1]) / self.speed
+        await asyncio.sleep(self.started_at + delay - time.perf_counter())
+
+    async def get_offer_id(self, offer_id: str) -> Optional[str]:
+        if offer_id not in self.recorded_offer_ids:
+            return None
+
+        try:
+            await asyncio.wait_for(
+                self.offer_created[offer_id].wait(), timeout=RESPONSE_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            return None
+        return self.offer_ids[offer_id]
+
+    def set_offer_id(self, offer_id: str, replayed_id: Optional[str]):
+        self.offer_ids[offer_id] = replayed_id
+        self.offer_created[offer_id].set()
+
+    def group_connections(self) -> List[ReplayedConnection]:
+        records_by_connection: Dict[str, List[list]] = {}
+        for record in self.records:
+            # Connections opened before the recording was started are skipped
+            if record[0] == traffic.CONNECT:
+                records_by_connection[record[2]] = [record]
+            elif record[2] in records_by_connection:
+                records_by_connection[record[2]].append(record)
+
+        return [
+            ReplayedConnection(self, records)
+            for records in records_by_connection.values()
+        ]
+
+    def compare_rooms(self, connections: List[ReplayedConnection]):
+        recorded_rooms = collections.defaultdict(set)
+        replayed_rooms = collections.defaultdict(set)
+        for connection in connections:
+            recorded_rooms[connection.records[0][4]].add(connection.user)
+            replayed_rooms[connection.room_id].add(connection.user)
+
+        players_rooms = {
+            user: users for users in replayed_rooms.values() for user in users
+        }
+        self.report.rooms = len(recorded_rooms)
+        self.report.diverged_rooms = sum(
+            any(players_rooms.get(user) != users for user in users)
+            for users in recorded_rooms.values()
+        )
+
+    async def replay(self) -> Report:
+        connections = self.group_connections()
+        self.started_at = time.perf_counter()
+        await asyncio.gather(*(connection.run() for connection in connections))
+        self.report.duration = time.perf_counter() - self.started_at
+        self.compare_rooms(connections)
+        return self.report
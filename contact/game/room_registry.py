@@ -0,0 +1,97 @@
+"""
+Rooms shared by the game managers of a worker.
+
+Players of a room connected to the same worker share a single `Room` object
+with its offers. The object is kept until its last manager is gone. Every
+change of a room increments its version in the storage, and the object
+remembers the version it was read at, so actions which do not change the
+room, such as player state requests, read only the version while it matches.
+Actions changing the room read its fields before, so they are saved over the
+current ones, and its offers after, which keeps the object fresh unless a
+different worker changed the room meanwhile.
+"""
+import weakref
+from typing import Optional
+
+from contact.game import metrics, storage
+
+REGISTRY_READS = metrics.counter(
+    "game_room_registry_reads_total",
+    "Rooms got from the registry by whether they were fresh, refreshed or loaded",
+    ("result",),
+)
+HITS = REGISTRY_READS.labels("fresh")
+REFRESHES = REGISTRY_READS.labels("refreshed")
+LOADS = REGISTRY_READS.labels("loaded")
+
+_rooms: "weakref.WeakValueDictionary[str, storage.Room]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+def read(room_id: str, version: int) -> Optional[storage.Room]:
+    """
+    :param version: the version of the room read before its fields, so a change
+        made while reading them makes the room stale
+    :return: the room with the fields read from the storage or None if it does
+        not exist
+    """
+    room = _rooms.get(room_id)
+
+    if room is None:
+        LOADS.inc()
+        room = storage.Room.get_by_id(obj_id=room_id)
+        if room is None:
+            return None
+        room = _rooms.setdefault(room_id, room)
+    else:
+        REFRESHES.inc()
+        room.refresh()
+
+    room.version = version
+    return room
+
+
+def get(room_id: str) -> Optional[storage.Room]:
+    """:return: the fresh room with its offers or None if it does not exist"""
+    version = storage.Room.get_version(room_id)
+    room = _rooms.get(room_id)
+
+    if room is not None and room.version == version:
+        HITS.inc()
+        return room
+
+    room = read(room_id, version)
+    if room is not None:
+        room.get_offers()
+    return room
+
+
+def get_for_update(room_id: str) -> Optional[storage.Room]:
+    """
+    :return: the room with the fields read from the storage or None if it does
+        not exist, its offers are read by `updated` once it is changed
+    """
+    return read(room_id, storage.Room.get_version(room_id))
+
+
+def updated(room: storage.Room):
+    """Keep the room changed by the worker fresh and mark other copies stale"""
+    version = storage.Room.increment_version(room.id_key)
+    # Changes of other workers since the room was read are not in the object
+    if room.version is None or version != room.version + 1:
+        version = None
+    room.version = version
+    room.get_offers()
+
+
+def invalidate(room_id: str):
+    room = _rooms.get(room_id)
+    if room is not None:
+        room.version = None
+
+
+def changed(room_id: str):
+    """Mark the room stale in every worker after changing it"""
+    storage.Room.increment_version(room_id)
+    invalidate(room_id)
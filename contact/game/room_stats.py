@@ -0,0 +1,84 @@
+"""
+Aggregates of the rooms stored at the moment.
+
+Rooms are walked with SCAN and described in pipelined batches of
+ROOM_STATS_SCAN_COUNT keys with a pause between the batches, so a live Redis
+keeps serving the games while the stats are collected.
+"""
+import bisect
+import collections
+import time
+from typing import Optional
+
+from contact.game import storage, storage_handler
+from contact.game.constants import (
+    ROOM_STATS_OFFER_BUCKETS,
+    ROOM_STATS_SCAN_COUNT,
+    ROOM_STATS_SCAN_PAUSE,
+)
+
+ROOM_STATES = ("open", "full", "started", "finished", "cleaning")
+
+
+def get_offers_bucket(offers_count: int) -> str:
+    index = bisect.bisect_right(ROOM_STATS_OFFER_BUCKETS, offers_count) - 1
+    lower = ROOM_STATS_OFFER_BUCKETS[index]
+
+    if index + 1 == len(ROOM_STATS_OFFER_BUCKETS):
+        return f"{lower}+"
+    upper = ROOM_STATS_OFFER_BUCKETS[index + 1] - 1
+    return str(lower) if lower == upper else f"{lower}-{upper}"
+
+
+def collect(pause: float = ROOM_STATS_SCAN_PAUSE) -> dict:
+    start_time = time.perf_counter()
+    rooms_by_state = dict.fromkeys(ROOM_STATES, 0)
+    offers_distribution = collections.OrderedDict(
+        (get_offers_bucket(count), 0) for count in ROOM_STATS_OFFER_BUCKETS
+    )
+    rooms_count = players_count = offers_count = 0
+    oldest_room: Optional[dict] = None
+    cursor = 0
+
+    while True:
+        cursor, keys = storage_handler.scan_keys(
+            cursor=cursor,
+            pattern=f"{storage.Room.storage_key_prefix}:*",
+            count=ROOM_STATS_SCAN_COUNT,
+        )
+
+        for room in storage.describe_rooms(keys) if keys else ():
+            rooms_count += 1
+            rooms_by_state[room["state"]] += 1
+            players_count += room["players"]
+            offers_count += room["offers"]
+            offers_distribution[get_offers_bucket(room["offers"])] += 1
+
+            # Rooms created before the creation time was stored have none
+            if room["created_at"] and (
+                oldest_room is None or room["created_at"] < oldest_room["created_at"]
+            ):
+                oldest_room = room
+
+        if cursor == 0:
+            break
+
+        time.sleep(pause)
+
+    if oldest_room is not None:
+        oldest_room = {
+            "id": oldest_room["id"],
+            "state": oldest_room["state"],
+            "age": int(time.time()) - oldest_room["created_at"],
+        }
+
+    return {
+        "rooms": rooms_count,
+        "rooms_by_state": rooms_by_state,
+        "players": players_count,
+        "offers": offers_count,
+        "offers_distribution": offers_distribution,
+        "oldest_room": oldest_room,
+        "collected_at": int(time.time()),
+        "collection_time": round(time.perf_counter() - start_time, 3),
+    }
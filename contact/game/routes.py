@@ -1,5 +1,18 @@
+from urllib.parse import parse_qs
+
 from django.urls import path
 
-from contact.game.consumers import ContactGameWSConsumer
+from contact.game.consumers import ContactGameSpectatorConsumer, ContactGameWSConsumer
+
+
+def game_connection(scope):
+    """Spectators connect to the game route with the `spectate=<room_id>` query"""
+    query = parse_qs(scope.get("query_string", b"").decode())
+
+    if "spectate" in query:
+        return ContactGameSpectatorConsumer(scope)
+
+    return ContactGameWSConsumer(scope)
+
 
-websocket_urlpatterns = [path("ws/contact-game", ContactGameWSConsumer)]
+websocket_urlpatterns = [path("ws/contact-game", game_connection)]
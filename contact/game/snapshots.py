@@ -0,0 +1,98 @@
+"""
+Process local cache of encoded room snapshots for spectators.
+
+Every room broadcast carries the full public room state, so the latest
+broadcast is the snapshot sent to joining spectators. The cache is filled
+from the room event stream once per process and then kept up to date by the
+broadcasts spectators of the room receive, which also lets all the local
+spectators share a single encoding of every message.
+"""
+import json
+from typing import Dict, Optional
+
+from contact.game import storage
+from contact.game.constants import GameEvent
+
+
+class RoomSnapshot:
+    __slots__ = ("event_id", "text", "spectators_count")
+
+    def __init__(self):
+        self.event_id = None
+        self.text = None
+        self.spectators_count = 0
+
+
+class RoomSnapshotCache:
+    def __init__(self):
+        self.rooms: Dict[str, RoomSnapshot] = {}
+
+    def acquire(self, room_id: str) -> Optional[str]:
+        """
+        Register a spectator of the room
+        :return: the encoded snapshot or None when the room does not exist
+        """
+        snapshot = self.rooms.get(room_id)
+
+        if snapshot is None:
+            snapshot = RoomSnapshot()
+            if not self.load(room_id, snapshot):
+                return None
+            self.rooms[room_id] = snapshot
+
+        snapshot.spectators_count += 1
+        return snapshot.text
+
+    def release(self, room_id: str):
+        """The snapshot is not updated without spectators, so it is evicted"""
+        snapshot = self.rooms.get(room_id)
+        if snapshot is None:
+            return
+
+        snapshot.spectators_count -= 1
+        if snapshot.spectators_count <= 0:
+            del self.rooms[room_id]
+
+    @staticmethod
+    def load(room_id: str, snapshot: RoomSnapshot) -> bool:
+        last_event = storage.get_last_room_event(room_id)
+
+        if last_event is not None:
+            event_id, message = last_event
+            snapshot.event_id = event_id
+            snapshot.text = json.dumps({**json.loads(message), "event_id": event_id})
+            return True
+
+        room = storage.Room.get_by_id(obj_id=room_id)
+        if room is None:
+            return False
+
+        room.get_offers()
+        snapshot.text = json.dumps(
+            {"data": room.common_data, "event": GameEvent.ROOM_STATE.value}
+        )
+        return True
+
+    def encode(self, room_id: str, message: dict) -> str:
+        """Encode a room broadcast once for all the local spectators"""
+        snapshot = self.rooms.get(room_id)
+        event_id = message.get("event_id")
+
+        if snapshot is None:
+            return json.dumps(message)
+
+        if event_id is not None and event_id == snapshot.event_id:
+            return snapshot.text
+
+        text = json.dumps(message)
+        if event_id is not None and (
+            snapshot.event_id is None
+            or storage.parse_event_id(event_id)
+            > storage.parse_event_id(snapshot.event_id)
+        ):
+            snapshot.event_id, snapshot.text = event_id, text
+
+        return text
+
+
+room_snapshots = RoomSnapshotCache()
@@ -1,6 +1,8 @@
-import asyncio
+import collections
+import json
 import time
-from typing import List
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 
 from contact.game import constants, storage_handler
 
@@ -36,12 +38,15 @@ class Offer(storage_handler.StorageComplexObject):
         callback=open_answer_callback, null=True
     )
     answer_internal = storage_handler.StringField(internal=True)
-    hints = storage_handler.ListField()
+    room_id = storage_handler.RelationKeyField(internal=True)
+    hints = storage_handler.ListField(
+        native=True, max_length=constants.OFFER_HINTS_MAX_LENGTH
+    )
     # Contact related
     is_canceled = storage_handler.BooleanField(default=False)
     is_contacted = storage_handler.BooleanField(default=False)
     in_process = storage_handler.BooleanField(default=False)
-    participants = storage_handler.ListField()
+    participants = storage_handler.ListField(native=True)
     estimated_word = storage_handler.StringField()
 
     storage_key_prefix = "offer"
@@ -64,6 +69,8 @@ class Room(storage_handler.StorageComplexObject):
     is_full = storage_handler.BooleanField(default=False)
     game_is_started = storage_handler.BooleanField(default=False)
     game_is_finished = storage_handler.BooleanField(default=False)
+    created_at = storage_handler.IntegerField(default=0, internal=True)
+    started_at = storage_handler.IntegerField(default=0, internal=True)
     winner = storage_handler.StringField()
     game_finish_reason = storage_handler.StringField()
 
@@ -75,12 +82,18 @@ class Room(storage_handler.StorageComplexObject):
 
     contact_in_process = storage_handler.BooleanField(default=False)
     contact_offer_key = storage_handler.StringField(internal=True)
+    contact_player_key = storage_handler.StringField(internal=True)
 
     storage_key_prefix = "room"
     free_room_storage_key = "free_room"
     players_storage_key_prefix = "players:room"
     offers_storage_key_prefix = "offers:room"
     processed_offers_key_prefix = "offers:processed:room"
+    events_stream_key_prefix = "events:room"
+    version_key_prefix = "version:room"
+    # The version of the room in the storage the object of the worker matches,
+    # None when the object is stale
+    version: Optional[int] = None
 
     # TODO: Maybe – PROBABLY – I should use ListField instead of storage lists
 
@@ -96,6 +109,21 @@ class Room(storage_handler.StorageComplexObject):
     def processed_offers_set_key(self):
         return f"{self.processed_offers_key_prefix}:{self.id_key}"
 
+    @property
+    def events_stream_key(self):
+        return f"{self.events_stream_key_prefix}:{self.id_key}"
+
+    @classmethod
+    def get_version(cls, room_id: str) -> int:
+        """:return: the number of changes of the room"""
+        return int(
+            storage_handler.get_value(f"{cls.version_key_prefix}:{room_id}") or 0
+        )
+
+    @classmethod
+    def increment_version(cls, room_id: str) -> int:
+        return storage_handler.increment(f"{cls.version_key_prefix}:{room_id}")
+
     @classmethod
     def get_free_room(cls) -> "Room":
         free_room_id = storage_handler.get_redis_value(key=cls.free_room_storage_key)
@@ -103,7 +131,7 @@ class Room(storage_handler.StorageComplexObject):
 
     @classmethod
     def create_room(cls) -> "Room":
-        new_room = cls.create_object()
+        new_room = cls.create_object(created_at=int(time.time()))
         storage_handler.set_value(key=cls.free_room_storage_key, value=new_room.id_key)
         return new_room
 
@@ -120,15 +148,49 @@ class Room(storage_handler.StorageComplexObject):
     def get_room_players(self) -> List[Player]:
         return self.get_room_related_objects(Player, self.get_player_ids())
 
-    def get_offers(self):
-        self.data["offers"] = [
+    @classmethod
+    def get_offers_data(cls, offer_ids: List[str]) -> List[dict]:
+        return [
             offer.common_data
-            for offer in self.get_room_related_objects(Offer, self.get_offer_ids())
+            for offer in Offer.get_by_ids(offer_ids)
+            if offer is not None
         ]
+
+    def get_offers(self):
+        """
+        Attach the last OFFERS_PAGE_SIZE offers, the number of offers and the
+        cursor of the older ones
+        """
+        offer_ids, offers_count = storage_handler.get_list_tail(
+            key=self.offer_list_key, count=constants.OFFERS_PAGE_SIZE
+        )
+        self.data["offers"] = self.get_offers_data(offer_ids)
+        self.data["offers_count"] = offers_count
+        self.data["offers_cursor"] = offers_count - len(offer_ids)
         self._StorageComplexObject__update_fields()
 
+    def get_offers_page(self, cursor: int) -> dict:
+        """
+        :param cursor: the number of offers preceding the page
+        :return: the offers created before the cursor and the cursor of the
+            offers preceding them, which is 0 on the first page
+        """
+        start = max(cursor - constants.OFFERS_PAGE_SIZE, 0)
+        offer_ids = []
+        if cursor > 0:
+            offer_ids = storage_handler.get_list_slice(
+                key=self.offer_list_key, start=start, end=cursor - 1
+            )
+
+        return {"offers": self.get_offers_data(offer_ids), "offers_cursor": start}
+
     def clear_offers(self):
-        storage_handler.delete(*self.get_offer_ids(), self.offer_list_key)
+        offer_keys = []
+        for offer_id in self.get_offer_ids():
+            offer_keys.append(Offer.get_storage_key(offer_id))
+            offer_keys.extend(Offer.get_native_keys(offer_id))
+
+        storage_handler.delete(*offer_keys, self.offer_list_key)
 
     def unfree(self):
         storage_handler.delete(self.free_room_storage_key)
@@ -157,65 +219,301 @@ def check_answer_relevance(answer, room: Room) -> bool:
     )
 
 
-def set_player_disconnected(player):
-    storage_handler.set_value(
-        key=f"disconnection:{player.id_key}",
-        value=1,
-        expire=constants.PLAYER_DISCONNECTION_AWAITING_TIME + 5,
+def parse_event_id(event_id: str) -> Tuple[int, int]:
+    milliseconds, _, sequence = event_id.partition("-")
+    return int(milliseconds), int(sequence or 0)
+
+
+def append_room_event(room: Room, message: str) -> str:
+    return storage_handler.stream_add(
+        stream_key=room.events_stream_key,
+        value=message,
+        max_length=constants.ROOM_EVENTS_MAX_LENGTH,
     )
 
 
-def delete_player_from_disconnected(player):
-    storage_handler.delete(
-        constants.DISCONNECTION_KEY_FORMAT.format(player_id=player.id_key)
+def get_room_events_after(room: Room, event_id: str) -> Optional[List[Tuple[str, str]]]:
+    """
+    :return: events which have been appended after the given one
+        or None when some of them are already trimmed
+    """
+    try:
+        last_event_id = parse_event_id(event_id)
+    except ValueError:
+        return None
+
+    events = storage_handler.stream_range(
+        stream_key=room.events_stream_key, start=event_id
+    )
+
+    # The given event is the first one returned unless it has been trimmed
+    if not events or parse_event_id(events[0][0]) != last_event_id:
+        return None
+
+    return events[1:]
+
+
+def get_last_room_event(room_id: str) -> Optional[Tuple[str, str]]:
+    return storage_handler.stream_last(
+        stream_key=f"{Room.events_stream_key_prefix}:{room_id}"
     )
 
 
-def check_for_disconnected_player(player):
-    return bool(
-        storage_handler.get_value(
-            constants.DISCONNECTION_KEY_FORMAT.format(player_id=player.id_key)
+def hand_off_room_actions(room_id: str, actions: List[dict]):
+    key = constants.HANDOFF_KEY_FORMAT.format(room_id=room_id)
+    storage_handler.list_push(key, *(json.dumps(action) for action in actions))
+    storage_handler.expire(key, constants.GAME_TIME_LIMIT)
+
+
+def claim_room_actions(room: Room) -> List[dict]:
+    """Actions handed off by a drained worker. Only one claimer gets them"""
+    values = storage_handler.pop_list(
+        constants.HANDOFF_KEY_FORMAT.format(room_id=room.id_key)
+    )
+    return [json.loads(value) for value in values]
+
+
+def get_leaderboard_key(period: str, moment: Optional[datetime] = None) -> str:
+    moment = moment or datetime.utcnow()
+
+    if period == constants.LeaderboardPeriod.DAILY:
+        return f"leaderboard:daily:{moment:%Y%m%d}"
+    if period == constants.LeaderboardPeriod.WEEKLY:
+        year, week, _ = moment.isocalendar()
+        return f"leaderboard:weekly:{year}w{week:02}"
+    return "leaderboard:global"
+
+
+def award_points(points: Dict[str, int]):
+    """
+    Increase points of the players and their leaderboard scores in one round trip
+    :param points: player ids mapped to the points they get
+    """
+    now = datetime.utcnow()
+    leaderboard_keys = {
+        period: get_leaderboard_key(period, now)
+        for period in (
+            constants.LeaderboardPeriod.GLOBAL,
+            constants.LeaderboardPeriod.DAILY,
+            constants.LeaderboardPeriod.WEEKLY,
         )
+    }
+    storage_handler.increment_many(
+        hash_increments=[
+            (Player.get_storage_key(player_id), "points", amount)
+            for player_id, amount in points.items()
+        ],
+        sorted_set_increments=[
+            (key, player_id, amount)
+            for key in leaderboard_keys.values()
+            for player_id, amount in points.items()
+        ],
+        expirations={
+            leaderboard_keys[period]: seconds
+            for period, seconds in constants.LEADERBOARD_TTL.items()
+        },
     )
 
 
-async def clean_room(room):
-    start_time = time.time()
-    print(f"Room cleaning will be processed in {constants.ROOM_CLEANING_DELAY}")
-    storage_handler.set_value(
-        key=constants.CLEANING_ROOM_KEY_FORMAT.format(room_id=room.id_key), value=1
+def get_leaderboard_page(period: str, start: int, count: int):
+    """:return: (player id, points) pairs from the `start` rank and the total"""
+    return storage_handler.sorted_set_top(get_leaderboard_key(period), start, count)
+
+
+def get_leaderboard_rank(period: str, player_id: str) -> Optional[Tuple[int, float]]:
+    return storage_handler.sorted_set_rank(get_leaderboard_key(period), player_id)
+
+
+def presence_member(room_id: str, player_id: str) -> str:
+    return f"{room_id}:{player_id}"
+
+
+def touch_players(seen_players: Dict[Tuple[str, str], float]):
+    """
+    :param seen_players: (room id, player id) pairs mapped to the time
+        the players were last seen
+    """
+    storage_handler.sorted_set_add_many(
+        key=constants.PRESENCE_KEY,
+        scores={
+            presence_member(room_id, player_id): seen_at
+            for (room_id, player_id), seen_at in seen_players.items()
+        },
     )
-    await asyncio.sleep(constants.ROOM_CLEANING_DELAY)
-    offer_ids = (f"offer:{offer_id}" for offer_id in room.get_offer_ids())
-    player_ids = (f"player:{player_id}" for player_id in room.get_player_ids())
-    storage_handler.delete(
-        *offer_ids,
-        *player_ids,
-        room.storage_key,
-        room.offer_list_key,
-        room.players_list_key,
-        room.processed_offers_set_key,
+
+
+def claim_absent_players(seen_before: float, limit: int) -> Dict[str, List[str]]:
+    """
+    Players of all the rooms who have not been seen since the given time.
+    Every absent player is claimed by one caller only.
+    :return: room ids mapped to the absent player ids
+    """
+    absent_players = collections.defaultdict(list)
+    members = storage_handler.sorted_set_pop_by_score(
+        key=constants.PRESENCE_KEY, max_score=seen_before, count=limit
     )
 
-    print(storage_handler.get_value("free_room"))
-    if storage_handler.get_value("free_room") == room.id_key:
-        storage_handler.delete("free_room")
+    for member in members:
+        # Room ids are hex strings, so the first colon ends the room id
+        room_id, _, player_id = member.partition(":")
+        absent_players[room_id].append(player_id)
 
-    storage_handler.delete(
-        constants.CLEANING_ROOM_KEY_FORMAT.format(room_id=room.id_key)
+    return dict(absent_players)
+
+
+def forget_rooms_presence(room_ids: List[str]):
+    player_ids_by_room = storage_handler.get_lists(
+        [f"{Room.players_storage_key_prefix}:{room_id}" for room_id in room_ids]
     )
-    print(f"Room cleaning done. Spent {time.time() - start_time}")
+    members = [
+        presence_member(room_id, player_id)
+        for room_id, player_ids in zip(room_ids, player_ids_by_room)
+        for player_id in player_ids
+    ]
+
+    if members:
+        storage_handler.sorted_set_remove(constants.PRESENCE_KEY, *members)
+
+
+def forget_room_presence(room_id: str):
+    forget_rooms_presence([room_id])
 
 
 def order_room_cleaning(room):
-    asyncio.create_task(clean_room(room))
+    """Queue the room to be deleted by the reaper after ROOM_CLEANING_DELAY"""
+    storage_handler.sorted_set_add(
+        key=constants.REAPER_QUEUE_KEY,
+        member=room.id_key,
+        score=time.time() + constants.ROOM_CLEANING_DELAY,
+        only_new=True,
+    )
 
 
 def room_is_cleaning(room):
-    return storage_handler.exist(
-        constants.CLEANING_ROOM_KEY_FORMAT.format(room_id=room.id_key)
+    return (
+        storage_handler.sorted_set_score(constants.REAPER_QUEUE_KEY, room.id_key)
+        is not None
     )
 
 
+def claim_rooms_to_clean(limit: int) -> List[str]:
+    return storage_handler.sorted_set_pop_by_score(
+        key=constants.REAPER_QUEUE_KEY, max_score=time.time(), count=limit
+    )
+
+
+def get_rooms_keys(room_ids: List[str]) -> List[str]:
+    """All the keys of the rooms including their offers and players"""
+    related_ids = storage_handler.get_lists(
+        [
+            f"{prefix}:{room_id}"
+            for room_id in room_ids
+            for prefix in (
+                Room.offers_storage_key_prefix,
+                Room.players_storage_key_prefix,
+            )
+        ]
+    )
+    keys = []
+
+    for room_id, offer_ids, player_ids in zip(
+        room_ids, related_ids[::2], related_ids[1::2]
+    ):
+        for offer_id in offer_ids:
+            keys.append(Offer.get_storage_key(offer_id))
+            keys.extend(Offer.get_native_keys(offer_id))
+        keys.extend(map(Player.get_storage_key, player_ids))
+        keys.append(Room.get_storage_key(room_id))
+        keys.extend(
+            f"{prefix}:{room_id}"
+            for prefix in (
+                Room.offers_storage_key_prefix,
+                Room.players_storage_key_prefix,
+                Room.processed_offers_key_prefix,
+                Room.events_stream_key_prefix,
+                Room.version_key_prefix,
+            )
+        )
+        keys.append(constants.HANDOFF_KEY_FORMAT.format(room_id=room_id))
+
+    return keys
+
+
+def release_free_room(room_ids: List[str]):
+    if storage_handler.get_value(Room.free_room_storage_key) in room_ids:
+        storage_handler.delete(Room.free_room_storage_key)
+
+
+def find_orphan_keys(keys: List[str]) -> List[str]:
+    """
+    Keys of offers and players whose room does not exist and keys of native
+    lists whose object does not exist. Objects stored without a room id are
+    not considered orphans.
+    """
+    object_keys = [key for key in keys if key.count(":") == 1]
+    native_keys = [key for key in keys if key.count(":") > 1]
+
+    room_ids = storage_handler.get_hashes_field(object_keys, "room_id")
+    related = [(key, room_id) for key, room_id in zip(object_keys, room_ids) if room_id]
+    rooms_exist = storage_handler.exist_many(
+        [Room.get_storage_key(room_id) for _, room_id in related]
+    )
+    objects_exist = storage_handler.exist_many(
+        [key.rsplit(":", 1)[0] for key in native_keys]
+    )
+    return [
+        *(key for (key, _), exists in zip(related, rooms_exist) if not exists),
+        *(key for key, exists in zip(native_keys, objects_exist) if not exists),
+    ]
+
+
+def describe_rooms(room_keys: List[str]) -> List[dict]:
+    """States, players and offers count of the rooms stored under the keys"""
+    fields = (
+        "is_full",
+        "game_is_started",
+        "game_is_finished",
+        "number_of_players",
+        "created_at",
+    )
+    room_ids = [key.split(":", 1)[1] for key in room_keys]
+    values = storage_handler.get_hashes_fields(room_keys, fields)
+    offers_counts = storage_handler.list_lengths(
+        [f"{Room.offers_storage_key_prefix}:{room_id}" for room_id in room_ids]
+    )
+    cleaning_at = storage_handler.sorted_set_scores(
+        constants.REAPER_QUEUE_KEY, room_ids
+    )
+    rooms = []
+
+    for room_id, room_values, offers_count, cleaning in zip(
+        room_ids, values, offers_counts, cleaning_at
+    ):
+        is_full, is_started, is_finished, players, created_at = room_values
+
+        if cleaning is not None:
+            state = "cleaning"
+        elif is_finished == "1":
+            state = "finished"
+        elif is_started == "1":
+            state = "started"
+        elif is_full == "1":
+            state = "full"
+        else:
+            state = "open"
+
+        rooms.append(
+            {
+                "id": room_id,
+                "state": state,
+                "players": int(players or 0),
+                "offers": offers_count,
+                "created_at": int(created_at or 0),
+            }
+        )
+
+    return rooms
+
+
 def room_exist(room):
     return storage_handler.exist(room.storage_key)
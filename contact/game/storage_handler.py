@@ -1,11 +1,78 @@
 import functools
 import json
 import secrets
-from typing import Callable, Optional, Tuple
+import time
+from typing import Callable, Dict, List, Optional, Tuple
 
-from contact.game.utils import get_redis_connection
+from contact.game import memory, redis_client
 
-redis = get_redis_connection()
+
+class InstrumentedExecution:
+    """
+    Wraps `execute_command` of a redis client and `execute` of its pipelines.
+    Every redis-py command goes through one of them, so it is the single place
+    to observe commands of the storage.
+
+    :attribute tracer: an object with the `record(args, duration)` method
+        which is called after every command and the `record_pipeline(commands,
+        duration)` method which is called after every pipeline when it is set
+    """
+
+    def __init__(self, execute_command: Callable):
+        self.execute_command = execute_command
+        self.commands_count = 0
+        self.tracer = None
+
+    def __call__(self, *args, **options):
+        self.commands_count += 1
+        tracer = self.tracer
+
+        if tracer is None:
+            return self.execute_command(*args, **options)
+
+        start_time = time.perf_counter()
+        try:
+            return self.execute_command(*args, **options)
+        finally:
+            tracer.record(args, time.perf_counter() - start_time)
+
+    def execute_pipeline(self, pipeline, execute: Callable, *args, **kwargs):
+        # Commands of a pipeline are sent at once, but every one is counted
+        self.commands_count += len(pipeline.command_stack)
+        tracer = self.tracer
+
+        if tracer is None:
+            return execute(*args, **kwargs)
+
+        commands = [args for args, _ in pipeline.command_stack]
+        start_time = time.perf_counter()
+        try:
+            return execute(*args, **kwargs)
+        finally:
+            tracer.record_pipeline(commands, time.perf_counter() - start_time)
+
+
+def instrument(client):
+    execution = InstrumentedExecution(client.execute_command)
+    create_pipeline = client.pipeline
+
+    def pipeline(*args, **kwargs):
+        instance = create_pipeline(*args, **kwargs)
+        instance.execute = functools.partial(
+            execution.execute_pipeline, instance, instance.execute
+        )
+        return instance
+
+    client.execute_command = execution
+    client.pipeline = pipeline
+    return client
+
+
+redis = instrument(redis_client.create_client())
+
+
+def get_commands_count() -> int:
+    return redis.execute_command.commands_count
 
 
 def decode_value(value):
@@ -37,6 +104,15 @@ def get_list_slice(key, start, end):
     return redis.lrange(name=key, start=start, end=end)
 
 
+def get_list_tail(key, count) -> Tuple[List[str], int]:
+    """:return: the last values of the list and its length"""
+    pipeline = redis.pipeline(transaction=False)
+    pipeline.lrange(name=key, start=-count, end=-1)
+    pipeline.llen(key)
+    values, length = pipeline.execute()
+    return list(map(decode_value, values)), length
+
+
 def set_value(key, value, expire=None):
     redis.set(name=key, value=value, ex=expire)
 
@@ -45,18 +121,36 @@ def get_value(key):
     return decode_value(redis.get(key))
 
 
+def increment(key) -> int:
+    return redis.incr(key)
+
+
 def exist(key):
     return redis.exists(key)
 
 
-def list_push(list_key, value):
-    redis.rpush(list_key, value)
+def list_push(list_key, *values):
+    redis.rpush(list_key, *values)
 
 
 def delete(*keys):
     redis.delete(*keys)
 
 
+def expire(key, seconds):
+    redis.expire(name=key, time=seconds)
+
+
+@deserialize_redis_list
+def pop_list(key):
+    """Get all the list values and delete the list atomically"""
+    pipeline = redis.pipeline(transaction=True)
+    pipeline.lrange(name=key, start=0, end=-1)
+    pipeline.delete(key)
+    values, _ = pipeline.execute()
+    return values
+
+
 def add_value_to_set(set_key, value):
     redis.sadd(set_key, value)
 
@@ -66,6 +160,167 @@ def is_in_set(set_key, value):
     return bool(value)
 
 
+def unlink(*keys):
+    """Delete keys reclaiming their memory in the background"""
+    redis.unlink(*keys)
+
+
+def acquire_lock(key, expire) -> bool:
+    return bool(redis.set(name=key, value=1, ex=expire, nx=True))
+
+
+def scan_keys(cursor, pattern, count) -> Tuple[int, List[str]]:
+    cursor, keys = redis.scan(cursor=cursor, match=pattern, count=count)
+    return cursor, [decode_value(key) for key in keys]
+
+
+def get_lists(keys) -> List[List[str]]:
+    pipeline = redis.pipeline(transaction=False)
+    for key in keys:
+        pipeline.lrange(name=key, start=0, end=-1)
+    return [list(map(decode_value, values)) for values in pipeline.execute()]
+
+
+def get_hashes_field(keys, field) -> List[str]:
+    pipeline = redis.pipeline(transaction=False)
+    for key in keys:
+        pipeline.hget(name=key, key=field)
+    return [decode_value(value) for value in pipeline.execute()]
+
+
+def get_hashes_fields(keys, fields) -> List[List[str]]:
+    pipeline = redis.pipeline(transaction=False)
+    for key in keys:
+        pipeline.hmget(name=key, keys=fields)
+    return [list(map(decode_value, values)) for values in pipeline.execute()]
+
+
+def list_lengths(keys) -> List[int]:
+    pipeline = redis.pipeline(transaction=False)
+    for key in keys:
+        pipeline.llen(name=key)
+    return pipeline.execute()
+
+
+def sorted_set_scores(key, members) -> List[Optional[float]]:
+    pipeline = redis.pipeline(transaction=False)
+    for member in members:
+        pipeline.zscore(key, member)
+    return pipeline.execute()
+
+
+def exist_many(keys) -> List[bool]:
+    pipeline = redis.pipeline(transaction=False)
+    for key in keys:
+        pipeline.exists(key)
+    return [bool(exists) for exists in pipeline.execute()]
+
+
+def sorted_set_add(key, member, score, only_new=False):
+    redis.zadd(name=key, mapping={member: score}, nx=only_new)
+
+
+def sorted_set_add_many(key, scores: Dict[str, float]):
+    if scores:
+        redis.zadd(name=key, mapping=scores)
+
+
+def sorted_set_remove(key, *members):
+    redis.zrem(key, *members)
+
+
+def sorted_set_score(key, member) -> Optional[float]:
+    return redis.zscore(name=key, value=member)
+
+
+def sorted_set_pop_by_score(key, max_score, count) -> List[str]:
+    """
+    Remove up to `count` members scored not greater than `max_score`
+    :return: members removed by this call, concurrent callers get different ones
+    """
+    members = redis.zrangebyscore(
+        name=key, min="-inf", max=max_score, start=0, num=count
+    )
+    if not members:
+        return []
+
+    pipeline = redis.pipeline(transaction=False)
+    for member in members:
+        pipeline.zrem(key, member)
+    removed = pipeline.execute()
+    return [decode_value(member) for member, ok in zip(members, removed) if ok]
+
+
+def increment_many(hash_increments=(), sorted_set_increments=(), expirations=None):
+    """
+    Increment hash fields and sorted set scores in one round trip
+    :param hash_increments: (key, field, amount) triples
+    :param sorted_set_increments: (key, member, amount) triples
+    :param expirations: keys mapped to their time to live in seconds
+    """
+    pipeline = redis.pipeline(transaction=False)
+    for key, field, amount in hash_increments:
+        pipeline.hincrby(name=key, key=field, amount=amount)
+    for key, member, amount in sorted_set_increments:
+        pipeline.zincrby(name=key, amount=amount, value=member)
+    for key, seconds in (expirations or {}).items():
+        pipeline.expire(name=key, time=seconds)
+    pipeline.execute()
+
+
+def sorted_set_top(key, start, count) -> Tuple[List[Tuple[str, float]], int]:
+    """
+    :return: members with the highest scores starting from `start`
+        and the size of the sorted set
+    """
+    pipeline = redis.pipeline(transaction=False)
+    pipeline.zrevrange(name=key, start=start, end=start + count - 1, withscores=True)
+    pipeline.zcard(key)
+    members, size = pipeline.execute()
+    return [(decode_value(member), score) for member, score in members], size
+
+
+def sorted_set_rank(key, member) -> Optional[Tuple[int, float]]:
+    """:return: zero based rank by descending scores and the score of the member"""
+    pipeline = redis.pipeline(transaction=False)
+    pipeline.zrevrank(key, member)
+    pipeline.zscore(key, member)
+    rank, score = pipeline.execute()
+    return None if rank is None else (rank, score)
+
+
+def get_set_members(set_key) -> List[str]:
+    return [decode_value(value) for value in redis.smembers(name=set_key)]
+
+
+def stream_add(stream_key, value, max_length) -> str:
+    """
+    Append a value to a stream trimming it approximately to `max_length`
+    :return: id of the new stream entry
+    """
+    entry_id = redis.xadd(
+        name=stream_key, fields={"value": value}, maxlen=max_length, approximate=True
+    )
+    return decode_value(entry_id)
+
+
+def decode_stream_entries(entries) -> List[Tuple[str, str]]:
+    return [
+        (decode_value(entry_id), decode_value(fields[b"value"]))
+        for entry_id, fields in entries
+    ]
+
+
+def stream_range(stream_key, start="-", end="+", count=None) -> List[Tuple[str, str]]:
+    entries = redis.xrange(name=stream_key, min=start, max=end, count=count)
+    return decode_stream_entries(entries)
+
+
+def stream_last(stream_key) -> Optional[Tuple[str, str]]:
+    entries = decode_stream_entries(redis.xrevrange(name=stream_key, count=1))
+    return entries[0] if entries else None
+
+
 class StorageObjectField:
     name: str
 
@@ -124,8 +379,125 @@ class RelationKeyField(StringField):
 
 
 class ListField(StorageObjectField):
-    def __init__(self, *args, **kwargs):
+    """
+    :attribute native: defines whether the list is stored under a key of its own,
+        `<object storage key>:<descriptor_name>`, instead of a JSON encoded hash
+        field. Values of a native list are appended with a single command and
+        read only when the field is accessed or the object is serialized
+
+    :attribute unique: defines whether a native list is stored as a set,
+        which does not keep the order of values
+
+    :attribute max_length: the number of the last values a native list keeps
+    """
+
+    def __init__(self, native=False, unique=False, max_length=None, *args, **kwargs):
         super().__init__(default=[], *args, **kwargs)
+        self.native = native
+        self.unique = unique
+        self.max_length = max_length
+
+    def bind(self, instance, values=None) -> "StorageList":
+        obj_id = instance.data[instance.id_field_name]
+        return StorageList(
+            key=instance.get_native_key(obj_id, self.name),
+            unique=self.unique,
+            max_length=self.max_length,
+            values=values,
+        )
+
+    def __set__(self, instance, value):
+        if self.native:
+            value = self.bind(instance, values=list(value))
+        super().__set__(instance, value)
+
+
+class StorageList:
+    """Lazy view of a native `ListField` value"""
+
+    def __init__(self, key, unique=False, max_length=None, values=None):
+        self.key = key
+        self.unique = unique
+        self.max_length = max_length
+        self._values = values
+        # Values given on the object creation are written when it is saved
+        self.is_saved = values is None
+        if values is not None:
+            self.trim()
+
+    @property
+    def values(self) -> List[str]:
+        if self._values is None:
+            self.set_values(
+                get_set_members(self.key) if self.unique else get_list(self.key)
+            )
+        return self._values
+
+    def set_values(self, values: List[str]):
+        self._values = values
+        self.trim()
+
+    def trim(self):
+        if self.max_length is not None:
+            del self._values[: -self.max_length]
+
+    def append(self, value):
+        if self.unique:
+            redis.sadd(self.key, value)
+        elif self.max_length is None:
+            redis.rpush(self.key, value)
+        else:
+            pipeline = redis.pipeline(transaction=False)
+            pipeline.rpush(self.key, value)
+            pipeline.ltrim(self.key, -self.max_length, -1)
+            pipeline.execute()
+
+        if self._values is None or (self.unique and value in self._values):
+            return
+
+        self._values.append(value)
+        self.trim()
+
+    def save(self, pipeline):
+        pipeline.delete(self.key)
+        if self._values:
+            if self.unique:
+                pipeline.sadd(self.key, *self._values)
+            else:
+                pipeline.rpush(self.key, *self._values)
+        self.is_saved = True
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+
+def load_storage_lists(storage_lists: List[StorageList]):
+    """Read values of the lists which are not read yet in a single round trip"""
+    storage_lists = [
+        storage_list for storage_list in storage_lists if storage_list._values is None
+    ]
+    if not storage_lists:
+        return
+
+    pipeline = redis.pipeline(transaction=False)
+    for storage_list in storage_lists:
+        read_storage_list(pipeline, storage_list.key, storage_list.unique)
+
+    for storage_list, values in zip(storage_lists, pipeline.execute()):
+        storage_list.set_values(list(map(decode_value, values)))
+
+
+def read_storage_list(pipeline, key, unique):
+    if unique:
+        pipeline.smembers(key)
+    else:
+        pipeline.lrange(name=key, start=0, end=-1)
 
 
 class CalculatedStringField(StringField):
@@ -160,6 +532,7 @@ class StorageComplexObjectMeta(type):
         new_class._default_values = {}
         new_class._calculated_fields = []
         new_class._hidden_values = []
+        new_class._native_fields = {}
 
         for attr_name, attr in descriptors.items():
             attr.name = attr_name
@@ -169,6 +542,8 @@ class StorageComplexObjectMeta(type):
                 new_class.id_field_name = attr_name
             elif isinstance(attr, CalculatedStringField):
                 new_class._calculated_fields.append(attr_name)
+            elif isinstance(attr, ListField) and attr.native:
+                new_class._native_fields[attr_name] = attr
             elif isinstance(attr, IntegerField):
                 if attr.is_increment:
                     setattr(
@@ -214,16 +589,52 @@ class StorageComplexObject(metaclass=StorageComplexObjectMeta):
     def get_storage_key(cls, redis_id):
         return f"{cls.storage_key_prefix}:{redis_id}"
 
+    @classmethod
+    def get_native_key(cls, redis_id, field_name):
+        return f"{cls.get_storage_key(redis_id)}:{field_name}"
+
+    @classmethod
+    def get_native_keys(cls, redis_id) -> List[str]:
+        return [cls.get_native_key(redis_id, name) for name in cls._native_fields]
+
     def __update_calculated_fields(self):
         for calculated_field_name in self._calculated_fields:
             calculated_field_class = self.__descriptors[calculated_field_name]
             self.data[calculated_field_name] = calculated_field_class.callback(self)
 
     def __update_common_data(self):
-        self.common_data = {}
+        self._common_data = {}
         for attr, value in self.data.items():
+            if attr in self._native_fields:
+                continue
             if attr not in self._hidden_values and (value != "" and value is not None):
-                self.common_data[attr] = value
+                self._common_data[attr] = value
+
+        # Native lists are read only when the data is serialized
+        self._unread_native_fields = [
+            attr for attr in self._native_fields if attr not in self._hidden_values
+        ]
+
+    @property
+    def common_data(self) -> dict:
+        if self._unread_native_fields:
+            load_storage_lists([self.data[attr] for attr in self._unread_native_fields])
+            for attr in self._unread_native_fields:
+                self._common_data[attr] = self.data[attr].values
+            self._unread_native_fields = []
+
+        return self._common_data
+
+    def __bind_native_fields(self):
+        for attr, field in self._native_fields.items():
+            value = self.data.get(attr)
+
+            if isinstance(value, StorageList):
+                continue
+            if value is None or value is field.default:
+                self.data[attr] = field.bind(self)
+            else:
+                self.data[attr] = field.bind(self, values=list(value))
 
     def __update_fields(self):
         self.__update_calculated_fields()
@@ -237,12 +648,16 @@ class StorageComplexObject(metaclass=StorageComplexObjectMeta):
         if not self.data[self.id_field_name]:
             self.data[self.id_field_name] = secrets.token_hex(12)
 
+        self.__bind_native_fields()
         self.__update_fields()
+        memory.track(self)
 
     def __serialize_values_for_storage(self) -> dict:
         storage_dict = {}
 
         for attr_name, field_type in self.__descriptors.items():
+            if attr_name in self._native_fields:
+                continue
             if field_type.null and self.data[attr_name] is None:
                 storage_dict[attr_name] = "none"
                 continue
@@ -265,6 +680,10 @@ class StorageComplexObject(metaclass=StorageComplexObjectMeta):
             attr_name = key.decode()
             field_type = cls.__descriptors[attr_name]
 
+            # Objects stored before the list became native
+            if attr_name in cls._native_fields:
+                continue
+
             if field_type.null and value == "none":
                 obj_dict[attr_name] = None
                 continue
@@ -293,6 +712,34 @@ class StorageComplexObject(metaclass=StorageComplexObjectMeta):
 
         return cls(**redis_value_processed)
 
+    @classmethod
+    def get_by_ids(cls, obj_ids) -> List[Optional["StorageComplexObject"]]:
+        """Read the objects and their native lists in a single round trip"""
+        pipeline = redis.pipeline(transaction=False)
+        for obj_id in obj_ids:
+            pipeline.hgetall(name=cls.get_storage_key(obj_id))
+            for attr, field in cls._native_fields.items():
+                read_storage_list(
+                    pipeline, cls.get_native_key(obj_id, attr), field.unique
+                )
+
+        results = iter(pipeline.execute())
+        objects = []
+        for _ in obj_ids:
+            redis_value_processed = cls.__deserialize_values_from_storage(next(results))
+            lists_values = [next(results) for _ in cls._native_fields]
+
+            if not redis_value_processed:
+                objects.append(None)
+                continue
+
+            obj = cls(**redis_value_processed)
+            for attr, values in zip(cls._native_fields, lists_values):
+                obj.data[attr].set_values(list(map(decode_value, values)))
+            objects.append(obj)
+
+        return objects
+
     @classmethod
     def create_object(cls, **kwargs) -> "StorageComplexObject":
         obj = cls(**kwargs)
@@ -327,6 +774,7 @@ class StorageComplexObject(metaclass=StorageComplexObjectMeta):
             storage_data=storage_values_raw
         )
         self.data = storage_value_processed
+        self.__bind_native_fields()
         self.__update_fields()
 
     def save(self):
@@ -336,6 +784,18 @@ class StorageComplexObject(metaclass=StorageComplexObjectMeta):
         redis_values = self.__serialize_values_for_storage()
         # Since redis 4.0.0 HMSET considered to be deprecated.
         redis.hmset(name=self.storage_key, mapping=redis_values)
+
+        unsaved_lists = [
+            self.data[attr]
+            for attr in self._native_fields
+            if not self.data[attr].is_saved
+        ]
+        if unsaved_lists:
+            pipeline = redis.pipeline(transaction=False)
+            for storage_list in unsaved_lists:
+                storage_list.save(pipeline)
+            pipeline.execute()
+
         self.__update_calculated_fields()
         self.__update_common_data()
 
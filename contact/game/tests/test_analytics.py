@@ -0,0 +1,45 @@
+import os
+
+from contact.game import analytics
+from contact.game.constants import GameEvent, GameFinishReason
+
+
+def test_segments_are_loaded_by_columns(tmp_path):
+    rows = [
+        (1000.0, analytics.EVENT_CODES[GameEvent.START], 1, -1, 0, -1, 0),
+        (
+            1010.0,
+            analytics.EVENT_CODES[GameEvent.FINISH],
+            1,
+            10,
+            0,
+            -1,
+            analytics.REASON_CODES[GameFinishReason.PLAYERS_WON],
+        ),
+    ]
+    segment = analytics.Segment(str(tmp_path))
+    segment.append(rows[:1])
+    segment.append(rows[1:])
+    # A row of the segment being written has been written partially
+    with open(os.path.join(segment.path, "timestamp.bin"), "ab") as column:
+        column.write(b"\0" * 8)
+
+    columns = analytics.load_segments(str(tmp_path))
+
+    assert segment.rows == 2
+    assert columns["timestamp"].tolist() == [1000.0, 1010.0]
+    assert columns["event"].tolist() == [1, 6]
+    assert columns["game_time"].tolist() == [-1, 10]
+    assert columns["reason"].tolist() == [0, 4]
+
+
+def test_load_segments_without_segments(tmp_path):
+    columns = analytics.load_segments(str(tmp_path))
+
+    assert set(columns) == {name for name, _ in analytics.COLUMNS}
+    assert all(len(values) == 0 for values in columns.values())
+
+
+def test_room_code():
+    assert analytics.room_code("00000000000000ff0000") == 255
+    assert analytics.room_code("room") == 0
@@ -0,0 +1,62 @@
+import pytest
+
+from contact.game import dictionary
+from contact.game.dictionary import WordDictionary, build_dictionary, normalize_word
+
+
+@pytest.fixture
+def words_path(tmp_path):
+    path = str(tmp_path / "words.bin")
+    build_dictionary(["Ёж", "ель", "ежевика", "  ", "ёж"], path)
+    return path
+
+
+def test_normalize_word():
+    assert normalize_word(" Ёлка ") == "елка"
+    assert normalize_word("Ёлка", locale="en-us") == "ёлка"
+
+
+def test_build_dictionary_keeps_unique_normalized_words(tmp_path):
+    path = str(tmp_path / "words.bin")
+
+    assert build_dictionary(["Ёж", "еж", "ель", ""], path) == 2
+    assert len(WordDictionary(path)) == 2
+
+
+def test_is_word(words_path):
+    words_dictionary = WordDictionary(words_path)
+
+    assert words_dictionary.is_word("еж")
+    assert words_dictionary.is_word("ЁЖ")
+    assert words_dictionary.is_word("ежевика")
+    assert not words_dictionary.is_word("ежевик")
+    assert not words_dictionary.is_word("ежевикаа")
+    assert not words_dictionary.is_word("")
+
+
+def test_empty_dictionary(tmp_path):
+    path = str(tmp_path / "words.bin")
+    build_dictionary([], path)
+
+    assert not WordDictionary(path).is_word("еж")
+
+
+def test_is_known_word_without_dictionary(monkeypatch, tmp_path):
+    monkeypatch.setattr(dictionary, "_dictionary", None)
+    monkeypatch.setattr(dictionary, "_dictionary_missing_at", None)
+    monkeypatch.setattr(
+        dictionary.settings, "GAME_DICTIONARY_PATH", str(tmp_path / "words.bin")
+    )
+
+    assert dictionary.is_known_word("ъъъ")
+
+    # A dictionary built later is picked up once the recheck interval passes
+    build_dictionary(["еж"], dictionary.settings.GAME_DICTIONARY_PATH)
+    assert dictionary.is_known_word("ъъъ")
+    monkeypatch.setattr(
+        dictionary, "_dictionary_missing_at", -dictionary.MISSING_RECHECK_INTERVAL
+    )
+    monkeypatch.setattr(dictionary.time, "monotonic", lambda: 0.0)
+
+    assert not dictionary.is_known_word("ъъъ")
+    assert dictionary.is_known_word("ёж")
@@ -0,0 +1,123 @@
+import itertools
+
+import pytest
+from django.contrib.auth import get_user_model
+
+from contact.game import storage
+from contact.game.constants import (
+    NUMBER_OF_PLAYERS_TO_START,
+    POINTS,
+    GameEvent,
+    GameFinishReason,
+    LeaderboardPeriod,
+)
+from contact.game.exceptions import DontTellAnyOneOfThisAction, GameActionError
+from contact.game.game_manager import GameManager, GameManagerDelegate
+
+User = get_user_model()
+usernames = (f"player-{index}" for index in itertools.count())
+
+
+class Delegate(GameManagerDelegate):
+    def __init__(self):
+        self.ordered_actions = []
+
+    def order_delayed_action(self, after, event, action_kwargs=None):
+        self.ordered_actions.append((event, action_kwargs))
+
+
+class Game:
+    """A started game of fresh players"""
+
+    def __init__(self, word: str):
+        self.delegates = [Delegate() for _ in range(NUMBER_OF_PLAYERS_TO_START)]
+        managers = []
+
+        for delegate in self.delegates:
+            user = User(username=next(usernames))
+            manager = GameManager(user=user, delegate=delegate)
+            delegate.game_manager = manager
+            manager.append_user_to_game()
+            managers.append(manager)
+
+        self.room = managers[0].room
+        self.host = next(
+            manager
+            for manager in managers
+            if manager.player.id_key == self.room.game_host_key
+        )
+        self.players = [manager for manager in managers if manager is not self.host]
+        self.host.perform_game_action(GameEvent.SET_WORD, {"word": word})
+
+    def offer(self, player: GameManager, answer: str) -> str:
+        player.perform_game_action(
+            GameEvent.OFFER, {"answer": answer, "definition": "Definition"}
+        )
+        return self.room.get_offer_ids()[-1]
+
+    def contact(self, player: GameManager, offer_id: str, estimated_word: str):
+        player.perform_game_action(
+            GameEvent.CONTACT, {"offer_id": offer_id, "estimated_word": estimated_word}
+        )
+
+
+@pytest.fixture
+def game(redis):
+    return Game(word="Ёлка")
+
+
+def test_words_are_compared_normalized(game):
+    offer_id = game.offer(game.players[0], answer="Ёжик")
+    game.contact(game.players[1], offer_id, estimated_word="ежик")
+    game.players[1].perform_game_action(GameEvent.CONTACT_RESULT, {})
+
+    assert game.room.open_word == "ел"
+    assert not storage.check_answer_relevance("ежик", game.room)
+
+
+def test_offer_must_fit_open_letters(game):
+    with pytest.raises(GameActionError):
+        game.offer(game.players[0], answer="Жук")
+
+
+def test_guessed_hosted_word_finishes_game_once(game):
+    player = game.players[1]
+    offer_id = game.offer(game.players[0], answer="елка")
+    game.contact(player, offer_id, estimated_word="ёлка")
+    player.perform_game_action(GameEvent.CONTACT_RESULT, {})
+
+    players_won = {"reason": GameFinishReason.PLAYERS_WON}
+    assert player.delegate.ordered_actions.count((GameEvent.FINISH, players_won)) == 1
+
+    player.perform_game_action(GameEvent.FINISH, players_won)
+    assert game.room.game_finish_reason == GameFinishReason.PLAYERS_WON
+
+    # Finishes ordered earlier, e.g. by the time limit, are ignored
+    with pytest.raises(DontTellAnyOneOfThisAction):
+        game.host.perform_game_action(
+            GameEvent.FINISH, {"reason": GameFinishReason.GAME_TIME_LIMIT_EXPIRED}
+        )
+    assert game.room.game_finish_reason == GameFinishReason.PLAYERS_WON
+
+
+def test_contact_points(game):
+    sender, player = game.players
+    offer_id = game.offer(sender, answer="ель")
+    # A failed contact of a different player comes first
+    game.contact(game.host, offer_id, estimated_word="еда")
+    game.host.perform_game_action(GameEvent.CONTACT_RESULT, {})
+    game.contact(player, offer_id, estimated_word="ель")
+    player.perform_game_action(GameEvent.CONTACT_RESULT, {})
+
+    points = {
+        manager.player.id_key: storage.Player.get_by_id(manager.player.id_key).points
+        for manager in (game.host, sender, player)
+    }
+    assert points == {
+        player.player.id_key: POINTS.CONTACT_INITIATOR_SUCCESS,
+        sender.player.id_key: POINTS.CONTACT_PARTICIPANT_SUCCESS,
+        game.host.player.id_key: POINTS.CONTACT_PARTICIPANT_SUCCESS,
+    }
+    assert storage.get_leaderboard_rank(
+        LeaderboardPeriod.GLOBAL, player.player.id_key
+    ) == (0, POINTS.CONTACT_INITIATOR_SUCCESS,)
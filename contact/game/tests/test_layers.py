@@ -0,0 +1,166 @@
+import asyncio
+import collections
+import os
+import threading
+
+import pytest
+from channels_redis.core import RedisChannelLayer
+
+from contact.game import control, layers
+from contact.game.layers import HybridChannelLayer
+
+REMOTE_CHANNEL = "specific.remote!channel"
+
+
+class RedisGroupsLayer(RedisChannelLayer):
+    """Keeps the group members in memory instead of Redis"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.members = collections.defaultdict(list)
+        self.lookups = 0
+        self.remote_messages = []
+        self.on_lookup = None
+
+    async def group_add(self, group, channel):
+        self.members[group].append(channel)
+
+    async def group_discard(self, group, channel):
+        self.members[group].remove(channel)
+
+    async def group_send(self, group, message):
+        self.lookups += 1
+        if self.on_lookup is not None:
+            self.on_lookup()
+        channel_keys, _, _ = self._map_channel_keys_to_connection(
+            self.members[group], message
+        )
+        self.remote_messages.extend(
+            message for keys in channel_keys.values() for _ in keys
+        )
+
+
+class Layer(HybridChannelLayer, RedisGroupsLayer):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def subscribed(redis, monkeypatch):
+    monkeypatch.setattr(control, "subscribed", True)
+
+
+def run(test_coroutine) -> Layer:
+    """Run the test coroutine with a fresh layer"""
+    layer = Layer(capacity=2)
+    asyncio.run(test_coroutine(layer))
+    return layer
+
+
+async def join(layer, group="room"):
+    channel = await layer.new_channel()
+    await layer.group_add(group, channel)
+    return channel
+
+
+async def receive_all(layer, channel):
+    messages = []
+    while not layer.receive_buffer[channel].empty():
+        messages.append(await layer.receive(channel))
+    return messages
+
+
+def test_local_group_skips_member_lookups():
+    received = []
+
+    async def send(layer):
+        channel = await join(layer)
+        await layer.group_send("room", {"type": "first"})
+        await layer.group_send("room", {"type": "second"})
+        received.extend(await receive_all(layer, channel))
+
+    layer = run(send)
+
+    assert received == [{"type": "first"}, {"type": "second"}]
+    assert layer.lookups == 1
+    assert layer.remote_messages == []
+
+
+def test_group_with_remote_members_is_looked_up():
+    async def send(layer):
+        await join(layer)
+        layer.members["room"].append(REMOTE_CHANNEL)
+        await layer.group_send("room", {"type": "first"})
+        await layer.group_send("room", {"type": "second"})
+
+    layer = run(send)
+
+    assert layer.lookups == 2
+    assert layer.remote_messages == [{"type": "first"}, {"type": "second"}]
+
+
+def test_remote_join_makes_group_looked_up():
+    async def send(layer):
+        await join(layer)
+        await layer.group_send("room", {"type": "first"})
+        layer.members["room"].append(REMOTE_CHANNEL)
+        # The control thread receives the join of a different worker
+        thread = threading.Thread(
+            target=layers.channel_group_joined,
+            kwargs={"group": "room", "pid": os.getpid() + 1},
+        )
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0)
+        await layer.group_send("room", {"type": "second"})
+
+    layer = run(send)
+
+    assert layer.lookups == 2
+    assert layer.remote_messages == [{"type": "second"}]
+
+
+def test_join_announced_during_lookup():
+    async def send(layer):
+        await join(layer)
+        layer.on_lookup = lambda: layer.forget_local_only_group("room")
+        await layer.group_send("room", {"type": "first"})
+        layer.on_lookup = None
+        await layer.group_send("room", {"type": "second"})
+
+    assert run(send).lookups == 2
+
+
+def test_resubscription_forgets_local_groups():
+    async def send(layer):
+        await join(layer)
+        await layer.group_send("room", {"type": "first"})
+        layers.forget_local_only_groups()
+        await asyncio.sleep(0)
+        await layer.group_send("room", {"type": "second"})
+
+    assert run(send).lookups == 2
+
+
+def test_groups_are_looked_up_while_not_subscribed(monkeypatch):
+    monkeypatch.setattr(control, "subscribed", False)
+
+    async def send(layer):
+        await join(layer)
+        await layer.group_send("room", {"type": "first"})
+        await layer.group_send("room", {"type": "second"})
+
+    assert run(send).lookups == 2
+
+
+def test_local_channel_capacity():
+    received = []
+
+    async def send(layer):
+        channel = await join(layer)
+        for index in range(3):
+            await layer.group_send("room", {"type": "message", "index": index})
+        received.extend(await receive_all(layer, channel))
+
+    run(send)
+
+    assert [message["index"] for message in received] == [0, 1]
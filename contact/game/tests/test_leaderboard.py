@@ -0,0 +1,67 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from contact.game import storage
+from contact.game.constants import LeaderboardPeriod
+from contact.users.views import LeaderboardAPIView
+
+User = get_user_model()
+
+
+@pytest.fixture
+def leaderboard(redis):
+    cache.clear()
+    storage.award_points({"first": 5, "second": 3, "third": 1})
+    storage.award_points({"third": 1})
+    yield
+    cache.clear()
+
+
+def get_leaderboard(user=None, **params):
+    request = APIRequestFactory().get("/leaderboard", params)
+    if user is not None:
+        force_authenticate(request, user=user)
+    return LeaderboardAPIView.as_view()(request).data
+
+
+def test_award_points_updates_players_and_leaderboards(leaderboard):
+    for period in (
+        LeaderboardPeriod.GLOBAL,
+        LeaderboardPeriod.DAILY,
+        LeaderboardPeriod.WEEKLY,
+    ):
+        assert storage.get_leaderboard_page(period, start=0, count=2) == (
+            [("first", 5), ("second", 3)],
+            3,
+        )
+    assert storage.get_leaderboard_rank(LeaderboardPeriod.DAILY, "third") == (2, 2)
+    assert storage.get_leaderboard_rank(LeaderboardPeriod.DAILY, "none") is None
+
+
+def test_leaderboard_pages(leaderboard):
+    data = get_leaderboard(page=2, page_size=2)
+
+    assert data["count"] == 3
+    assert data["results"] == [{"rank": 3, "username": "third", "points": 2}]
+    assert data["user"] is None
+
+
+def test_leaderboard_user_rank(leaderboard):
+    data = get_leaderboard(user=User(username="second"), page_size=1)
+
+    assert data["results"] == [{"rank": 1, "username": "first", "points": 5}]
+    assert data["user"] == {"rank": 2, "username": "second", "points": 3}
+
+
+def test_leaderboard_pages_are_cached(leaderboard):
+    get_leaderboard()
+    storage.award_points({"third": 10})
+
+    assert get_leaderboard()["results"][0]["username"] == "first"
+    assert get_leaderboard(period=LeaderboardPeriod.DAILY)["results"][0] == {
+        "rank": 1,
+        "username": "third",
+        "points": 12,
+    }
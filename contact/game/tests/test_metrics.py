@@ -0,0 +1,84 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+from channels.testing import HttpCommunicator
+
+from contact.game import metrics
+from contact.game.consumers import MetricsConsumer
+
+REQUESTS = metrics.counter("test_requests_total", "Requests", ("path",))
+LATENCY = metrics.histogram(
+    "test_latency_seconds", "Latency", buckets=(0.1, 1)
+).labels()
+
+
+@pytest.fixture
+def metrics_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        metrics.settings, "GAME_METRICS_DIR", str(tmp_path), raising=False
+    )
+    monkeypatch.setattr(metrics.settings, "GAME_METRICS_STALE_AFTER", 15, raising=False)
+    return tmp_path
+
+
+def write_worker_dump(directory, pid, dumped_at, samples):
+    with open(os.path.join(directory, f"{pid}.json"), "w") as file:
+        json.dump({"pid": pid, "time": dumped_at, "metrics": samples}, file)
+
+
+def test_render_all_workers_aggregates_alive_workers(metrics_dir):
+    REQUESTS.labels("/").inc(2)
+    LATENCY.observe(0.05)
+    samples = {
+        "test_requests_total": [[["/"], 3]],
+        "test_latency_seconds": [[[], [[0, 1, 0], 0.5]]],
+    }
+    write_worker_dump(metrics_dir, 1, time.time(), samples)
+    write_worker_dump(metrics_dir, 2, time.time() - 60, samples)
+
+    lines = metrics.render_all_workers().splitlines()
+
+    assert 'test_requests_total{path="/"} 5' in lines
+    assert 'test_latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{le="1"} 2' in lines
+    assert 'test_latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert "test_latency_seconds_count 2" in lines
+    # The dump of a dead worker is removed
+    assert sorted(os.listdir(metrics_dir)) == ["1.json"]
+
+
+def request_metrics(headers=()):
+    async def request():
+        communicator = HttpCommunicator(
+            MetricsConsumer, "GET", "/metrics", headers=list(headers)
+        )
+        return await communicator.get_response()
+
+    return asyncio.run(request())
+
+
+@pytest.mark.parametrize(
+    "token, headers",
+    [
+        ("", []),
+        ("", [(b"authorization", b"Bearer ")]),
+        ("secret", []),
+        ("secret", [(b"authorization", b"Bearer wrong")]),
+    ],
+)
+def test_metrics_endpoint_rejects_unauthorized(monkeypatch, token, headers):
+    monkeypatch.setattr(metrics.settings, "GAME_METRICS_TOKEN", token)
+
+    assert request_metrics(headers)["status"] == 403
+
+
+def test_metrics_endpoint(monkeypatch, metrics_dir):
+    monkeypatch.setattr(metrics.settings, "GAME_METRICS_TOKEN", "secret")
+
+    response = request_metrics([(b"authorization", b"Bearer secret")])
+
+    assert response["status"] == 200
+    assert b"# TYPE test_requests_total counter" in response["body"]
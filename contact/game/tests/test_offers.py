@@ -0,0 +1,128 @@
+import pytest
+
+from contact.game import constants, storage
+from contact.game.constants import GameEvent
+from contact.game.exceptions import GameActionError
+from contact.game.tests.test_game_manager import Game
+
+
+class RoundTrips:
+    def __init__(self):
+        self.commands = []
+
+    def record(self, args, duration):
+        self.commands.append([args])
+
+    def record_pipeline(self, commands, duration):
+        self.commands.append(commands)
+
+
+@pytest.fixture
+def round_trips(redis, monkeypatch):
+    round_trips = RoundTrips()
+    monkeypatch.setattr(redis.execute_command, "tracer", round_trips)
+    return round_trips
+
+
+def create_offers(room, count):
+    offers = []
+    for index in range(count):
+        offer = storage.Offer.create_object(
+            sender_id="sender",
+            definition=f"Definition {index}",
+            answer_internal=f"answer-{index}",
+            room_id=room.id_key,
+            hints=[f"hint-{index}"],
+            participants=["sender", f"player-{index}"],
+        )
+        storage.append_offer_to_room(offer, room)
+        offers.append(offer)
+
+    return offers
+
+
+def test_get_by_ids_reads_native_lists(redis, round_trips):
+    offers = create_offers(storage.Room.create_room(), 3)
+    round_trips.commands.clear()
+
+    loaded = storage.Offer.get_by_ids([offers[2].id_key, "missing", offers[0].id_key])
+
+    assert len(round_trips.commands) == 1
+    assert loaded[1] is None
+    assert loaded[0].common_data["hints"] == ["hint-2"]
+    assert loaded[2].common_data["participants"] == ["sender", "player-0"]
+    # The lists are read already
+    assert len(round_trips.commands) == 1
+
+
+def test_get_offers_round_trips(redis, round_trips):
+    room = storage.Room.create_room()
+    create_offers(room, 5)
+    round_trips.commands.clear()
+
+    room.get_offers()
+
+    assert len(round_trips.commands) == 2
+    assert [offer["hints"] for offer in room.data["offers"]] == [
+        [f"hint-{index}"] for index in range(5)
+    ]
+
+
+@pytest.fixture
+def page_size(monkeypatch):
+    monkeypatch.setattr(constants, "OFFERS_PAGE_SIZE", 2)
+    return 2
+
+
+def test_room_state_has_last_offers_page(redis, page_size):
+    room = storage.Room.create_room()
+    offers = create_offers(room, 5)
+
+    room.get_offers()
+
+    assert [offer["id_key"] for offer in room.data["offers"]] == [
+        offer.id_key for offer in offers[-2:]
+    ]
+    assert room.data["offers_count"] == 5
+    assert room.data["offers_cursor"] == 3
+
+
+def test_offers_pages(redis, page_size):
+    room = storage.Room.create_room()
+    offers = create_offers(room, 5)
+    pages = []
+    cursor = 3
+
+    while cursor > 0:
+        page = room.get_offers_page(cursor)
+        pages.append([offer["id_key"] for offer in page["offers"]])
+        cursor = page["offers_cursor"]
+
+    assert pages == [
+        [offers[1].id_key, offers[2].id_key],
+        [offers[0].id_key],
+    ]
+    assert room.get_offers_page(0) == {"offers": [], "offers_cursor": 0}
+
+
+def test_room_without_offers(redis):
+    room = storage.Room.create_room()
+
+    room.get_offers()
+
+    assert room.data["offers"] == []
+    assert room.data["offers_count"] == room.data["offers_cursor"] == 0
+
+
+def test_offers_page_action(redis, page_size):
+    game = Game(word="Ёлка")
+    offer_ids = [
+        game.offer(game.players[0], answer=answer) for answer in ("ель", "еда", "енот")
+    ]
+
+    page = game.players[1].perform_game_action(GameEvent.OFFERS_PAGE, {"cursor": 1})
+
+    assert [offer["id_key"] for offer in page["offers"]] == offer_ids[:1]
+    assert page["offers_cursor"] == 0
+    with pytest.raises(GameActionError):
+        game.players[1].perform_game_action(GameEvent.OFFERS_PAGE, {"cursor": -1})
@@ -0,0 +1,112 @@
+import asyncio
+
+from contact.game import outbound
+from contact.game.outbound import OutboundQueue
+
+
+class Socket:
+    def __init__(self, fails=False):
+        self.fails = fails
+        self.sent = []
+        self.closed = False
+
+    async def send(self, text):
+        if self.fails:
+            raise ConnectionError("Socket is gone")
+        self.sent.append(text)
+
+    async def close(self):
+        self.closed = True
+
+
+def create_queue(socket=None):
+    socket = socket or Socket()
+    return OutboundQueue(send=socket.send, close=socket.close)
+
+
+def test_put_replaces_last_snapshot_in_place():
+    queue = create_queue()
+
+    assert queue.put("state 1", snapshot=True)
+    assert queue.put("state 2", snapshot=True)
+
+    assert list(queue.frames) == [("state 2", True)]
+
+
+def test_put_keeps_events_and_their_order():
+    queue = create_queue()
+
+    queue.put("state 1", snapshot=True)
+    queue.put("offer")
+    queue.put("state 2", snapshot=True)
+    queue.put("comment")
+    queue.put("state 3", snapshot=True)
+    queue.put("state 4", snapshot=True)
+
+    assert [text for text, _ in queue.frames] == [
+        "state 1",
+        "offer",
+        "state 2",
+        "comment",
+        "state 4",
+    ]
+
+
+def test_put_does_not_collapse_events():
+    queue = create_queue()
+
+    queue.put("offer")
+    queue.put("comment")
+
+    assert len(queue.frames) == 2
+
+
+def test_put_rejects_frames_over_max_size(monkeypatch):
+    monkeypatch.setattr(outbound, "OUTBOUND_QUEUE_MAX_SIZE", 2)
+    monkeypatch.setattr(outbound, "OUTBOUND_QUEUE_HIGH_WATERMARK", 10)
+    queue = create_queue()
+
+    assert queue.put("offer")
+    assert queue.put("comment")
+    assert not queue.put("contact")
+
+
+def test_put_after_stop():
+    queue = create_queue()
+    queue.stop()
+
+    assert not queue.put("offer")
+    assert not queue.frames
+
+
+def test_write_sends_frames_in_order():
+    socket = Socket()
+
+    async def write():
+        queue = create_queue(socket)
+        queue.start()
+        queue.put("offer")
+        queue.put("state", snapshot=True)
+        await queue.flush(timeout=1)
+        queue.stop()
+
+    asyncio.run(write())
+
+    assert socket.sent == ["offer", "state"]
+
+
+def test_write_closes_socket_failing_to_send():
+    socket = Socket(fails=True)
+
+    async def write():
+        queue = create_queue(socket)
+        queue.start()
+        queue.put("offer")
+        await asyncio.wait_for(queue.writer, timeout=1)
+        return queue
+
+    queue = asyncio.run(write())
+
+    assert socket.closed
+    assert queue.stopped
+    assert not queue.put("comment")
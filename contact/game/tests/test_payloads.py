@@ -0,0 +1,54 @@
+import pytest
+
+from contact.game.constants import GameEvent
+from contact.game.exceptions import GameActionError
+from contact.game.game_manager import GameManager
+from contact.game.payloads import decode_frame
+
+
+def test_decode_frame():
+    content = {"event": "word", "data": {"word": "кот"}}
+
+    event, data = decode_frame(content, GameManager.payload_schemas)
+
+    assert event == GameEvent.SET_WORD
+    assert data == {"word": "кот"}
+
+
+def test_decode_frame_without_data():
+    content = {"event": "player_state"}
+
+    assert decode_frame(content, GameManager.payload_schemas)[1] == {}
+
+
+@pytest.mark.parametrize(
+    "content, details",
+    [
+        ("word", "Frame should be an object with an event"),
+        ({"data": {}}, "Frame should be an object with an event"),
+        ({"event": 1}, "Frame should be an object with an event"),
+        ({"event": "jump"}, "Unknown event jump"),
+        ({"event": "error", "data": {}}, "Event error can't be sent"),
+        ({"event": "word", "data": ["кот"]}, "Event data should be an object"),
+        (
+            {"event": "word", "data": {"answer": "кот"}},
+            "Invalid event data. Missing: [word], unknown: [answer]",
+        ),
+        ({"event": "word", "data": {"word": 1}}, "word should be str"),
+        ({"event": "offers_page", "data": {"cursor": True}}, "cursor should be int"),
+        ({"event": "word", "data": {"word": "к" * 33}}, "word should not be longer"),
+    ],
+)
+def test_decode_frame_rejects_malformed_frames(content, details):
+    with pytest.raises(GameActionError) as error:
+        decode_frame(content, GameManager.payload_schemas)
+
+    assert error.value.data["details"].startswith(details)
+
+
+@pytest.mark.parametrize("event", [GameEvent.FINISH, GameEvent.CONTACT_RESULT])
+def test_decode_frame_rejects_delayed_actions(event):
+    content = {"event": event.value, "data": {"reason": "host_won"}}
+
+    with pytest.raises(GameActionError):
+        decode_frame(content, GameManager.payload_schemas)
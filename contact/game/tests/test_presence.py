@@ -0,0 +1,76 @@
+import time
+
+from contact.game import presence, storage, storage_handler
+from contact.game.constants import PLAYER_DISCONNECTION_AWAITING_TIME, PRESENCE_KEY
+
+
+def test_claim_absent_players(redis):
+    now = time.time()
+    storage.touch_players(
+        {
+            ("room-1", "absent"): now - 10,
+            ("room-1", "present"): now,
+            ("room-2", "absent"): now - 20,
+        }
+    )
+
+    assert storage.claim_absent_players(seen_before=now - 5, limit=10) == {
+        "room-1": ["absent"],
+        "room-2": ["absent"],
+    }
+    # Every absent player is claimed once
+    assert storage.claim_absent_players(seen_before=now - 5, limit=10) == {}
+    assert storage.claim_absent_players(seen_before=now + 1, limit=10) == {
+        "room-1": ["present"]
+    }
+
+
+def test_claim_absent_players_limit(redis):
+    storage.touch_players({("room", f"player-{index}"): index for index in range(5)})
+
+    assert storage.claim_absent_players(seen_before=10, limit=3) == {
+        "room": ["player-0", "player-1", "player-2"]
+    }
+    assert storage.claim_absent_players(seen_before=10, limit=3) == {
+        "room": ["player-3", "player-4"]
+    }
+
+
+def test_forget_rooms_presence(redis):
+    room = storage.Room.create_room()
+    player, _ = storage.Player.get_or_create(obj_id="player")
+    storage.append_player_to_room(player, room)
+    storage.touch_players({(room.id_key, player.id_key): 0, ("other", "player"): 0})
+
+    storage.forget_rooms_presence([room.id_key])
+
+    assert storage.claim_absent_players(seen_before=1, limit=10) == {
+        "other": ["player"]
+    }
+
+
+def test_heartbeats_are_flushed(redis):
+    presence.see("room", "player")
+    presence.see("room", "disconnected")
+    presence.forget("room", "disconnected")
+    presence.flush()
+
+    assert storage_handler.sorted_set_score(PRESENCE_KEY, "room:player") > 0
+    assert storage_handler.sorted_set_score(PRESENCE_KEY, "room:disconnected") is None
+
+    # Only heartbeats received since the last flush are written
+    redis.delete(PRESENCE_KEY)
+    presence.flush()
+    assert not redis.exists(PRESENCE_KEY)
+
+
+def test_sweep_claims_players_not_heard_from(redis):
+    now = time.time()
+    storage.touch_players(
+        {
+            ("room", "silent"): now - PLAYER_DISCONNECTION_AWAITING_TIME - 1,
+            ("room", "pinging"): now,
+        }
+    )
+
+    assert presence.sweep() == {"room": ["silent"]}
@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+from contact.game import reaper, storage, storage_handler
+from contact.game.constants import REAPER_QUEUE_KEY
+from contact.game.throttling import TokenBucket
+
+
+def queue_room(room_id, due_in=0.0):
+    storage_handler.sorted_set_add(
+        key=REAPER_QUEUE_KEY, member=room_id, score=time.time() + due_in
+    )
+
+
+def test_claim_rooms_to_clean_claims_due_rooms(redis):
+    queue_room("due", due_in=-1)
+    queue_room("later", due_in=60)
+
+    assert storage.claim_rooms_to_clean(limit=10) == ["due"]
+    assert storage.claim_rooms_to_clean(limit=10) == []
+    assert storage_handler.sorted_set_score(REAPER_QUEUE_KEY, "later") is not None
+
+
+def test_claim_rooms_to_clean_limit(redis):
+    for index in range(5):
+        queue_room(f"room-{index}", due_in=-1)
+
+    assert len(storage.claim_rooms_to_clean(limit=3)) == 3
+    assert len(storage.claim_rooms_to_clean(limit=3)) == 2
+
+
+def test_claim_rooms_to_clean_skips_rooms_claimed_concurrently(redis, monkeypatch):
+    queue_room("first", due_in=-2)
+    queue_room("second", due_in=-1)
+    zrangebyscore = redis.zrangebyscore
+
+    def claim_concurrently(*args, **kwargs):
+        members = zrangebyscore(*args, **kwargs)
+        # A different worker claims the room between the read and the removal
+        redis.zrem(REAPER_QUEUE_KEY, "first")
+        return members
+
+    monkeypatch.setattr(redis, "zrangebyscore", claim_concurrently)
+
+    assert storage.claim_rooms_to_clean(limit=10) == ["second"]
+
+
+def test_reap_rooms_deletes_room_keys(redis):
+    room = storage.Room.create_room()
+    player, _ = storage.Player.get_or_create(obj_id="player")
+    storage.append_player_to_room(player, room)
+    offer = storage.Offer.create_object(
+        room_id=room.id_key, sender_id=player.id_key, definition="", answer_internal=""
+    )
+    storage.append_offer_to_room(offer, room)
+    queue_room(room.id_key, due_in=-1)
+    bucket = TokenBucket(rate=10 ** 6, capacity=100)
+
+    assert asyncio.run(reaper.reap_rooms(bucket)) == 1
+    assert not redis.exists(
+        room.storage_key, room.players_list_key, room.offer_list_key
+    )
+    assert not redis.exists(player.storage_key, offer.storage_key)
+    assert asyncio.run(reaper.reap_rooms(bucket)) == 0
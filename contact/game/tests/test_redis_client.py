@@ -0,0 +1,220 @@
+import asyncio
+
+import fakeredis
+import pytest
+import redis as redis_py
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+
+from contact.game import redis_client, storage
+from contact.game.constants import GAME_UNAVAILABLE_CLOSE_CODE, GameEvent
+from contact.game.consumers import ContactGameWSConsumer
+from contact.game.exceptions import GameStorageError
+from contact.game.redis_client import CircuitBreaker, GameRedis
+
+User = get_user_model()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Monotonic time of the redis client module moved by the tests"""
+
+    class Clock:
+        now = 100.0
+
+        def __call__(self):
+            return self.now
+
+    clock = Clock()
+    monkeypatch.setattr(redis_client.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(failures_threshold=2, reset_timeout=5)
+
+
+def fail():
+    raise redis_py.ConnectionError("Connection refused")
+
+
+def call_failing(breaker, idempotent=True) -> GameStorageError:
+    with pytest.raises(GameStorageError) as error_info:
+        breaker.call(fail, idempotent=idempotent)
+    return error_info.value
+
+
+def test_breaker_opens_after_failures(breaker):
+    assert call_failing(breaker).retryable
+    breaker.call(lambda: "ok", idempotent=True)
+    assert breaker.failures == 0
+
+    assert not call_failing(breaker, idempotent=False).retryable
+    assert breaker.state == CircuitBreaker.CLOSED
+    # The failure opening the breaker is not worth retrying
+    assert not call_failing(breaker).retryable
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_open_breaker_rejects_calls(breaker, clock):
+    call_failing(breaker)
+    call_failing(breaker)
+    calls = []
+
+    with pytest.raises(GameStorageError) as error_info:
+        breaker.call(lambda: calls.append(1), idempotent=True)
+
+    assert not error_info.value.retryable
+    assert calls == []
+
+
+def test_breaker_closes_after_successful_trial(breaker, clock):
+    call_failing(breaker)
+    call_failing(breaker)
+    clock.now += 5
+
+    assert breaker.call(lambda: "ok", idempotent=True) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_opens_after_failed_trial(breaker, clock):
+    call_failing(breaker)
+    call_failing(breaker)
+    clock.now += 5
+
+    call_failing(breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened_at == clock.now
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def fake_redis(breaker, server):
+    pool = redis_py.ConnectionPool(
+        connection_class=fakeredis.FakeConnection, server=server
+    )
+    return GameRedis(breaker=breaker, connection_pool=pool)
+
+
+@pytest.fixture
+def unreachable_redis(fake_redis, server):
+    server.connected = False
+    return fake_redis
+
+
+def test_game_redis_commands(fake_redis):
+    fake_redis.set("key", "value")
+    pipeline = fake_redis.pipeline(transaction=False)
+    pipeline.get("key")
+    pipeline.exists("key")
+
+    assert fake_redis.get("key") == b"value"
+    assert pipeline.execute() == [b"value", 1]
+    assert fake_redis.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_game_redis_failures(unreachable_redis):
+    with pytest.raises(GameStorageError) as read_error:
+        unreachable_redis.get("key")
+    with pytest.raises(GameStorageError) as write_error:
+        unreachable_redis.set("key", "value")
+
+    assert read_error.value.retryable
+    assert not write_error.value.retryable
+    assert unreachable_redis.breaker.state == CircuitBreaker.OPEN
+
+
+@pytest.mark.parametrize(
+    "transaction, commands, retryable",
+    [
+        (False, [("get", "key"), ("hgetall", "hash")], True),
+        (False, [("get", "key"), ("set", "key", "value")], False),
+        (True, [("get", "key")], False),
+    ],
+)
+def test_game_pipeline_failures(unreachable_redis, transaction, commands, retryable):
+    pipeline = unreachable_redis.pipeline(transaction=transaction)
+    for name, *args in commands:
+        getattr(pipeline, name)(*args)
+
+    with pytest.raises(GameStorageError) as error_info:
+        pipeline.execute()
+
+    assert error_info.value.retryable is retryable
+    # The pipeline keeps its commands to be executed again
+    assert len(pipeline.command_stack) == len(commands)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+
+    async def sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(redis_client.asyncio, "sleep", sleep)
+    return sleeps
+
+
+def failing_reads(failures, retryable=True):
+    calls = []
+
+    def read(value):
+        calls.append(value)
+        if len(calls) <= failures:
+            raise GameStorageError("Unavailable", retryable=retryable)
+        return value
+
+    return read, calls
+
+
+def test_retry_reads(sleeps):
+    read, calls = failing_reads(failures=2)
+
+    assert asyncio.run(redis_client.retry_reads(read, "value")) == "value"
+    assert len(calls) == 3
+    assert 0 <= sleeps[0] <= 0.05
+    assert 0 <= sleeps[1] <= 0.1
+
+
+def test_retry_reads_gives_up(sleeps):
+    read, calls = failing_reads(failures=3)
+
+    with pytest.raises(GameStorageError):
+        asyncio.run(redis_client.retry_reads(read, "value"))
+    assert len(calls) == 3
+
+
+def test_retry_reads_does_not_retry_failures_not_retryable(sleeps):
+    read, calls = failing_reads(failures=1, retryable=False)
+
+    with pytest.raises(GameStorageError):
+        asyncio.run(redis_client.retry_reads(read, "value"))
+    assert len(calls) == 1
+    assert sleeps == []
+
+
+def test_failed_join_is_rejected(redis, monkeypatch):
+    def get_or_create(**kwargs):
+        raise GameStorageError(redis_client.UNAVAILABLE, retryable=True)
+
+    monkeypatch.setattr(storage.Player, "get_or_create", get_or_create)
+
+    async def connect():
+        communicator = WebsocketCommunicator(ContactGameWSConsumer, "/ws/game/")
+        communicator.scope["user"] = User(username="player")
+        connected, _ = await communicator.connect()
+        message = await communicator.receive_json_from()
+        closed = await communicator.receive_output()
+        return connected, message, closed
+
+    connected, message, closed = asyncio.run(connect())
+
+    assert connected
+    assert message["event"] == GameEvent.START.value
+    assert closed == {"type": "websocket.close", "code": GAME_UNAVAILABLE_CLOSE_CODE}
@@ -0,0 +1,50 @@
+import asyncio
+import json
+
+import pytest
+
+from contact.game import control, loop_lag, metrics, presence, reaper, traffic
+from contact.game.constants import GameEvent
+from contact.game.replay import Replayer
+
+
+@pytest.fixture
+def worker(redis, monkeypatch):
+    """A worker without the background tasks of a deployment"""
+    for module, name in (
+        (control, "ensure_listening"),
+        (loop_lag, "ensure_monitoring"),
+        (metrics, "ensure_dumping"),
+        (presence, "ensure_sweeping"),
+        (reaper, "ensure_reaping"),
+    ):
+        monkeypatch.setattr(module, name, lambda **kwargs: None)
+
+
+def recorded_room(room_id, users, started_at=1000.0):
+    records = []
+    for index, user in enumerate(users):
+        connection = f"1-{index}"
+        timestamp = started_at + index
+        frame = json.dumps({"event": GameEvent.PLAYER_STATE.value, "data": {}})
+        records.extend(
+            [
+                [traffic.CONNECT, timestamp, connection, user, room_id, False],
+                [traffic.FRAME, timestamp + 0.1, connection, frame, None, None],
+                [traffic.DISCONNECT, timestamp + 10, connection, 1000],
+            ]
+        )
+    return sorted(records, key=lambda record: record[1])
+
+
+def test_replay(worker):
+    records = recorded_room("room", ["first", "second", "third"])
+
+    report = asyncio.run(Replayer(records, speed=0).replay()).as_dict()
+
+    assert report["connections"] == 3
+    assert report["failed_connections"] == report["crashed_connections"] == 0
+    assert report["events"]["player_state"]["frames"] == 3
+    assert report["events"]["player_state"]["diverged"] == 0
+    assert report["rooms"] == 1
+    assert report["diverged_rooms"] == 0
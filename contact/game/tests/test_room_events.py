@@ -0,0 +1,28 @@
+from contact.game import storage
+
+
+def test_get_room_events_after(redis):
+    room = storage.Room.create_room()
+    first_id = storage.append_room_event(room, "first")
+    second_id = storage.append_room_event(room, "second")
+    third_id = storage.append_room_event(room, "third")
+
+    assert storage.get_room_events_after(room, first_id) == [
+        (second_id, "second"),
+        (third_id, "third"),
+    ]
+    assert storage.get_room_events_after(room, third_id) == []
+    assert storage.get_last_room_event(room.id_key) == (third_id, "third")
+
+
+def test_get_room_events_after_missing_event(redis):
+    room = storage.Room.create_room()
+
+    assert storage.get_last_room_event(room.id_key) is None
+    assert storage.get_room_events_after(room, "1-0") is None
+
+    storage.append_room_event(room, "first")
+
+    # The event has been trimmed or the id is not an event id at all
+    assert storage.get_room_events_after(room, "1-0") is None
+    assert storage.get_room_events_after(room, "event") is None
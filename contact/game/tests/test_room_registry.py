@@ -0,0 +1,96 @@
+import pytest
+
+from contact.game import room_registry, storage, storage_handler
+
+
+@pytest.fixture
+def room(redis):
+    return storage.Room.create_room()
+
+
+def change_in_storage(room_id):
+    """Change the room the way a different worker does"""
+    room = storage.Room.get_by_id(room_id)
+    room.is_full = True
+    room.save()
+    room_registry.changed(room_id)
+
+
+def test_get_missing_room(redis):
+    assert room_registry.get("missing") is None
+
+
+def test_get_loads_room_with_offers(room):
+    shared_room = room_registry.get(room.id_key)
+
+    assert shared_room.version == 0
+    assert shared_room.common_data["offers"] == []
+
+
+def test_get_fresh_room_reads_version_only(room):
+    shared_room = room_registry.get(room.id_key)
+    commands_count = storage_handler.get_commands_count()
+
+    assert room_registry.get(room.id_key) is shared_room
+    assert storage_handler.get_commands_count() == commands_count + 1
+
+
+def test_get_refreshes_room_changed_by_other_worker(room, monkeypatch):
+    shared_room = room_registry.get(room.id_key)
+    # The change happens in a different worker, the copy is not invalidated
+    monkeypatch.setattr(room_registry, "invalidate", lambda room_id: None)
+    change_in_storage(room.id_key)
+
+    assert room_registry.get(room.id_key) is shared_room
+    assert shared_room.version == 1
+    assert shared_room.is_full
+
+
+def test_get_refreshes_invalidated_room(room):
+    shared_room = room_registry.get(room.id_key)
+
+    room_registry.invalidate(room.id_key)
+
+    assert room_registry.get(room.id_key) is shared_room
+    assert shared_room.version == 0
+
+
+def test_get_for_update_reads_fresh_room(room):
+    shared_room = room_registry.get(room.id_key)
+    change_in_storage(room.id_key)
+
+    assert room_registry.get_for_update(room.id_key) is shared_room
+    assert shared_room.is_full
+
+
+def test_updated_keeps_room_fresh(room):
+    shared_room = room_registry.get_for_update(room.id_key)
+    offer = storage.Offer.create_object(
+        room_id=room.id_key, sender_id="player", definition="", answer_internal=""
+    )
+    storage.append_offer_to_room(offer, shared_room)
+
+    room_registry.updated(shared_room)
+
+    assert shared_room.version == 1
+    assert shared_room.common_data["offers_count"] == 1
+    assert room_registry.get(room.id_key) is shared_room
+    assert storage.Room.get_version(room.id_key) == 1
+
+
+def test_updated_room_changed_meanwhile_is_stale(room):
+    shared_room = room_registry.get_for_update(room.id_key)
+    # A different worker changes the room while the action is performed
+    storage.Room.increment_version(room.id_key)
+
+    room_registry.updated(shared_room)
+
+    assert shared_room.version is None
+    assert room_registry.get(room.id_key).version == 2
+
+
+def test_room_keys_include_version(room):
+    room_registry.changed(room.id_key)
+
+    assert storage.Room.get_version(room.id_key) == 1
+    assert f"version:room:{room.id_key}" in storage.get_rooms_keys([room.id_key])
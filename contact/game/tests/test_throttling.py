@@ -0,0 +1,74 @@
+import pytest
+
+from contact.game import throttling
+from contact.game.constants import GameEvent
+from contact.game.throttling import RateLimiter, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Monotonic time of the throttling module moved by the tests"""
+
+    class Clock:
+        now = 100.0
+
+        def __call__(self):
+            return self.now
+
+    clock = Clock()
+    monkeypatch.setattr(throttling.time, "monotonic", clock)
+    return clock
+
+
+def test_token_bucket_starts_full(clock):
+    bucket = TokenBucket(rate=1, capacity=3)
+
+    assert bucket.tokens == 3
+    assert bucket.delay == 0
+
+
+def test_token_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    bucket.tokens = 0
+
+    clock.now += 1
+    bucket.refill()
+    assert bucket.tokens == 2
+
+    clock.now += 10
+    bucket.refill()
+    assert bucket.tokens == 3
+
+
+def test_token_bucket_delay(clock):
+    bucket = TokenBucket(rate=0.5, capacity=2)
+    bucket.tokens = 0.5
+
+    assert bucket.delay == 1
+
+
+def test_acquire_takes_tokens_until_limited(clock):
+    limiter = RateLimiter("connection", {GameEvent.OFFER: (1, 2)})
+
+    assert throttling.acquire(GameEvent.OFFER, limiter) == (None, 0)
+    assert throttling.acquire(GameEvent.OFFER, limiter) == (None, 0)
+    assert throttling.acquire(GameEvent.OFFER, limiter) == ("connection", 1)
+
+    clock.now += 1
+    assert throttling.acquire(GameEvent.OFFER, limiter) == (None, 0)
+
+
+def test_acquire_does_not_limit_events_without_limits(clock):
+    limiter = RateLimiter("connection", {GameEvent.OFFER: (1, 1)})
+
+    for _ in range(10):
+        assert throttling.acquire(GameEvent.PLAYER_STATE, limiter) == (None, 0)
+
+
+def test_acquire_takes_tokens_only_when_all_limiters_allow(clock):
+    connection = RateLimiter("connection", {GameEvent.OFFER: (1, 5)})
+    room = RateLimiter("room", {GameEvent.OFFER: (1, 1)})
+
+    assert throttling.acquire(GameEvent.OFFER, connection, room) == (None, 0)
+    assert throttling.acquire(GameEvent.OFFER, connection, room)[0] == "room"
+    assert connection.get_bucket(GameEvent.OFFER).tokens == 4
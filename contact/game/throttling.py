@@ -0,0 +1,81 @@
+"""
+In-process token buckets limiting the game actions sent by clients.
+Limits are applied per connection and per room (the room limit is shared by
+the connections of the room served by the same worker).
+"""
+import time
+from typing import Dict, Optional, Tuple
+
+from contact.game.constants import GameEvent
+
+Limits = Dict[GameEvent, Tuple[float, float]]
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    @property
+    def delay(self) -> float:
+        """Seconds left until a token is available"""
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """
+    :attribute scope: the name of the limited entity used in metrics
+    :attribute limits: events mapped to (tokens per second, burst) pairs,
+        events without limits are not limited
+    """
+
+    def __init__(self, scope: str, limits: Limits):
+        self.scope = scope
+        self.limits = limits
+        self.buckets: Dict[GameEvent, TokenBucket] = {}
+
+    def get_bucket(self, event: GameEvent) -> Optional[TokenBucket]:
+        bucket = self.buckets.get(event)
+
+        if bucket is None and event in self.limits:
+            rate, capacity = self.limits[event]
+            bucket = self.buckets[event] = TokenBucket(rate=rate, capacity=capacity)
+
+        return bucket
+
+
+def acquire(event: GameEvent, *limiters: RateLimiter) -> Tuple[Optional[str], float]:
+    """
+    Take a token from the event bucket of every limiter. Tokens are taken only
+    when all the limiters allow the event.
+    :return: the scope of the limiter rejecting the event and seconds to wait
+        or (None, 0) when the event is allowed
+    """
+    buckets = []
+
+    for limiter in limiters:
+        bucket = limiter.get_bucket(event)
+        if bucket is None:
+            continue
+
+        bucket.refill()
+        if bucket.tokens < 1:
+            return limiter.scope, bucket.delay
+
+        buckets.append(bucket)
+
+    for bucket in buckets:
+        bucket.tokens -= 1
+
+    return None, 0
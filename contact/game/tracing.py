@@ -0,0 +1,135 @@
+"""
+Opt-in tracing of the commands sent by the game storage client.
+
+When tracing is disabled the storage client only checks that no tracer is
+installed, so it can be left in production code and switched at runtime:
+
+    python manage.py redis_trace enable
+    python manage.py redis_trace dump
+"""
+import heapq
+import itertools
+import json
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from contact.game import control, storage_handler
+
+current_action: ContextVar[Optional[str]] = ContextVar("current_action", default=None)
+
+
+def get_key_prefix(args: tuple) -> str:
+    if len(args) < 2:
+        return ""
+
+    key = args[1]
+    if isinstance(key, bytes):
+        key = key.decode(errors="replace")
+    if not isinstance(key, str):
+        return ""
+
+    prefix, separator, _ = key.rpartition(":")
+    return prefix if separator else key
+
+
+class RedisTracer:
+    """
+    Keeps the `size` slowest commands in a min-heap, so the fastest of them
+    is replaced first, and aggregated durations per action and command.
+    A pipeline is recorded as a single PIPELINE command with the names of the
+    commands sent in it.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.slowest: List[Tuple[float, int, dict]] = []
+        self.totals: Dict[Tuple[str, str], List[float]] = {}
+        self._sequence = itertools.count()
+
+    def record(self, args: tuple, duration: float, commands: Optional[list] = None):
+        action = current_action.get() or ""
+        command_name = str(args[0]) if args else ""
+
+        total = self.totals.setdefault((action, command_name), [0, 0.0])
+        total[0] += 1
+        total[1] += duration
+
+        if len(self.slowest) >= self.size and duration <= self.slowest[0][0]:
+            return
+
+        record = {
+            "action": action,
+            "command": command_name,
+            "key_prefix": get_key_prefix(args),
+            "duration": duration,
+            "time": time.time(),
+        }
+        if commands is not None:
+            record["commands"] = commands
+        item = (duration, next(self._sequence), record)
+
+        if len(self.slowest) < self.size:
+            heapq.heappush(self.slowest, item)
+        else:
+            heapq.heapreplace(self.slowest, item)
+
+    def record_pipeline(self, commands: List[tuple], duration: float):
+        key = commands[0][1] if commands and len(commands[0]) > 1 else ""
+        self.record(
+            ("PIPELINE", key),
+            duration,
+            commands=[str(args[0]) if args else "" for args in commands],
+        )
+
+    def dump(self) -> dict:
+        # Called from the control thread, so containers are copied at first
+        slowest, totals = list(self.slowest), list(self.totals.items())
+        return {
+            "slowest": [record for _, _, record in sorted(slowest, reverse=True)],
+            "totals": [
+                {
+                    "action": action,
+                    "command": command_name,
+                    "count": count,
+                    "duration": duration,
+                }
+                for (action, command_name), (count, duration) in totals
+            ],
+        }
+
+
+def get_tracer() -> Optional[RedisTracer]:
+    return storage_handler.redis.execute_command.tracer
+
+
+@control.command("redis_trace_enable")
+def enable(size: Optional[int] = None):
+    if get_tracer() is None:
+        storage_handler.redis.execute_command.tracer = RedisTracer(
+            size=size or settings.GAME_REDIS_TRACE_SIZE
+        )
+
+
+@control.command("redis_trace_disable")
+def disable():
+    storage_handler.redis.execute_command.tracer = None
+
+
+@control.command("redis_trace_reset")
+def reset():
+    tracer = get_tracer()
+    if tracer is not None:
+        storage_handler.redis.execute_command.tracer = RedisTracer(size=tracer.size)
+
+
+@control.command("redis_trace_dump")
+def dump():
+    tracer = get_tracer()
+    if tracer is None:
+        return
+
+    with open(control.diagnostics_path("redis-trace") + ".json", "w") as file:
+        json.dump(tracer.dump(), file)
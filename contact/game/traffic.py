@@ -0,0 +1,164 @@
+"""
+Opt-in recording of the game socket traffic, replayed by
+`manage.py replay_traffic` to test performance on real traffic.
+
+    python manage.py record_traffic start
+    python manage.py record_traffic stop
+
+Connections, inbound frames with the error of their handling and
+disconnections are put into a queue and written by a background thread of the
+worker into gzipped JSON lines files, a file per worker and period. Every line
+is a record array:
+
+    ["c", timestamp, connection, user, room, restored]
+    ["f", timestamp, connection, frame text, error details, created offer id]
+    ["d", timestamp, connection, close code]
+
+Usernames are replaced with keyed hashes. The id of the offer created by a
+frame is recorded, so the replayer can map it to the offer it creates. While
+recording is stopped, a consumer only checks that `recording` is false.
+Recording stops by itself after GAME_TRAFFIC_MAX_DURATION.
+"""
+import gzip
+import hashlib
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from django.conf import settings
+
+from contact.game import control
+
+logger = logging.getLogger(__name__)
+
+CONNECT = "c"
+FRAME = "f"
+DISCONNECT = "d"
+FLUSH_INTERVAL = 1  # seconds
+
+recording = False
+
+_records: "queue.SimpleQueue[list]" = queue.SimpleQueue()
+_connection_ids = itertools.count(1)
+_deadline = 0.0
+_writer: Optional[threading.Thread] = None
+_writer_pid: Optional[int] = None
+
+
+def anonymize(username: str) -> str:
+    key = settings.SECRET_KEY.encode()[:64]
+    return hashlib.blake2b(username.encode(), key=key, digest_size=8).hexdigest()
+
+
+def record(kind: str, connection: str, *values, timestamp: Optional[float] = None):
+    """Queue a record to be written, never blocks"""
+    if time.monotonic() > _deadline:
+        stop()
+        return
+
+    ensure_writing()
+    timestamp = time.time() if timestamp is None else timestamp
+    _records.put([kind, round(timestamp, 4), connection, *values])
+
+
+def record_connect(username: str, room_id: str, restored: bool) -> str:
+    """:return: id of the connection in the records"""
+    connection = f"{os.getpid()}-{next(_connection_ids)}"
+    record(CONNECT, connection, anonymize(username), room_id, restored)
+    return connection
+
+
+def find_created_offer_id(room_data: dict, sender_id: str) -> Optional[str]:
+    """:return: id of the newest offer of the sender in the room state"""
+    for offer in reversed(room_data.get("offers", ())):
+        if offer.get("sender_id") == sender_id:
+            return offer.get("id_key")
+    return None
+
+
+def write():
+    path = ""
+    created_at = 0.0
+    lines: List[str] = []
+    flushed_at = time.monotonic()
+
+    while True:
+        try:
+            lines.append(json.dumps(_records.get(timeout=FLUSH_INTERVAL)) + "\n")
+        except queue.Empty:
+            pass
+
+        if time.monotonic() - flushed_at < FLUSH_INTERVAL:
+            continue
+
+        flushed_at = time.monotonic()
+        if not lines:
+            continue
+
+        segment_age = flushed_at - created_at
+        if not path or segment_age >= settings.GAME_TRAFFIC_SEGMENT_MAX_AGE:
+            created_at = flushed_at
+            path = os.path.join(
+                settings.GAME_TRAFFIC_DIR,
+                f"{datetime.utcnow():%Y%m%d%H%M%S}-{os.getpid()}.jsonl.gz",
+            )
+
+        # Every flush appends a gzip member, so a file being written is readable
+        try:
+            os.makedirs(settings.GAME_TRAFFIC_DIR, exist_ok=True)
+            with gzip.open(path, "at") as file:
+                file.writelines(lines)
+        except OSError:
+            logger.exception("Traffic could not be written, %s lost", len(lines))
+            path = ""
+
+        lines = []
+
+
+def ensure_writing():
+    """Start the writer thread of the current worker, if it is not started yet"""
+    global _writer, _writer_pid
+
+    if _writer is not None and _writer_pid == os.getpid():
+        return
+
+    _writer_pid = os.getpid()
+    _writer = threading.Thread(target=write, name="game-traffic", daemon=True)
+    _writer.start()
+
+
+def read(paths: List[str]) -> Iterator[list]:
+    """:return: records of the files ordered by time"""
+    records = []
+    for path in paths:
+        with gzip.open(path, "rt") as file:
+            for line in file:
+                # The last line of a file being written may be partial
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+
+    records.sort(key=lambda record: record[1])
+    return iter(records)
+
+
+@control.command("traffic_record_start")
+def start():
+    global recording, _deadline
+
+    _deadline = time.monotonic() + settings.GAME_TRAFFIC_MAX_DURATION
+    recording = True
+
+
+@control.command("traffic_record_stop")
+def stop():
+    global recording
+
+    recording = False
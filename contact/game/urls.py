@@ -0,0 +1,8 @@
+from django.urls import path
+
+from contact.game import views
+
+urlpatterns = [
+    path("rooms/stats", views.RoomStatsAPIView.as_view(), name="room-stats"),
+    path("memory", views.MemoryAPIView.as_view(), name="memory"),
+]
@@ -0,0 +1,39 @@
+from django.core.cache import cache
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from contact.game import control, memory, room_stats
+from contact.game.constants import ROOM_STATS_CACHE_TIMEOUT
+
+
+class RoomStatsAPIView(APIView):
+    """Aggregates of the stored rooms, shared by staff for a few seconds"""
+
+    permission_classes = (IsAdminUser,)
+    cache_key = "game:room_stats"
+
+    def get(self, request, *args, **kwargs):
+        stats = cache.get(self.cache_key)
+
+        if stats is None:
+            stats = room_stats.collect()
+            cache.set(self.cache_key, stats, ROOM_STATS_CACHE_TIMEOUT)
+
+        return Response(stats)
+
+
+class MemoryAPIView(APIView):
+    """
+    Memory accounting of the game workers. Posting dumps a tracemalloc
+    snapshot in every worker tracing allocations, see `manage.py memory_workers`
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return Response(memory.load_worker_reports(include_current=True))
+
+    def post(self, request, *args, **kwargs):
+        workers_count = control.publish("memory_snapshot")
+        return Response({"workers": workers_count})
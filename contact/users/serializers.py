@@ -4,6 +4,8 @@ from django.db import IntegrityError
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
+from contact.game.constants import LEADERBOARD_MAX_PAGE_SIZE, LeaderboardPeriod
+
 User = get_user_model()
 
 
@@ -51,3 +53,24 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ("username",)
+
+
+class LeaderboardQuerySerializer(serializers.Serializer):
+    period = serializers.ChoiceField(
+        choices=(
+            LeaderboardPeriod.GLOBAL,
+            LeaderboardPeriod.DAILY,
+            LeaderboardPeriod.WEEKLY,
+        ),
+        default=LeaderboardPeriod.GLOBAL,
+    )
+    page = serializers.IntegerField(min_value=1, default=1)
+    page_size = serializers.IntegerField(
+        min_value=1, max_value=LEADERBOARD_MAX_PAGE_SIZE, default=20
+    )
+
+
+class LeaderboardEntrySerializer(serializers.Serializer):
+    rank = serializers.IntegerField()
+    username = serializers.CharField()
+    points = serializers.IntegerField()
@@ -11,4 +11,5 @@ urlpatterns = [
         name="sign-in-with-token",
     ),
     path("sign-up", views.SignUpAPIView.as_view(), name="sign-up"),
+    path("leaderboard", views.LeaderboardAPIView.as_view(), name="leaderboard"),
 ]
@@ -1,11 +1,14 @@
 from django.conf import settings
 from django.contrib.auth import authenticate, login
 from django.contrib.sessions.models import Session
+from django.core.cache import cache
 from rest_framework.exceptions import ValidationError
 from rest_framework.generics import GenericAPIView, RetrieveAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from contact.game import storage
+from contact.game.constants import LEADERBOARD_CACHE_TIMEOUT
 from contact.users import serializers
 
 
@@ -62,3 +65,53 @@ class UserProfileAPIView(RetrieveAPIView):
 
     def get_object(self):
         return self.request.user
+
+
+class LeaderboardAPIView(GenericAPIView):
+    """
+    Players with the most points by pages, which are cached for
+    LEADERBOARD_CACHE_TIMEOUT, and the rank of the requesting user
+    """
+
+    serializer_class = serializers.LeaderboardQuerySerializer
+
+    @staticmethod
+    def get_page(period, page, page_size):
+        leaderboard_key = storage.get_leaderboard_key(period)
+        cache_key = f"{leaderboard_key}:page:{page}:{page_size}"
+        cached_page = cache.get(cache_key)
+
+        if cached_page is None:
+            start = (page - 1) * page_size
+            entries, count = storage.get_leaderboard_page(period, start, page_size)
+            results = serializers.LeaderboardEntrySerializer(
+                [
+                    {"rank": start + index + 1, "username": username, "points": points}
+                    for index, (username, points) in enumerate(entries)
+                ],
+                many=True,
+            ).data
+            cached_page = {"count": count, "results": results}
+            cache.set(cache_key, cached_page, timeout=LEADERBOARD_CACHE_TIMEOUT)
+
+        return cached_page
+
+    def get_user_entry(self, period):
+        if not self.request.user.is_authenticated:
+            return None
+
+        username = self.request.user.username
+        rank = storage.get_leaderboard_rank(period, username)
+        if rank is None:
+            return None
+
+        return serializers.LeaderboardEntrySerializer(
+            {"rank": rank[0] + 1, "username": username, "points": rank[1]}
+        ).data
+
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        period = serializer.validated_data["period"]
+        page = self.get_page(**serializer.validated_data)
+        return Response({**page, "user": self.get_user_entry(period)})